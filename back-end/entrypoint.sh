@@ -4,5 +4,11 @@
 source /opt/conda/etc/profile.d/conda.sh
 conda activate backend
 
+# "worker" runs the background job worker instead of the web server
+if [ "$1" = "worker" ]; then
+    exec python run_worker.py
+fi
+
 # Start Gunicorn with the correct module path
-exec gunicorn --bind 0.0.0.0:5050 --workers 4 "run:gunicorn_app"
+# Threaded workers so long-lived event streams (SSE) don't hold a whole worker
+exec gunicorn --bind 0.0.0.0:5050 --workers 4 --threads 8 "run:gunicorn_app"
@@ -12,6 +12,7 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_mail import Mail
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -37,12 +38,28 @@ def create_app():
 
     # Initialize Flask extensions
     db.init_app(flask_app)
+    from app.hooks import check_token_scope, configure_db_transaction
+    if not event.contains(db.session, 'after_begin', configure_db_transaction):
+        event.listen(db.session, 'after_begin', configure_db_transaction)
     jwt.init_app(flask_app)
+    jwt.token_verification_loader(check_token_scope)
     mail.init_app(flask_app)
     CORS(flask_app, supports_credentials=True)  # Your React app origin
 
+    from app.events import event_broker
+    event_broker.init_app(flask_app)
+
+    from app.bulk import bulk
+    bulk.init_app(flask_app)
+
+    from app.mailer import mail_queue
+    mail_queue.init_app(flask_app)
+
+    from app.archive import archive_store
+    archive_store.init_app(flask_app)
+
     # Import and register blueprints for modular routing
-    from app.routes import auth, checklists, tables, users, files
+    from app.routes import auth, checklists, events, jobs, tables, users, files
 
     # Each blueprint has its own URL prefix for API organization
     flask_app.register_blueprint(auth.auth_bp, url_prefix='/api/auth')
@@ -50,6 +67,8 @@ def create_app():
     flask_app.register_blueprint(users.user_bp, url_prefix='/api/users')
     flask_app.register_blueprint(tables.table_bp, url_prefix='/api/tables')
     flask_app.register_blueprint(files.file_bp, url_prefix='/api/files')
+    flask_app.register_blueprint(events.event_bp, url_prefix='/api/events')
+    flask_app.register_blueprint(jobs.job_bp, url_prefix='/api/jobs')
     
     # Serve React frontend for all non-API routes
     @flask_app.route('/', defaults={'path': ''})
@@ -0,0 +1,145 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+import os
+import shutil
+import tempfile
+
+
+class LocalArchiveBackend:
+    """ Keeps archive files in a local directory (shared by the app and the workers) """
+
+    name = "local"
+
+    def __init__(self, root):
+        self.root = root
+
+    def put(self, key: str, path: str):
+        """ Move a finished file into the store under key """
+        target = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(path, target)
+
+    def local_path(self, key: str) -> str:
+        """ Path of the stored file """
+        return os.path.join(self.root, key)
+
+    def delete(self, key: str):
+        """ Remove a stored file, if it exists """
+        try:
+            os.unlink(os.path.join(self.root, key))
+        except FileNotFoundError:
+            pass
+
+
+class S3ArchiveBackend:
+    """
+    Keeps archive files in the S3 bucket (see FileManager)
+
+    Archive files never change once written, so reads download a file once
+    into the local cache directory and reuse it.
+    """
+
+    name = "s3"
+
+    def __init__(self, prefix, cache_dir):
+        self.prefix = prefix
+        self.cache_dir = cache_dir
+
+    def _client(self):
+        import boto3
+
+        from app.utils import FileManager
+
+        session = boto3.Session(
+            aws_access_key_id=FileManager.AWS_SERVER_PUBLIC_KEY,
+            aws_secret_access_key=FileManager.AWS_SERVER_SECRET_KEY,
+        )
+        return session.client("s3"), FileManager.BUCKET_NAME
+
+    def put(self, key: str, path: str):
+        """ Upload a finished file under key, then remove the local copy """
+        s3, bucket = self._client()
+        s3.upload_file(path, bucket, self.prefix + key)
+        os.unlink(path)
+
+    def local_path(self, key: str) -> str:
+        """ Path of a local copy of the stored file, downloaded on first use """
+        path = os.path.join(self.cache_dir, key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            s3, bucket = self._client()
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as file:
+                    s3.download_fileobj(bucket, self.prefix + key, file)
+                os.replace(tmp_path, path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+        return path
+
+    def delete(self, key: str):
+        """ Remove a stored file and its local copy """
+        s3, bucket = self._client()
+        s3.delete_object(Bucket=bucket, Key=self.prefix + key)
+        try:
+            os.unlink(os.path.join(self.cache_dir, key))
+        except FileNotFoundError:
+            pass
+
+
+class ArchiveStore:
+    """
+    Storage of archived table data files (see ArchiveService)
+
+    Files are written once under a key and read from a local path, so
+    readers can seek into them (Parquet footers and row groups).
+    """
+
+    BACKENDS = ("local", "s3")
+
+    def __init__(self):
+        self.backend = None
+        self.staging_dir = None
+
+    def init_app(self, app):
+        """ Configure the backend from ARCHIVE_STORAGE """
+        backend = app.config.get("ARCHIVE_STORAGE", "local")
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Invalid ARCHIVE_STORAGE. Must be one of: {', '.join(self.BACKENDS)}")
+
+        root = app.config["ARCHIVE_DIR"]
+        if backend == "s3":
+            self.backend = S3ArchiveBackend(app.config.get("ARCHIVE_S3_PREFIX", "archive/"), os.path.join(root, "cache"))
+        else:
+            self.backend = LocalArchiveBackend(root)
+        self.staging_dir = os.path.join(root, "staging")
+
+    @property
+    def name(self) -> str:
+        return self.backend.name
+
+    def staging_path(self) -> str:
+        """ New temporary path to write a file to before put() """
+        os.makedirs(self.staging_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=self.staging_dir, suffix=".parquet")
+        os.close(fd)
+        return path
+
+    def put(self, key: str, path: str):
+        """ Store the file at path under key (the file is moved away) """
+        self.backend.put(key, path)
+
+    def local_path(self, key: str) -> str:
+        """ Local path to read the file stored under key """
+        return self.backend.local_path(key)
+
+    def delete(self, key: str):
+        """ Delete the file stored under key """
+        self.backend.delete(key)
+
+
+archive_store = ArchiveStore()
@@ -0,0 +1,256 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+import json
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from app import db
+from app.models.table import TableData
+from sqlalchemy import event, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Column order of the cell tuples taken by insert_cells
+CELL_COLUMNS = (
+    'tab_id', 'column_id', 'record_id',
+    'value_text', 'value_num', 'value_bool', 'value_date',
+    'value_fpath', 'value_sku', 'value_lotnum', 'value_user_id',
+    'tenant_id',
+)
+
+
+class PostgresBulkBackend:
+    """
+    Bulk writes for PostgreSQL
+
+    Rows are sent with psycopg2 execute_values, many rows per statement,
+    and cells are upserted with ON CONFLICT ON CONSTRAINT.
+    """
+
+    PAGE_SIZE = 1000
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def insert_records(self, tab_id: int, tenant_id: int, count: int,
+                       documents: Optional[List[Dict]] = None) -> List[int]:
+        """ Insert count records into a tab (empty, or with documents), returning their IDs in insert order """
+        from psycopg2.extras import Json, execute_values
+
+        cursor = db.session.connection().connection.cursor()
+        created_at = datetime.utcnow()
+        if documents is None:
+            rows = [(tab_id, tenant_id, created_at, None)] * count
+        else:
+            rows = [(tab_id, tenant_id, created_at, Json(document)) for document in documents]
+        # page_size must cover every row: fetchall() only returns the IDs of the last page
+        execute_values(
+            cursor,
+            'INSERT INTO table_record (tab_id, tenant_id, created_at, data) VALUES %s RETURNING id',
+            rows,
+            page_size=max(count, self.PAGE_SIZE)
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def insert_cells(self, cells: List[Tuple]):
+        """ Insert new cells, each a tuple of CELL_COLUMNS values """
+        from psycopg2.extras import execute_values
+
+        cursor = db.session.connection().connection.cursor()
+        execute_values(
+            cursor,
+            f"INSERT INTO table_data ({', '.join(CELL_COLUMNS)}) VALUES %s",
+            cells,
+            page_size=self.PAGE_SIZE
+        )
+
+    def upsert_cells(self, cells: List[Dict]):
+        """ Insert cells, updating the values of cells that already exist """
+        if not cells:
+            return
+        statement = postgresql.insert(TableData)
+        db.session.execute(statement.on_conflict_do_update(
+            constraint=TableData.UNIQUE_CELL_CONSTRAINT,
+            set_={key: statement.excluded[key] for key in CELL_COLUMNS if key.startswith('value_')},
+        ), cells)
+
+    def merge_documents(self, tenant_id: int, patches: Dict[int, Dict]):
+        """ Merge {column_id: value} patches into the documents of records (by record ID) """
+        from psycopg2.extras import Json, execute_values
+
+        cursor = db.session.connection().connection.cursor()
+        execute_values(
+            cursor,
+            "UPDATE table_record SET data = COALESCE(table_record.data, '{}') || patch.data "
+            "FROM (VALUES %s) AS patch (id, tenant_id, data) "
+            "WHERE table_record.id = patch.id AND table_record.tenant_id = patch.tenant_id",
+            [(record_id, tenant_id, Json(patch)) for record_id, patch in patches.items()],
+            template="(%s, %s, CAST(%s AS JSONB))",
+            page_size=self.PAGE_SIZE
+        )
+
+    def remove_document_key(self, tab_id: int, tenant_id: int, key: str):
+        """ Remove a column from the documents of a tab's records """
+        db.session.execute(text(
+            "UPDATE table_record SET data = data - :key "
+            "WHERE tab_id = :tab_id AND tenant_id = :tenant_id AND data IS NOT NULL"
+        ), {'key': key, 'tab_id': tab_id, 'tenant_id': tenant_id})
+
+    # SQL fragments for set-based conversions (see ColumnMigrationService)
+
+    def regex_match(self, expression: str, pattern_param: str) -> str:
+        return f"{expression} ~ :{pattern_param}"
+
+    def to_number(self, expression: str) -> str:
+        return f"CAST({expression} AS DOUBLE PRECISION)"
+
+    def to_date(self, expression: str) -> str:
+        return f"CAST({expression} AS DATE)"
+
+    def is_calendar_date(self, expression: str) -> str:
+        # For YYYY-MM-DD strings with a valid month and a day of 01-31:
+        # the day is real if counting it from the 1st stays in the same month
+        return (
+            f"TO_CHAR(CAST(SUBSTR({expression}, 1, 8) || '01' AS DATE) "
+            f"+ CAST(SUBSTR({expression}, 9, 2) AS INTEGER) - 1, 'YYYY-MM-DD') = {expression}"
+        )
+
+    def to_text(self, column: str, data_type: str) -> str:
+        return f"CAST({column} AS TEXT)"
+
+
+class SQLiteBulkBackend:
+    """
+    Bulk writes for SQLite (local development, tests and single-site installs)
+
+    Rows are inserted with one executemany per table and cells are
+    upserted with ON CONFLICT (record_id, column_id). A REGEXP function is
+    registered on every connection for the conversion fragments.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        event.listen(engine, "connect", self._register_functions)
+
+    @staticmethod
+    def _register_functions(dbapi_connection, connection_record):
+        dbapi_connection.create_function(
+            "regexp", 2,
+            lambda pattern, value: value is not None and re.search(pattern, value) is not None,
+            deterministic=True
+        )
+
+    def insert_records(self, tab_id: int, tenant_id: int, count: int,
+                       documents: Optional[List[Dict]] = None) -> List[int]:
+        """ Insert count records into a tab (empty, or with documents), returning their IDs in insert order """
+        cursor = db.session.connection().connection.cursor()
+        created_at = datetime.utcnow().isoformat(' ')
+        if documents is None:
+            rows = [(tab_id, tenant_id, created_at, None)] * count
+        else:
+            rows = [(tab_id, tenant_id, created_at, json.dumps(document)) for document in documents]
+        cursor.executemany("INSERT INTO table_record (tab_id, tenant_id, created_at, data) VALUES (?, ?, ?, ?)", rows)
+        # The transaction holds the database's write lock, so the new rows took the next consecutive rowids
+        last_id = cursor.execute("SELECT MAX(id) FROM table_record").fetchone()[0]
+        return list(range(last_id - count + 1, last_id + 1))
+
+    def insert_cells(self, cells: List[Tuple]):
+        """ Insert new cells, each a tuple of CELL_COLUMNS values """
+        cursor = db.session.connection().connection.cursor()
+        cursor.executemany(
+            f"INSERT INTO table_data ({', '.join(CELL_COLUMNS)}) VALUES ({', '.join('?' * len(CELL_COLUMNS))})",
+            [self._adapt(cell) for cell in cells]
+        )
+
+    @staticmethod
+    def _adapt(cell: Tuple) -> Tuple:
+        # Store dates the way SQLAlchemy does (YYYY-MM-DD text)
+        return tuple(value.isoformat() if isinstance(value, (date, datetime)) else value for value in cell)
+
+    def upsert_cells(self, cells: List[Dict]):
+        """ Insert cells, updating the values of cells that already exist """
+        if not cells:
+            return
+        statement = sqlite.insert(TableData)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['record_id', 'column_id'],
+            set_={key: statement.excluded[key] for key in CELL_COLUMNS if key.startswith('value_')},
+        ), cells)
+
+    def merge_documents(self, tenant_id: int, patches: Dict[int, Dict]):
+        """ Merge {column_id: value} patches into the documents of records (by record ID) """
+        # json_patch() drops null members: a missing key reads as an empty cell
+        cursor = db.session.connection().connection.cursor()
+        cursor.executemany(
+            "UPDATE table_record SET data = json_patch(COALESCE(data, '{}'), ?) WHERE id = ? AND tenant_id = ?",
+            [(json.dumps(patch), record_id, tenant_id) for record_id, patch in patches.items()]
+        )
+
+    def remove_document_key(self, tab_id: int, tenant_id: int, key: str):
+        """ Remove a column from the documents of a tab's records """
+        db.session.execute(text(
+            "UPDATE table_record SET data = json_remove(data, :path) "
+            "WHERE tab_id = :tab_id AND tenant_id = :tenant_id AND data IS NOT NULL"
+        ), {'path': f'$."{key}"', 'tab_id': tab_id, 'tenant_id': tenant_id})
+
+    # SQL fragments for set-based conversions (see ColumnMigrationService)
+
+    def regex_match(self, expression: str, pattern_param: str) -> str:
+        return f"{expression} REGEXP :{pattern_param}"
+
+    def to_number(self, expression: str) -> str:
+        return f"CAST({expression} AS REAL)"
+
+    def to_date(self, expression: str) -> str:
+        # Dates are stored as YYYY-MM-DD text
+        return expression
+
+    def is_calendar_date(self, expression: str) -> str:
+        # A date modifier makes DATE() roll impossible days over into the next month
+        return f"DATE({expression}, '+0 days') = {expression}"
+
+    def to_text(self, column: str, data_type: str) -> str:
+        if data_type == 'boolean':
+            # Booleans are stored as 0/1
+            return f"CASE {column} WHEN 1 THEN 'true' WHEN 0 THEN 'false' END"
+        return f"CAST({column} AS TEXT)"
+
+
+class BulkOperations:
+    """
+    Bulk writes and set-based conversions of table data
+
+    Picks the backend matching the database dialect, so the fast paths of
+    CSV imports, row appends, cell upserts, record documents and column type
+    changes work on PostgreSQL and SQLite alike. Operations run in the
+    caller's transaction.
+    """
+
+    BACKENDS = {
+        "postgresql": PostgresBulkBackend,
+        "sqlite": SQLiteBulkBackend,
+    }
+
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app):
+        """ Configure the backend for the app's database """
+        with app.app_context():
+            engine = db.engine
+        if engine.dialect.name not in self.BACKENDS:
+            raise ValueError(f"Unsupported database for bulk operations: {engine.dialect.name}. "
+                             f"Must be one of: {', '.join(self.BACKENDS)}")
+        self.backend = self.BACKENDS[engine.dialect.name](engine)
+
+    def __getattr__(self, name):
+        # Everything else is the backend's (insert_records, insert_cells, upsert_cells, documents, SQL fragments)
+        if name == 'backend' or self.backend is None:
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+
+bulk = BulkOperations()
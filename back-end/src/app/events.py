@@ -0,0 +1,247 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+import json
+import queue
+import select
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, current_app
+from sqlalchemy import text
+
+
+class LocalEventBackend:
+    """
+    Delivers events to subscribers of the current process only
+
+    Enough for a single worker (e.g. `python run.py`); use the postgres
+    backend when several gunicorn workers serve the same tenants.
+    """
+
+    def __init__(self, deliver):
+        self.deliver = deliver
+
+    def publish(self, message: str):
+        """ Hand a serialized event straight to the local subscribers """
+        self.deliver(message)
+
+    def start(self):
+        """ Nothing to listen to """
+
+
+class PostgresEventBackend:
+    """
+    Fans events out to every worker through PostgreSQL LISTEN/NOTIFY
+
+    Each process keeps one dedicated listening connection, opened when its
+    first subscriber connects, and delivers notifications to its local subscribers.
+    """
+
+    CHANNEL = "bakedinsights_events"
+    RECONNECT_DELAY = 5  # seconds
+
+    def __init__(self, deliver, engine):
+        self.deliver = deliver
+        self.engine = engine
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def publish(self, message: str):
+        """ NOTIFY all listening workers (including this one) """
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT pg_notify(:channel, :message)"),
+                         {"channel": self.CHANNEL, "message": message})
+            conn.commit()
+
+    def start(self):
+        """ Start the listening thread if it isn't running yet """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._listen, daemon=True,
+                                                name="event-broker-listener")
+                self._thread.start()
+
+    def _listen(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        dsn = self.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(dsn)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.CHANNEL}")
+                while True:
+                    if select.select([conn], [], [], self.RECONNECT_DELAY) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.deliver(conn.notifies.pop(0).payload)
+            except Exception:
+                time.sleep(self.RECONNECT_DELAY)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+class EventSubscription:
+    """ Bounded queue of events for one streaming client """
+
+    def __init__(self, channels, max_size):
+        self.channels = set(channels)
+        self.events = queue.Queue(maxsize=max_size)
+        self.overflowed = False
+
+    def put(self, event):
+        """ Queue an event; slow clients that fall behind are told to resync """
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """ Wait for the next event, returning None on timeout """
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker:
+    """
+    Publish/subscribe hub for live updates streamed to clients over SSE
+
+    Channels are tenant-scoped strings (see channel()); an event published on
+    several channels is delivered once to each subscriber of any of them.
+    """
+
+    BACKENDS = ("local", "postgres")
+
+    def __init__(self):
+        self.backend = None
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """ Configure the delivery backend from EVENT_BROKER_BACKEND """
+        backend = app.config.get("EVENT_BROKER_BACKEND", "local")
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Invalid EVENT_BROKER_BACKEND. Must be one of: {', '.join(self.BACKENDS)}")
+
+        if backend == "postgres":
+            from app import db
+            with app.app_context():
+                self.backend = PostgresEventBackend(self._deliver, db.engine)
+        else:
+            self.backend = LocalEventBackend(self._deliver)
+
+    @staticmethod
+    def channel(tenant_id, kind=None, object_id=None):
+        """
+        Build a channel name
+
+        Args:
+            tenant_id: ID of tenant owning the channel
+            kind: Optional object type ("table", "checklist")
+            object_id: ID of the object when kind is given
+
+        Returns:
+            Channel name
+        """
+        if kind is None:
+            return f"tenant:{tenant_id}"
+        return f"tenant:{tenant_id}:{kind}:{object_id}"
+
+    def publish(self, channels, event: str, data: dict):
+        """
+        Publish an event; call after the change it describes is committed
+
+        Args:
+            channels: Channel names to publish on
+            event: Event name (SSE "event" field)
+            data: JSON-serializable event payload
+        """
+        if self.backend is None:
+            return
+        try:
+            self.backend.publish(json.dumps({"channels": list(channels), "event": event, "data": data}))
+        except Exception:
+            # The change is already committed; a missed event only delays clients until their next poll
+            current_app.logger.exception("Error publishing %s event", event)
+
+    def subscribe(self, channels, max_size: int = 100) -> EventSubscription:
+        """ Register a subscription to the given channels """
+        self.backend.start()
+        subscription = EventSubscription(channels, max_size)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: EventSubscription):
+        """ Remove a subscription from all its channels """
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions[channel].discard(subscription)
+                if not self._subscriptions[channel]:
+                    del self._subscriptions[channel]
+
+    def _deliver(self, message: str):
+        event = json.loads(message)
+        with self._lock:
+            subscriptions = set()
+            for channel in event["channels"]:
+                subscriptions.update(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def stream(self, channels) -> Response:
+        """
+        Build a text/event-stream response for the given channels
+
+        The request's database session is released before streaming starts and
+        streams end after EVENT_STREAM_MAX_SECONDS; browsers reconnect on their own.
+
+        Args:
+            channels: Channel names to subscribe to
+
+        Returns:
+            Streaming Flask response
+        """
+        from app import db
+
+        db.session.close()
+        heartbeat = current_app.config.get("EVENT_STREAM_HEARTBEAT_SECONDS", 15)
+        max_seconds = current_app.config.get("EVENT_STREAM_MAX_SECONDS", 300)
+        max_size = current_app.config.get("EVENT_STREAM_QUEUE_SIZE", 100)
+
+        def generate():
+            subscription = self.subscribe(channels, max_size)
+            try:
+                yield "retry: 3000\n\n"
+                deadline = time.monotonic() + max_seconds
+                while time.monotonic() < deadline:
+                    if subscription.overflowed:
+                        subscription.overflowed = False
+                        yield "event: resync\ndata: {}\n\n"
+                    event = subscription.get(timeout=heartbeat)
+                    if event is None:
+                        yield ": keep-alive\n\n"
+                        continue
+                    yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+            finally:
+                self.unsubscribe(subscription)
+
+        return Response(generate(), mimetype="text/event-stream", headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        })
+
+
+event_broker = EventBroker()
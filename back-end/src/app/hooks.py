@@ -3,18 +3,117 @@ Copyright (c) BakedInsights, Inc. and affiliates.
 All rights reserved.
 """
 
-from flask import g
-from flask_jwt_extended import get_jwt, verify_jwt_in_request
+from functools import wraps
+
+from flask import (current_app, g, has_app_context, has_request_context,
+                   jsonify, request)
+from flask_jwt_extended import (get_jwt, get_jwt_request_location,
+                                jwt_required, verify_jwt_in_request)
+from sqlalchemy import text
+
+# "scope" claim of the short-lived tokens made by AuthService.create_event_stream_token
+EVENT_STREAM_SCOPE = "events"
+EVENT_STREAM_LOCATIONS = ['headers', 'query_string']
+
+
+def accepts_event_stream_token() -> bool:
+    """ Whether the view handling the current request is an event stream (see event_stream_required) """
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, 'accepts_event_stream_token', False)
+
+
+def event_stream_required(view):
+    """
+    Protect an event stream view, like jwt_required but EventSource friendly
+
+    Browser EventSource can't send an Authorization header, so event streams
+    also take an event stream token in the query string (?token=<token>).
+    Regular access tokens are only accepted in the header, since URLs end up
+    in logs.
+    """
+    @wraps(view)
+    @jwt_required(locations=EVENT_STREAM_LOCATIONS)
+    def wrapper(*args, **kwargs):
+        if get_jwt_request_location() == 'query_string' and get_jwt().get('scope') != EVENT_STREAM_SCOPE:
+            return jsonify({"message": "Only event stream tokens are accepted in the query string"}), 401
+        return view(*args, **kwargs)
+
+    wrapper.accepts_event_stream_token = True
+    return wrapper
+
+
+def check_token_scope(jwt_header, jwt_data) -> bool:
+    """ Reject event stream tokens outside event stream views (JWTManager.token_verification_loader) """
+    return jwt_data.get('scope') != EVENT_STREAM_SCOPE or accepts_event_stream_token()
 
 
 def setup_tenant_context():
     """
-    Extract tenant_id from JWT and set PgSQL RLS
+    Extract tenant_id from JWT into g.tenant_id
+
+    On PostgreSQL every transaction of the request then runs with
+    app.tenant_id set (see configure_db_transaction), so row-level security
+    limits it to the tenant's rows.
     """
     # Verifies and decodes the token
-    if verify_jwt_in_request():
+    if verify_jwt_in_request(locations=EVENT_STREAM_LOCATIONS if accepts_event_stream_token() else None):
         claims = get_jwt()
         tenant_id = claims.get("tenant_id")
         g.tenant_id = tenant_id
     else:
         g.tenant_id = None
+
+
+def bypass_tenant_isolation():
+    """
+    Let the current app context's transactions see and write every tenant's rows
+
+    For code that works across tenants by design: scripts (init_db.py,
+    migrate_db.py, partition_db.py) and the worker's queue housekeeping.
+    Everything else runs with a tenant (see setup_tenant_context) and sees
+    no rows without one. Takes effect from the next transaction.
+    """
+    g.bypass_rls = True
+
+
+def configure_db_transaction(session, transaction, connection):
+    """
+    Scope each PostgreSQL transaction to the tenant and bound its statements
+
+    Runs when a session transaction begins (SQLAlchemy after_begin event);
+    connections used outside the session call it with their own transaction.
+    Sets app.tenant_id, read by the row-level security policies of tenant
+    tables (migrations 0006 and 0010), and app.bypass_rls (see
+    bypass_tenant_isolation), tags application_name with the tenant and sets
+    statement_timeout and idle_in_transaction_session_timeout. The settings
+    are transaction-local, so they never leak to the next user of a pooled
+    connection. DB_STATEMENT_TIMEOUT_MS and DB_IDLE_IN_TRANSACTION_TIMEOUT_MS
+    only apply to requests: scripts (migrate_db.py, partition_db.py) run
+    without a limit. A request or job can set its own statement limit with
+    g.statement_timeout_ms before its first query.
+    """
+    if connection.dialect.name != 'postgresql' or not has_app_context():
+        return
+
+    tenant_id = g.get('tenant_id')
+    application_name = current_app.config['DB_APPLICATION_NAME']
+    if tenant_id is not None:
+        application_name = f"{application_name} tenant={tenant_id}"
+    timeout = g.get('statement_timeout_ms',
+                    current_app.config['DB_STATEMENT_TIMEOUT_MS'] if has_request_context() else 0)
+    idle_timeout = current_app.config['DB_IDLE_IN_TRANSACTION_TIMEOUT_MS'] if has_request_context() else 0
+
+    connection.execute(
+        text("SELECT set_config('app.tenant_id', :tenant_id, true), "
+             "set_config('app.bypass_rls', :bypass_rls, true), "
+             "set_config('application_name', :application_name, true), "
+             "set_config('statement_timeout', :timeout, true), "
+             "set_config('idle_in_transaction_session_timeout', :idle_timeout, true)"),
+        {
+            'tenant_id': '' if tenant_id is None else str(int(tenant_id)),
+            'bypass_rls': 'on' if g.get('bypass_rls') else 'off',
+            'application_name': application_name[:63],
+            'timeout': str(int(timeout)),
+            'idle_timeout': str(int(idle_timeout)),
+        }
+    )
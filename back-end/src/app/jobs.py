@@ -0,0 +1,119 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+import os
+
+from app.services.archive_service import ArchiveService
+from app.services.column_migration_service import ColumnMigrationService
+from app.services.file_context_service import FileContextService
+from app.services.job_service import JobService
+from app.services.table_service import TableService
+from app.utils import FileProcessingService
+
+
+# Each handler takes the Job and a progress(fraction, message=None) callback
+# and returns a JSON-serializable result. Handlers run in a worker process
+# with an app context and g.tenant_id set to the job's tenant.
+
+
+def import_csv(job, progress):
+    """ Create a table from a staged CSV file (payload: file_path, name) """
+    progress(0, "Importing rows")
+    table, rows_imported = TableService.import_csv_file(
+        path=JobService.get_staged_path(job),
+        table_name=job.payload.get('name') or "Imported Table",
+        creator_id=job.created_by,
+        progress=progress
+    )
+    return {"table_id": table.id, "rows_imported": rows_imported}
+
+
+def process_excel(job, progress):
+    """ Read a staged workbook (payload: file_path, file_name, sheets, max_rows) """
+    if os.path.splitext(job.payload.get('file_name', ''))[1].lower() not in \
+            FileProcessingService.STREAMABLE_EXCEL_EXTENSIONS:
+        raise ValueError("Only .xlsx and .xlsm files can be processed in the background")
+
+    progress(0.1, "Reading workbook")
+    sheets = job.payload.get('sheets')
+    max_rows = job.payload.get('max_rows')
+    return FileProcessingService.process_excel_page(
+        JobService.get_staged_path(job),
+        sheets=[sheets] if isinstance(sheets, str) else sheets,
+        max_rows=int(max_rows) if max_rows else None,
+    )
+
+
+def process_pdf(job, progress):
+    """ Extract text from a staged PDF (payload: file_path, max_chars, pages) """
+    progress(0.1, "Extracting text")
+    max_chars = job.payload.get('max_chars')
+    pages = job.payload.get('pages')
+    return FileProcessingService.extract_pdf_text(
+        lambda: JobService.get_staged_path(job),
+        max_chars=int(max_chars) if max_chars else None,
+        pages=FileProcessingService.parse_page_range(pages) if pages else None,
+    )
+
+
+def ai_context(job, progress):
+    """ Build the AI file context (payload: the /api/files/ai-context filters) """
+
+    def id_list(value):
+        if value in (None, ''):
+            return []
+        return [int(item) for item in (value if isinstance(value, list) else [value])]
+
+    progress(0.1, "Collecting files")
+    all_file_contexts, formatted_context = FileContextService.get_file_context_for_ai(
+        sku=job.payload.get('sku'),
+        lot_number=job.payload.get('lot_number'),
+        start_date=job.payload.get('start_date'),
+        end_date=job.payload.get('end_date'),
+        table_ids=id_list(job.payload.get('table_ids')),
+        template_ids=id_list(job.payload.get('template_ids')),
+    )
+    return {"file_count": len(all_file_contexts), "formatted_context": formatted_context}
+
+
+def migrate_column(job, progress):
+    """ Convert a column's cells to a new data type (payload: migration_id) """
+    migration = ColumnMigrationService.run_migration(job.payload['migration_id'], progress=progress)
+    return {
+        "migration_id": migration.id,
+        "column_id": migration.column_id,
+        "data_type": migration.new_data_type,
+        "cells_failed": migration.cells_failed,
+    }
+
+
+def archive_tab(job, progress):
+    """ Move a tab's old records to an archive file (payload: tab_id, before or older_than_days) """
+    archive = ArchiveService.archive_tab(
+        tab_id=job.payload['tab_id'],
+        before=ArchiveService.parse_cutoff(job.payload.get('before'), job.payload.get('older_than_days')),
+        creator_id=job.created_by,
+        progress=progress
+    )
+    if archive is None:
+        return {"archive_id": None, "record_count": 0, "cell_count": 0}
+    return {"archive_id": archive.id, "record_count": archive.record_count, "cell_count": archive.cell_count}
+
+
+JOB_HANDLERS = {
+    "import_csv": import_csv,
+    "process_excel": process_excel,
+    "process_pdf": process_pdf,
+    "ai_context": ai_context,
+    "migrate_column": migrate_column,
+    "archive_tab": archive_tab,
+}
+
+# Kinds queued by their own endpoints after access checks, never through POST /api/jobs/<kind>
+INTERNAL_JOB_KINDS = {"migrate_column", "archive_tab"}
+
+# Kinds that need an uploaded file, staged by JobService.stage_file (payload file_path
+# and file_name are only set by the server, never taken from the client)
+FILE_JOB_KINDS = {"import_csv", "process_excel", "process_pdf"}
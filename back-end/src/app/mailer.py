@@ -0,0 +1,244 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+import atexit
+import heapq
+import itertools
+import os
+import queue
+import smtplib
+import threading
+import time
+import uuid
+
+from flask_mail import BadHeaderError, Message
+
+
+class MailQueueFull(Exception):
+    """ Raised when MAIL_QUEUE_SIZE messages are already waiting to be sent """
+
+
+class SMTPMailTransport:
+    """
+    Sends through the Flask-Mail SMTP settings (MAIL_SERVER, MAIL_PORT, ...)
+
+    One connection (including its TLS handshake and login) is kept open
+    across messages and closed once the queue has been idle for a while.
+    """
+
+    def __init__(self):
+        self._connection = None
+
+    def send(self, message: Message):
+        """ Send a message, connecting first if needed """
+        from app import mail
+
+        if self._connection is None:
+            self._connection = mail.connect().__enter__()
+        self._connection.send(message)
+
+    def close(self):
+        """ Close the connection (if any) """
+        if self._connection is not None:
+            try:
+                self._connection.__exit__(None, None, None)
+            except (smtplib.SMTPException, OSError):
+                pass  # The server already dropped it
+            self._connection = None
+
+
+class FileMailTransport:
+    """
+    Writes each message to MAIL_FILE_DIR as an .eml file instead of sending it
+
+    For local development and staging sites without an SMTP server.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def send(self, message: Message):
+        """ Write a message to its own file """
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{time.time_ns()}-{uuid.uuid4().hex[:8]}.eml")
+        with open(path, 'wb') as eml_file:
+            eml_file.write(message.as_bytes())
+
+    def close(self):
+        """ Nothing to close """
+
+
+class MemoryMailTransport:
+    """
+    Keeps sent messages in memory (outbox), for tests
+    """
+
+    def __init__(self):
+        self.outbox = []
+
+    def send(self, message: Message):
+        """ Append a message to the outbox """
+        self.outbox.append(message)
+
+    def close(self):
+        """ Nothing to close """
+
+
+class MailQueue:
+    """
+    Outbound mail queue with a background sender
+
+    send() only queues the message, so requests don't wait on the mail
+    server. A sender thread per process sends queued messages in batches
+    over one reused connection (see MAIL_TRANSPORT). A failed message is
+    held back until its retry time (exponential backoff) while the sender
+    goes on with the queue; after a connection failure the rest of the
+    batch is held back with it instead of failing message by message.
+    Messages are kept in memory: the queue is flushed for up to
+    SHUTDOWN_FLUSH_SECONDS when the process exits.
+    """
+
+    TRANSPORTS = ("smtp", "file", "memory")
+    SHUTDOWN_FLUSH_SECONDS = 10
+
+    # Failures that retrying cannot fix
+    PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, BadHeaderError, AssertionError)
+
+    def __init__(self):
+        self.app = None
+        self.transport = None
+        self._queue = None
+        self._retries = []  # heap of (not_before, sequence, attempt, message), sender thread only
+        self._sequence = itertools.count()
+        self._thread = None
+        self._lock = threading.Lock()
+        # Once per process: the sender thread may be started again (e.g. after a fork)
+        atexit.register(self._flush_on_exit)
+
+    def init_app(self, app):
+        """ Configure the transport from MAIL_TRANSPORT """
+        transport = app.config.get("MAIL_TRANSPORT", "smtp")
+        if transport not in self.TRANSPORTS:
+            raise ValueError(f"Invalid MAIL_TRANSPORT. Must be one of: {', '.join(self.TRANSPORTS)}")
+
+        if transport == "file":
+            self.transport = FileMailTransport(app.config["MAIL_FILE_DIR"])
+        elif transport == "memory":
+            self.transport = MemoryMailTransport()
+        else:
+            self.transport = SMTPMailTransport()
+
+        self.app = app
+        self._queue = queue.Queue(maxsize=app.config.get("MAIL_QUEUE_SIZE", 1000))
+        self._retries = []
+
+    def send(self, message: Message):
+        """
+        Queue a message for the sender thread
+
+        Args:
+            message: Flask-Mail message to send
+        """
+        self._start()
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            raise MailQueueFull("Too many emails are waiting to be sent, try again later")
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Wait until every queued message has been sent (or given up on), retries included
+
+        Args:
+            timeout: Maximum number of seconds to wait (default: no limit)
+
+        Returns:
+            Boolean indicating if the queue was emptied in time
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _start(self):
+        # Threads don't survive a fork, so each (gunicorn) worker starts its own
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="mail-sender", daemon=True)
+                self._thread.start()
+
+    def _flush_on_exit(self):
+        if self._thread is not None and self._thread.is_alive():
+            self.flush(self.SHUTDOWN_FLUSH_SECONDS)
+
+    def _run(self):
+        batch_size = self.app.config.get("MAIL_BATCH_SIZE", 50)
+        idle_seconds = self.app.config.get("MAIL_IDLE_SECONDS", 30)
+        backoff = self.app.config.get("MAIL_RETRY_BACKOFF_SECONDS", 2)
+
+        with self.app.app_context():
+            while True:
+                # Wait for new mail, or until the next held back message is due
+                timeout = idle_seconds
+                if self._retries:
+                    timeout = min(timeout, max(self._retries[0][0] - time.monotonic(), 0))
+                batch = []
+                try:
+                    batch.append((self._queue.get(timeout=timeout), 0))
+                except queue.Empty:
+                    pass
+
+                while self._retries and self._retries[0][0] <= time.monotonic() and len(batch) < batch_size:
+                    _, _, attempt, message = heapq.heappop(self._retries)
+                    batch.append((message, attempt))
+
+                if not batch:
+                    if not self._retries:
+                        self.transport.close()
+                    continue
+
+                # Send whatever else is already waiting over the same connection
+                while len(batch) < batch_size:
+                    try:
+                        batch.append((self._queue.get_nowait(), 0))
+                    except queue.Empty:
+                        break
+
+                for index, (message, attempt) in enumerate(batch):
+                    if self._deliver(message, attempt):
+                        self._queue.task_done()
+                        continue
+
+                    # The server is likely unreachable: hold the rest of the batch back too
+                    not_before = time.monotonic() + backoff * 2 ** attempt
+                    heapq.heappush(self._retries, (not_before, next(self._sequence), attempt + 1, message))
+                    for held_message, held_attempt in batch[index + 1:]:
+                        heapq.heappush(self._retries, (not_before, next(self._sequence), held_attempt, held_message))
+                    break
+
+    def _deliver(self, message: Message, attempt: int) -> bool:
+        """ Try to send one message; returns False if it should be retried later """
+        max_retries = self.app.config.get("MAIL_MAX_RETRIES", 5)
+
+        try:
+            self.transport.send(message)
+        except self.PERMANENT_ERRORS:
+            self.app.logger.exception("Dropping email to %s", message.recipients)
+        except Exception:
+            # Start over on a fresh connection
+            self.transport.close()
+            if attempt < max_retries:
+                self.app.logger.warning("Error sending email to %s, retrying", message.recipients)
+                return False
+            self.app.logger.exception("Giving up on email to %s after %s attempts",
+                                      message.recipients, attempt + 1)
+        return True
+
+
+mail_queue = MailQueue()
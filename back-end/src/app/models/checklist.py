@@ -23,6 +23,8 @@ class ChecklistTemplate(TenantScopedModel):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     archived = db.Column(db.Boolean, default=False, nullable=True)
+    # Change counter, bumped on every write to the template or its fields
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     # --
     fields = db.relationship('ChecklistField', backref='template', lazy=True)
     checklists = db.relationship('Checklist', backref='template', lazy=True)
@@ -41,6 +43,10 @@ class ChecklistField(TenantScopedModel):
     complete_by_time = db.Column(db.Time, nullable=True)
     order = db.Column(db.Integer, nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_checklist_field_tenant_id_template_id', 'tenant_id', 'template_id'),
+    )
+
 
 class Checklist(TenantScopedModel):
     """
@@ -54,9 +60,15 @@ class Checklist(TenantScopedModel):
     template_id = db.Column(db.Integer, db.ForeignKey('checklist_template.id'), nullable=False)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     submitted = db.Column(db.Boolean, nullable=True)
+    # Change counter, bumped on every write to the checklist or its items
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     # --
     items = db.relationship('ChecklistItem', backref='checklist', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_checklist_tenant_id_template_id', 'tenant_id', 'template_id'),
+    )
+
 
 class ChecklistItem(TenantScopedModel):
     """
@@ -80,6 +92,11 @@ class ChecklistItem(TenantScopedModel):
     completed_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
     updated_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_checklist_item_tenant_id_checklist_id', 'tenant_id', 'checklist_id'),
+        db.Index('ix_checklist_item_tenant_id_field_id', 'tenant_id', 'field_id'),
+    )
+
 
 class ChecklistAssignment(TenantScopedModel):
     """
@@ -91,3 +108,7 @@ class ChecklistAssignment(TenantScopedModel):
     template_id = db.Column(db.Integer, db.ForeignKey('checklist_template.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     assigned_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_checklist_assignment_tenant_id_user_id', 'tenant_id', 'user_id'),
+    )
@@ -0,0 +1,39 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+from datetime import datetime
+
+from app import db
+from app.models.tenant import TenantScopedModel
+
+
+class Job(TenantScopedModel):
+    """
+    Job Model - Represents background work such as CSV imports and file processing
+
+    Jobs are queued by the API and claimed by worker processes (run_worker.py),
+    which report progress and store the result or error on the job
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    progress = db.Column(db.Float, nullable=False, default=0)  # 0 to 1
+    progress_message = db.Column(db.String(255), nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True)  # last progress report, used to detect dead workers
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # Workers claim the oldest queued job
+        db.Index('ix_job_status_id', 'status', 'id'),
+        # Users list their own jobs, newest first
+        db.Index('ix_job_tenant_id_created_by_id', 'tenant_id', 'created_by', 'id'),
+    )
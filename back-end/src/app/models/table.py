@@ -8,6 +8,7 @@ from datetime import datetime
 
 from app import db
 from app.models.tenant import TenantScopedModel
+from sqlalchemy.dialects.postgresql import JSONB
 
 
 class Table(TenantScopedModel):
@@ -21,6 +22,8 @@ class Table(TenantScopedModel):
     name = db.Column(db.String(200), nullable=False)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Change counter, bumped on every write to the table, its tabs or its data
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     tabs = db.relationship('TableTab', backref='table', lazy=True)
     shares = db.relationship('TableShare', backref='table', lazy=True)
@@ -31,11 +34,22 @@ class TableTab(TenantScopedModel):
     TableTab Model - Represents different tabs within a table
 
     Allows organization of data into separate views/sheets
+    Cells are stored as TableData rows, or as one document per record for
+    "document" tabs (see TabStorageService)
     """
+    STORAGE_MODES = ('cells', 'document')
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     table_id = db.Column(db.Integer, db.ForeignKey('table.id'), nullable=False)
     tab_index = db.Column(db.Integer, nullable=False)
+    storage_mode = db.Column(db.String(20), nullable=False, default='cells', server_default='cells')
+    # Latest version whose TableChange rows were pruned; clients behind it must reload the tab
+    changes_pruned_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (
+        db.Index('ix_table_tab_tenant_id_table_id', 'tenant_id', 'table_id'),
+    )
 
     columns = db.relationship('TableColumn', backref='table_tab', lazy=True)
     records = db.relationship('TableRecord', backref='table_tab', lazy=True)
@@ -56,18 +70,28 @@ class TableColumn(TenantScopedModel):
 
     table_data = db.relationship('TableData', backref='table_column', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_table_column_tenant_id_tab_id', 'tenant_id', 'tab_id'),
+    )
+
 class TableRecord(TenantScopedModel):
     """
     TableRecord Model - Defines a single row (aka record) in a table
 
     Maintains TableData grouping for displaing rows
+    Records of "document" tabs hold their cells in data instead: {column_id: value}
     """
     id = db.Column(db.Integer, primary_key=True)
     tab_id = db.Column(db.Integer, db.ForeignKey('table_tab.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    data = db.Column(db.JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql'), nullable=True)
 
     table_data = db.relationship('TableData', backref='table_record', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_table_record_tenant_id_tab_id_id', 'tenant_id', 'tab_id', 'id'),
+    )
+
 class TableData(TenantScopedModel):
     """
     TableData Model - Stores the actual data within tables
@@ -90,6 +114,15 @@ class TableData(TenantScopedModel):
 
     value_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
 
+    # One cell per record and column; cell writes upsert against this constraint
+    UNIQUE_CELL_CONSTRAINT = 'uq_table_data_record_column'
+    __table_args__ = (
+        db.UniqueConstraint('record_id', 'column_id', name=UNIQUE_CELL_CONSTRAINT),
+        # Column-wide scans (type migrations, column deletes) walk a column's cells in id order
+        db.Index('ix_table_data_column_id_id', 'column_id', 'id'),
+        db.Index('ix_table_data_tenant_id_tab_id', 'tenant_id', 'tab_id'),
+    )
+
 
 class TableShare(TenantScopedModel):
     """
@@ -101,3 +134,98 @@ class TableShare(TenantScopedModel):
     table_id = db.Column(db.Integer, db.ForeignKey('table.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     shared_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_table_share_tenant_id_user_id', 'tenant_id', 'user_id'),
+    )
+
+
+class TableChange(TenantScopedModel):
+    """
+    TableChange Model - Append-only log of writes to a tab's records and cells
+
+    Each change is stamped with the table version (see Table.version) of the
+    transaction that made it, so clients can sync a tab from a known version.
+    Operations: "update" (one cell), "insert" (all cells of a new record),
+    "delete" (record removed), "schema" (columns changed, reload the tab).
+    Changes older than TABLE_CHANGE_RETENTION_DAYS are pruned by the worker
+    (see TableService.prune_table_changes).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    tab_id = db.Column(db.Integer, db.ForeignKey('table_tab.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(20), nullable=False)
+    record_id = db.Column(db.Integer, nullable=True)
+    column_id = db.Column(db.Integer, nullable=True)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_table_change_tab_version', 'tab_id', 'version'),
+        db.Index('ix_table_change_changed_at', 'changed_at'),
+    )
+
+
+class ColumnMigration(TenantScopedModel):
+    """
+    ColumnMigration Model - Checkpoint of a column data type change
+
+    Cells are converted in batches of ids (see ColumnMigrationService):
+    "copy" writes converted values next to the originals while the column
+    keeps its old type, the column then switches type, and "cleanup" clears
+    the original values. last_id is the last cell id done in the current
+    phase, so a failed or interrupted migration resumes where it stopped
+    (unless a later type change of the column cancelled it).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    column_id = db.Column(db.Integer, db.ForeignKey('table_column.id'), nullable=False)
+    tab_id = db.Column(db.Integer, db.ForeignKey('table_tab.id'), nullable=False)
+    prev_data_type = db.Column(db.String(50), nullable=False)
+    new_data_type = db.Column(db.String(50), nullable=False)
+    strict = db.Column(db.Boolean, nullable=False, default=False)
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, succeeded, failed, cancelled
+    phase = db.Column(db.String(20), nullable=False, default='copy')  # copy, cleanup
+    first_id = db.Column(db.Integer, nullable=True)  # id range of the column's cells when the phase started
+    max_id = db.Column(db.Integer, nullable=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    cells_failed = db.Column(db.Integer, nullable=True)  # cells that could not be converted (set at the switch)
+    error = db.Column(db.Text, nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_column_migration_column_id', 'column_id'),
+        # Only one migration of a column may be running
+        db.Index('ix_column_migration_tenant_id_running', 'tenant_id', 'column_id',
+                 postgresql_where=db.text("status = 'running'"), sqlite_where=db.text("status = 'running'")),
+    )
+
+
+class TableArchive(TenantScopedModel):
+    """
+    TableArchive Model - A file of records moved out of a tab (see ArchiveService)
+
+    Each archive holds the cells of the tab's records created before cutoff,
+    one row per cell sorted by record ID, in a compressed Parquet file of the
+    archive store. The record ID and creation time ranges let reads skip
+    archives that cannot hold the records they look for.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    tab_id = db.Column(db.Integer, db.ForeignKey('table_tab.id'), nullable=False)
+    storage = db.Column(db.String(20), nullable=False)  # archive store backend: local, s3
+    path = db.Column(db.String(255), nullable=False)  # key in the archive store
+    cutoff = db.Column(db.DateTime, nullable=False)
+    record_count = db.Column(db.Integer, nullable=False)
+    cell_count = db.Column(db.Integer, nullable=False)
+    size_bytes = db.Column(db.BigInteger, nullable=False)
+    min_record_id = db.Column(db.Integer, nullable=False)
+    max_record_id = db.Column(db.Integer, nullable=False)
+    min_created_at = db.Column(db.DateTime, nullable=True)
+    max_created_at = db.Column(db.DateTime, nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_table_archive_tenant_id_tab_id_min_record_id', 'tenant_id', 'tab_id', 'min_record_id'),
+    )
@@ -4,11 +4,21 @@ All rights reserved.
 """
 
 from app import db
+from sqlalchemy import event
 from sqlalchemy.ext.declarative import declared_attr
 
+# Row-level security policy of tenant-scoped tables on PostgreSQL: only rows of
+# the transaction's app.tenant_id (see configure_db_transaction), and no rows
+# when no tenant is set, unless the transaction explicitly sets app.bypass_rls
+# (scripts and the worker's queue housekeeping, see bypass_tenant_isolation)
+TENANT_POLICY = (
+    "current_setting('app.bypass_rls', true) = 'on' "
+    "OR tenant_id = CAST(NULLIF(current_setting('app.tenant_id', true), '') AS INTEGER)"
+)
+
 
 class TenantScopedModel(db.Model):
-    """ Abstract table class enforcing RLS based on tenant_id """
+    """ Abstract table class enforcing RLS based on tenant_id (see TENANT_POLICY) """
 
     __abstract__ = True
 
@@ -23,3 +33,19 @@ class Tenant(db.Model):
     """
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def enable_row_level_security(metadata, connection, **kw):
+    """ Apply TENANT_POLICY to tenant-scoped tables created by create_all (see migration 0006) """
+    if connection.dialect.name != 'postgresql':
+        return
+
+    for table in kw.get('tables') or metadata.sorted_tables:
+        if 'tenant_id' not in table.c:
+            continue
+        name = connection.dialect.identifier_preparer.quote(table.name)
+        connection.exec_driver_sql(f"ALTER TABLE {name} ENABLE ROW LEVEL SECURITY")
+        connection.exec_driver_sql(f"ALTER TABLE {name} FORCE ROW LEVEL SECURITY")
+        connection.exec_driver_sql(f"DROP POLICY IF EXISTS tenant_isolation ON {name}")
+        connection.exec_driver_sql(f"CREATE POLICY tenant_isolation ON {name} USING ({TENANT_POLICY})")
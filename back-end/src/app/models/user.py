@@ -6,7 +6,7 @@ All rights reserved.
 
 from app import db
 from app.models.tenant import TenantScopedModel
-from werkzeug.security import check_password_hash, generate_password_hash
+from app.passwords import password_hasher
 
 
 class User(TenantScopedModel):
@@ -32,9 +32,13 @@ class User(TenantScopedModel):
     )
 
     def set_password(self, password):
-        """Hash and set the user's password"""
-        self.password_hash = generate_password_hash(password)
+        """Hash and set the user's password (with PASSWORD_HASH_METHOD)"""
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
         """Verify the user's password"""
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """Check whether the password hash predates the current hashing policy"""
+        return password_hasher.needs_rehash(self.password_hash)
@@ -0,0 +1,104 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """ Raised when a password could not be hashed within PASSWORD_HASH_TIMEOUT_SECONDS """
+
+
+class PasswordHasher:
+    """
+    Password hashing policy
+
+    Hashes use PASSWORD_HASH_METHOD (a werkzeug method with its cost, e.g.
+    "scrypt:32768:8:1" or "pbkdf2:sha256:600000"); hashes made under another
+    policy are upgraded on the next successful login (see needs_rehash).
+
+    Hashing runs on a bounded pool of PASSWORD_HASH_WORKERS threads per
+    process (hashlib releases the GIL), so a burst of logins queues instead
+    of oversubscribing the CPU, and callers give up after
+    PASSWORD_HASH_TIMEOUT_SECONDS. Successful verifications can be cached for
+    PASSWORD_VERIFY_CACHE_SECONDS (off by default) to skip re-hashing on repeated logins.
+    """
+
+    VERIFY_CACHE_SIZE = 10000
+
+    def __init__(self):
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._method_prefixes = {}
+        self._verified = OrderedDict()  # cache key -> expiry
+        self._cache_key = os.urandom(32)
+
+    def hash(self, password: str) -> str:
+        """ Hash a password with the configured policy """
+        return self._run(generate_password_hash, password, method=current_app.config['PASSWORD_HASH_METHOD'])
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        """ Check a password against its hash """
+        if not password_hash:
+            return False
+
+        cache_seconds = current_app.config.get('PASSWORD_VERIFY_CACHE_SECONDS', 0)
+        if cache_seconds:
+            # Keyed by the stored hash too, so a password change invalidates the entry
+            key = hmac.new(self._cache_key, f"{password_hash}\0{password}".encode(), hashlib.sha256).digest()
+            with self._lock:
+                expiry = self._verified.get(key)
+                if expiry is not None and expiry > time.monotonic():
+                    return True
+
+        verified = self._run(check_password_hash, password_hash, password)
+
+        if verified and cache_seconds:
+            with self._lock:
+                self._verified[key] = time.monotonic() + cache_seconds
+                self._verified.move_to_end(key)
+                while len(self._verified) > self.VERIFY_CACHE_SIZE:
+                    self._verified.popitem(last=False)
+        return verified
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """ Check whether a hash was made under a different policy than the configured one """
+        method = current_app.config['PASSWORD_HASH_METHOD']
+        if method not in self._method_prefixes:
+            # Normalize the configured method (e.g. "scrypt" -> "scrypt:32768:8:1")
+            self._method_prefixes[method] = generate_password_hash('', method=method).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._method_prefixes[method]
+
+    def _run(self, function, *args, **kwargs):
+        future = self._get_executor().submit(function, *args, **kwargs)
+        try:
+            return future.result(timeout=current_app.config.get('PASSWORD_HASH_TIMEOUT_SECONDS', 10))
+        except FutureTimeoutError:
+            future.cancel()
+            raise PasswordHasherBusy("Too many logins at once, try again shortly")
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Pools don't survive a fork, so each (gunicorn) worker creates its own
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('PASSWORD_HASH_WORKERS', 2),
+                    thread_name_prefix="password-hash"
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+
+password_hasher = PasswordHasher()
@@ -5,6 +5,8 @@ All rights reserved.
 
 import time
 
+from app.mailer import MailQueueFull
+from app.passwords import PasswordHasherBusy
 from app.services.auth_service import AuthService
 from app.services.user_service import UserService
 from flask import Blueprint, g, jsonify, request, session
@@ -37,7 +39,10 @@ def login(tenant_id):
     if not data or 'username' not in data or 'password' not in data:
         return jsonify({"message": "Missing username or password"}), 400
 
-    result = AuthService.login(data['username'], data['password'])
+    try:
+        result = AuthService.login(data['username'], data['password'])
+    except PasswordHasherBusy as e:
+        return jsonify({"message": str(e)}), 503, {"Retry-After": "1"}
 
     if result:
         return jsonify(result), 200
@@ -60,7 +65,12 @@ def forgot_password(tenant_id):
     if not data or 'email' not in data:
         return jsonify({"message": "Missing email"}), 400
 
-    if AuthService.forgot_password(data['email']):
+    try:
+        sent = AuthService.forgot_password(data['email'])
+    except MailQueueFull as e:
+        return jsonify({"message": str(e)}), 503, {"Retry-After": "30"}
+
+    if sent:
         return jsonify({"message": "Verification code sent"}), 200
 
     return jsonify({"message": "Invalid email"}), 401
@@ -3,12 +3,14 @@ Copyright (c) BakedInsights, Inc. and affiliates.
 All rights reserved.
 """
 
-from app.hooks import setup_tenant_context
+from app.events import event_broker
+from app.hooks import event_stream_required, setup_tenant_context
 from app.services.auth_service import AuthService
 from app.services.checklist_service import ChecklistService
 from app.services.user_service import UserService
 from app.types import ADMIN_ROLES, SUPER_ADMIN_ROLES
-from flask import Blueprint, jsonify, request
+from app.utils import ConditionalResponse, FileManager
+from flask import Blueprint, g, jsonify, request
 from flask_jwt_extended import get_jwt_identity, jwt_required
 
 
@@ -156,15 +158,25 @@ def get_template(template_id):
             }
         ],
     }
+
+    Responses carry an ETag derived from the template's change counter; requests
+    with a matching If-None-Match header get an empty 304 response.
     """
     if not ChecklistService.validate_user_for_template(user_id=get_current_user_id(), template_id=template_id):
         return jsonify({"message": "Unauthorized"}), 403
 
     try:
+        etag = ConditionalResponse.make_etag(
+            "template", template_id,
+            ChecklistService.get_template_version(template_id),
+        )
+        if ConditionalResponse.is_not_modified(etag):
+            return ConditionalResponse.not_modified(etag)
+
         template = ChecklistService.get_template(template_id)
         template["created_by_username"] = UserService.get_user_by_id(user_id=template["created_by"]).username
         del template["created_by"]
-        return jsonify(template), 200
+        return ConditionalResponse.tag(jsonify(template), etag), 200
     except Exception as e:
         return jsonify({"message": "Error getting template", "error": str(e)}), 500
 
@@ -294,17 +306,47 @@ def get_checklist(checklist_id):
             "completed_at": string | None
         }
     ],
+
+    Responses carry an ETag derived from the checklist's change counter; requests
+    with a matching If-None-Match header get an empty 304 response.
     """
     if not ChecklistService.validate_user_for_checklist(user_id=get_current_user_id(), checklist_id=checklist_id):
         return jsonify({"message": "Unauthorized"}), 403
 
     try:
+        etag = ConditionalResponse.make_etag(
+            "checklist", checklist_id,
+            ChecklistService.get_checklist_version(checklist_id),
+            FileManager.get_presigned_url_window(),
+        )
+        if ConditionalResponse.is_not_modified(etag):
+            return ConditionalResponse.not_modified(etag)
+
         checklist_items = ChecklistService.get_checklist(checklist_id)
-        return jsonify(checklist_items), 200
+        return ConditionalResponse.tag(jsonify(checklist_items), etag), 200
     except Exception as e:
         return jsonify({"message": "Error getting template", "error": str(e)}), 500
 
 
+@checklist_bp.route('/<int:checklist_id>/events', methods=['GET'])
+@event_stream_required
+def stream_checklist_events(checklist_id):
+    """
+    Checklist Event Stream Endpoint (text/event-stream)
+
+    Streams an event after every committed item update or submission:
+        event: checklist
+        data: {"checklist_id": int, "item_id": int | null, "op": string}
+
+    A "resync" event means events were dropped and clients should reload.
+    Authenticated with the Authorization header or ?token=<token from POST /api/events/token>.
+    """
+    if not ChecklistService.validate_user_for_checklist(user_id=get_current_user_id(), checklist_id=checklist_id):
+        return jsonify({"message": "Unauthorized"}), 403
+
+    return event_broker.stream([event_broker.channel(g.tenant_id, "checklist", checklist_id)])
+
+
 @checklist_bp.route('/<int:checklist_id>', methods=['DELETE'])
 @jwt_required()
 def delete_checklist(checklist_id):
@@ -0,0 +1,81 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+from app.events import event_broker
+from app.hooks import event_stream_required, setup_tenant_context
+from app.services.auth_service import AuthService
+from app.types import ADMIN_ROLES, SUPER_ADMIN_ROLES
+from flask import Blueprint, current_app, g, jsonify
+from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
+
+
+def get_current_user_id():
+    """Helper function to get current user ID as integer"""
+    return int(get_jwt_identity())
+
+
+event_bp = Blueprint('events', __name__)
+event_bp.before_request(setup_tenant_context)
+
+
+@event_bp.route('/token', methods=['POST'])
+@jwt_required()
+def create_event_stream_token():
+    """
+    Event Stream Token Endpoint
+
+    Browser EventSource can't send an Authorization header, so event streams
+    (GET /api/events/, /api/tables/<table_id>/events, /api/checklists/<checklist_id>/events)
+    also accept this short-lived token in the query string:
+
+        const { token } = await (await fetch('/api/events/token', {method: 'POST', headers})).json();
+        const source = new EventSource(`/api/tables/${tableId}/events?token=${token}`);
+
+    The token is only checked when the stream connects, so fetch a new one
+    before each reconnect. It isn't accepted by any other endpoint.
+
+    Returns:
+    {
+        "token": string,
+        "expires_in": integer (seconds)
+    }
+    """
+    try:
+        claims = get_jwt()
+        token = AuthService.create_event_stream_token(
+            user_id=get_current_user_id(),
+            tenant_id=claims.get('tenant_id'),
+            role=claims.get('role')
+        )
+        return jsonify({
+            "token": token,
+            "expires_in": current_app.config['EVENT_STREAM_TOKEN_SECONDS']
+        }), 200
+    except Exception as e:
+        return jsonify({"message": "Error creating event stream token", "error": str(e)}), 500
+
+
+@event_bp.route('/', methods=['GET'])
+@event_stream_required
+def stream_tenant_events():
+    """
+    Tenant Event Stream Endpoint (text/event-stream)
+    Only accessible by admin and super_admin roles
+
+    Authenticated with the Authorization header or ?token=<token from POST /token>
+
+    Streams "table" and "checklist" events for every table and checklist of the tenant:
+        event: table
+        data: {"table_id": int, "tab_id": int, "version": int, "op": string}
+
+        event: checklist
+        data: {"checklist_id": int, "item_id": int | null, "op": string}
+
+    A "resync" event means events were dropped and clients should reload.
+    """
+    if not AuthService.validate_user_role(get_current_user_id(), SUPER_ADMIN_ROLES + ADMIN_ROLES):
+        return jsonify({"message": "Unauthorized"}), 403
+
+    return event_broker.stream([event_broker.channel(g.tenant_id)])
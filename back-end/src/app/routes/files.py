@@ -3,13 +3,15 @@ Copyright (c) BakedInsights, Inc. and affiliates.
 All rights reserved.
 """
 
+import json
 import os
+import shutil
 import tempfile
 
 from app.hooks import setup_tenant_context
 from app.services.file_context_service import FileContextService
-from app.utils import FileProcessingService
-from flask import Blueprint, jsonify, request
+from app.utils import FileManager, FileProcessingService
+from flask import Blueprint, Response, current_app, jsonify, request
 from flask_jwt_extended import jwt_required
 
 file_bp = Blueprint('files', __name__)
@@ -22,6 +24,14 @@ def process_excel():
     Process Excel File Endpoint
 
     Takes an Excel file in the request and returns processed data
+
+    Form Parameters:
+        format: "ndjson" to stream rows as newline-delimited JSON events, or
+                "paged" for one page of rows per sheet (.xlsx/.xlsm only);
+                the whole workbook is returned at once when omitted
+        sheets: Names of the sheets to read (can be multiple; default all)
+        offset: Number of data rows to skip in each sheet
+        max_rows: Maximum number of data rows per sheet (paged default: EXCEL_PAGE_SIZE)
     """
     if 'file' not in request.files:
         return jsonify({"message": "No file provided"}), 400
@@ -33,29 +43,84 @@ def process_excel():
     if not allowed_excel_file(file.filename):
         return jsonify({"message": "File type not allowed"}), 400
 
-    try:
-        # Save the file temporarily
-        temp_file = tempfile.NamedTemporaryFile(delete=False)
-        file.save(temp_file.name)
-        temp_file.close()
-
-        # Process the Excel file
-        data = FileProcessingService.process_excel(temp_file.name)
+    output_format = request.form.get('format')
+    if output_format:
+        return process_excel_streaming(file, output_format)
 
-        # Clean up
-        os.unlink(temp_file.name)
+    try:
+        # Process the Excel file straight from the upload buffer
+        data = FileProcessingService.process_excel(file.stream)
 
         return jsonify(data), 200
     except Exception as e:
         return jsonify({"message": f"Error processing file: {str(e)}"}), 500
 
 
+def process_excel_streaming(file, output_format):
+    """ Read an uploaded workbook in read-only mode as NDJSON or paged JSON """
+    if output_format not in ('ndjson', 'paged'):
+        return jsonify({"message": "Invalid format. Must be one of: ndjson, paged"}), 400
+
+    if os.path.splitext(file.filename)[1].lower() not in FileProcessingService.STREAMABLE_EXCEL_EXTENSIONS:
+        return jsonify({"message": "Streaming is only supported for .xlsx and .xlsm files"}), 400
+
+    try:
+        sheets = request.form.getlist('sheets') or None
+        offset = int(request.form.get('offset') or 0)
+        max_rows = int(request.form['max_rows']) if request.form.get('max_rows') else None
+        if offset < 0 or (max_rows is not None and max_rows < 0):
+            raise ValueError
+    except ValueError:
+        return jsonify({"message": "offset and max_rows must be non-negative integers"}), 400
+
+    if output_format == 'paged':
+        try:
+            data = FileProcessingService.process_excel_page(
+                file.stream,
+                sheets=sheets,
+                offset=offset,
+                max_rows=max_rows if max_rows is not None else current_app.config.get('EXCEL_PAGE_SIZE', 1000),
+            )
+            return jsonify(data), 200
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+        except Exception as e:
+            return jsonify({"message": f"Error processing file: {str(e)}"}), 500
+
+    # Upload buffers are closed with the request, before the response is streamed,
+    # so the stream reads from its own spooled copy
+    buffer = tempfile.SpooledTemporaryFile(max_size=FileManager.SPOOL_MAX_MEMORY)
+    shutil.copyfileobj(file.stream, buffer)
+    buffer.seek(0)
+
+    def generate():
+        try:
+            for event in FileProcessingService.iter_excel_rows(
+                buffer, sheets=sheets, offset=offset, max_rows=max_rows
+            ):
+                yield json.dumps(event, default=str) + "\n"
+        except Exception as e:
+            # Headers are already sent; report the error as the last event
+            yield json.dumps({"error": f"Error processing file: {str(e)}"}) + "\n"
+        finally:
+            buffer.close()
+
+    response = Response(generate(), mimetype='application/x-ndjson')
+    # Also release the copy if the client disconnects before the stream starts
+    response.call_on_close(buffer.close)
+    return response
+
+
 @file_bp.route('/process-pdf', methods=['POST'])
 def process_pdf():
     """
     Process PDF File Endpoint
 
     Takes a PDF file in the request and returns extracted text
+
+    Form Parameters:
+        max_chars: Stop extracting once this many characters are collected
+        pages: Page number or range to extract (e.g. "3" or "2-5")
     """
     if 'file' not in request.files:
         return jsonify({"message": "No file provided"}), 400
@@ -68,16 +133,14 @@ def process_pdf():
         return jsonify({"message": "File type not allowed"}), 400
 
     try:
-        # Save the file temporarily
-        temp_file = tempfile.NamedTemporaryFile(delete=False)
-        file.save(temp_file.name)
-        temp_file.close()
+        max_chars = int(request.form['max_chars']) if request.form.get('max_chars') else None
+        pages = FileProcessingService.parse_page_range(request.form['pages']) if request.form.get('pages') else None
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
 
-        # Process the PDF file
-        text = FileProcessingService.process_pdf(temp_file.name)
-
-        # Clean up
-        os.unlink(temp_file.name)
+    try:
+        # Process the PDF file straight from the upload buffer
+        text = FileProcessingService.process_pdf(file.stream, max_chars=max_chars, pages=pages)
 
         return jsonify({"text": text}), 200
     except Exception as e:
@@ -109,6 +172,8 @@ def get_context_for_ai():
         end_date: End date for date range
         table_ids: Table IDs to filter by (can be multiple)
         checklist_ids: Checklist IDs to filter by (can be multiple)
+        max_chars: Character budget for the context (capped at AI_CONTEXT_MAX_CHARS)
+        stream: If "true", stream the formatted context as text/plain
 
     Returns:
         Structured file context information for AI
@@ -126,6 +191,18 @@ def get_context_for_ai():
     template_ids = request.args.getlist('template_ids')
     template_ids = [int(id) for id in template_ids] if template_ids else []
 
+    max_chars = current_app.config.get('AI_CONTEXT_MAX_CHARS', 100000)
+    if request.args.get('max_chars'):
+        try:
+            requested_chars = int(request.args.get('max_chars'))
+        except ValueError:
+            return jsonify({"message": "max_chars must be an integer"}), 400
+        if requested_chars <= 0:
+            return jsonify({"message": "max_chars must be positive"}), 400
+        max_chars = min(requested_chars, max_chars) if max_chars else requested_chars
+
+    stream = request.args.get('stream', '').lower() == 'true'
+
     try:
         all_file_contexts, formatted_context = FileContextService.get_file_context_for_ai(
             sku=sku,
@@ -133,9 +210,16 @@ def get_context_for_ai():
             start_date=start_date,
             end_date=end_date,
             table_ids=table_ids,
-            template_ids=template_ids
+            template_ids=template_ids,
+            max_chars=max_chars,
+            stream=stream,
         )
 
+        if stream:
+            return Response(formatted_context, mimetype='text/plain', headers={
+                "X-File-Count": str(len(all_file_contexts)),
+            })
+
         if (all_file_contexts is not None) and (formatted_context is not None):
             return jsonify({
                 "file_count": len(all_file_contexts),
@@ -0,0 +1,165 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+import os
+
+from app.hooks import setup_tenant_context
+from app.jobs import INTERNAL_JOB_KINDS
+from app.services.job_service import JobService
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import get_jwt_identity, jwt_required
+
+
+def get_current_user_id():
+    """Helper function to get current user ID as integer"""
+    return int(get_jwt_identity())
+
+
+def serialize_job(job):
+    """Helper function to build the status payload of a job"""
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "progress_message": job.progress_message,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+job_bp = Blueprint('jobs', __name__)
+job_bp.before_request(setup_tenant_context)
+
+
+@job_bp.route('/<kind>', methods=['POST'])
+@jwt_required()
+def submit_job(kind):
+    """
+    Submit Job Endpoint
+
+    Kinds:
+        import_csv: file, name
+        process_excel: file (.xlsx/.xlsm), sheets, max_rows
+        process_pdf: file, max_chars, pages
+        ai_context: the filters of GET /api/files/ai-context
+
+    Accepts multipart/form-data (required for file jobs) or a JSON body of job arguments.
+    Column migrations and archives are only queued by PUT /api/tables/columns and
+    POST /api/tables/tabs/<tab_id>/archive (with "async"), which check access to the tab.
+
+    Returns:
+    {
+        "message": string,
+        "job": job status (see get_job)
+    }
+    """
+    try:
+        if kind in INTERNAL_JOB_KINDS:
+            raise ValueError(f"{kind} jobs can't be submitted directly")
+
+        if request.is_json:
+            payload = request.get_json() or {}
+        else:
+            payload = {
+                key: values if len(values) > 1 else values[0]
+                for key, values in request.form.lists()
+            }
+
+        # The worker reads (and deletes) file_path, so only a file staged here may set it
+        payload.pop('file_path', None)
+        payload.pop('file_name', None)
+
+        staged_path = None
+        file = request.files.get('file')
+        if file is not None and file.filename:
+            staged_path = JobService.stage_file(file)
+            payload['file_name'] = file.filename
+            payload['file_path'] = staged_path
+
+        try:
+            job = JobService.submit(kind=kind, payload=payload, creator_id=get_current_user_id())
+        except Exception:
+            # Nobody will process the staged file
+            if staged_path and os.path.exists(staged_path):
+                os.unlink(staged_path)
+            raise
+
+        return jsonify({
+            "message": "Job submitted",
+            "job": serialize_job(job)
+        }), 202
+
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    except Exception as e:
+        return jsonify({"message": "Error submitting job", "error": str(e)}), 500
+
+
+@job_bp.route('/', methods=['GET'])
+@jwt_required()
+def get_jobs():
+    """
+    Get the current user's recent jobs (newest first)
+    """
+    try:
+        jobs = JobService.get_user_jobs(user_id=get_current_user_id())
+        return jsonify([serialize_job(job) for job in jobs]), 200
+    except Exception as e:
+        return jsonify({"message": "Error getting jobs", "error": str(e)}), 500
+
+
+@job_bp.route('/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """
+    Get Job Status Endpoint
+
+    Returns:
+    {
+        "id": int,
+        "kind": string,
+        "status": "queued" | "running" | "succeeded" | "failed",
+        "progress": float (0 to 1),
+        "progress_message": string,
+        "error": string,
+        "created_at": datetime,
+        "started_at": datetime,
+        "finished_at": datetime
+    }
+    """
+    try:
+        job = JobService.get_job(job_id=job_id, user_id=get_current_user_id())
+        if not job:
+            return jsonify({"message": "Job not found"}), 404
+        return jsonify(serialize_job(job)), 200
+    except Exception as e:
+        return jsonify({"message": "Error getting job", "error": str(e)}), 500
+
+
+@job_bp.route('/<int:job_id>/result', methods=['GET'])
+@jwt_required()
+def get_job_result(job_id):
+    """
+    Get Job Result Endpoint
+
+    Responds 200 with the result once the job succeeded, 202 with its status
+    while it is queued or running, and 409 with the error if it failed.
+    """
+    try:
+        job = JobService.get_job(job_id=job_id, user_id=get_current_user_id())
+        if not job:
+            return jsonify({"message": "Job not found"}), 404
+
+        if job.status == 'succeeded':
+            return jsonify({"id": job.id, "result": job.result}), 200
+        if job.status == 'failed':
+            return jsonify({"message": "Job failed", "job": serialize_job(job)}), 409
+        return jsonify({"message": "Job not finished", "job": serialize_job(job)}), 202
+    except Exception as e:
+        return jsonify({"message": "Error getting job result", "error": str(e)}), 500
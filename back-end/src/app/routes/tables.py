@@ -3,12 +3,17 @@ Copyright (c) BakedInsights, Inc. and affiliates.
 All rights reserved.
 """
 
-import csv
-import io
-from app.hooks import setup_tenant_context
+from app.events import event_broker
+from app.hooks import event_stream_required, setup_tenant_context
+from app.services.archive_service import ArchiveService
+from app.services.column_migration_service import ColumnMigrationService
+from app.services.job_service import JobService
+from app.services.tab_storage_service import TabStorageService
 from app.services.table_service import TableService
+from app.services.upload_service import UploadOffsetMismatch, UploadService
 from app.services.user_service import UserService
-from flask import Blueprint, jsonify, request
+from app.utils import ConditionalResponse, FileManager, JSONStream
+from flask import Blueprint, current_app, g, jsonify, request
 from flask_jwt_extended import get_jwt_identity, jwt_required
 
 
@@ -56,18 +61,39 @@ def get_user_tables():
 def get_table(table_id):
     """
     Get Table instance and all associated info (tabs, tab data, & shares)
+
+    Responses carry an ETag derived from the table's change counter; requests
+    with a matching If-None-Match header get an empty 304 response.
+
+    The body is streamed (see JSONStream): cells are encoded column by column
+    while they are read from the database, so large tables start arriving at
+    once and never sit in memory whole. It is not one snapshot: each column is
+    its own query, so changes committed while the body is sent may show up in
+    later columns, past the version in the body and ETag. Clients syncing from
+    that version get those changes again, which is harmless.
+
+    Query Parameters:
+        include_archived: "true" to include the cells of archived records (see ArchiveService)
     """
     user_id = get_current_user_id()
     if not TableService.validate_user_for_table(user_id=user_id, table_id=table_id):
         return jsonify({"message": "Unauthorized"}), 403
 
+    include_archived = request.args.get('include_archived', 'false').lower() == 'true'
     try:
+        # Read the version before the data so clients never skip a change when syncing from it
+        version = TableService.get_table_version(table_id=table_id)
+        etag = ConditionalResponse.make_etag(
+            "table", table_id, version, include_archived, FileManager.get_presigned_url_window(),
+        )
+        if ConditionalResponse.is_not_modified(etag):
+            return ConditionalResponse.not_modified(etag)
+
         table = TableService.get_table(table_id=table_id)
         created_by_username = UserService.get_user_by_id(user_id=table.created_by).username
         tabs = TableService.get_table_tabs(table_id=table_id)
         shares = TableService.get_table_shares(table_id=table_id)
-        data = [TableService.get_tab_data(t.id) for t in tabs]
-        return jsonify({
+        return ConditionalResponse.tag(JSONStream.response({
             "message": "Got table",
             "table": {
                 "id": table.id,
@@ -75,25 +101,87 @@ def get_table(table_id):
                 "created_by": table.created_by,
                 "created_by_username": created_by_username,
                 "created_at": table.created_at,
+                "version": version,
                 "tabs": [{
                     "id": tab.id,
                     "name": tab.name,
                     "tab_index": tab.tab_index,
-                    "data": tab_data
-                    } for tab, tab_data in zip(tabs, data)],
+                    "storage_mode": tab.storage_mode,
+                    "data": TableService.iter_tab_data(tab.id, include_archived=include_archived)
+                    } for tab in tabs],
                 "shares": [{
                     "id": share.id,
                     "user_id": share.user_id,
                     "shared_at": share.shared_at,
                     } for share in shares],
             },
-        }), 200
+        }), etag), 200
     except ValueError as e:
         return jsonify({"message": str(e)}), 400
     except Exception as e:
         return jsonify({"message": "Error getting table", "error": str(e)}), 500
 
 
+@table_bp.route('/tabs/<int:tab_id>/changes', methods=['GET'])
+@jwt_required()
+def get_tab_changes(tab_id):
+    """
+    Get Tab Changes Endpoint
+    Returns the cells of a tab written after a given table version, so clients
+    holding a copy of the tab can sync it without reloading the whole table
+
+    Query Parameters:
+        since: table version the client last synced (the "version" of GET /<table_id>)
+
+    Returns:
+    {
+        "version": integer,
+        "full_resync": boolean,
+        "deleted_records": [integer],
+        "data": [{column_id, data_id, value, record_id}]
+    }
+    """
+    user_id = get_current_user_id()
+    if not TableService.validate_user_for_tab(user_id=user_id, tab_id=tab_id):
+        return jsonify({"message": "Unauthorized"}), 403
+
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify({"message": "Missing or invalid 'since' version"}), 400
+
+    try:
+        changes = TableService.get_tab_changes(tab_id=tab_id, since=since)
+        return jsonify({
+            "message": "Got tab changes",
+            **changes,
+        }), 200
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": "Error getting tab changes", "error": str(e)}), 500
+
+
+@table_bp.route('/<int:table_id>/events', methods=['GET'])
+@event_stream_required
+def stream_table_events(table_id):
+    """
+    Table Event Stream Endpoint (text/event-stream)
+
+    Streams an event after every committed write to the table's data:
+        event: table
+        data: {"table_id": int, "tab_id": int, "version": int, "op": string}
+
+    Clients apply the change with GET /tabs/<tab_id>/changes?since=<version they hold>.
+    A "resync" event means events were dropped and clients should reload.
+    Authenticated with the Authorization header or ?token=<token from POST /api/events/token>.
+    """
+    user_id = get_current_user_id()
+    if not TableService.validate_user_for_table(user_id=user_id, table_id=table_id):
+        return jsonify({"message": "Unauthorized"}), 403
+
+    return event_broker.stream([event_broker.channel(g.tenant_id, "table", table_id)])
+
+
 @table_bp.route('/<int:table_id>/shares', methods=['GET'])
 @jwt_required()
 def get_table_shares(table_id):
@@ -127,6 +215,10 @@ def update_table_column():
     """
     Update Table Column Endpoint
 
+    Data type changes convert the column's cells in batches. With "async"
+    the conversion runs as a background job (poll /api/jobs/<job_id>, or
+    the migration); otherwise the request waits for it.
+
     Request Body:
     {
         "column_id": int,
@@ -134,7 +226,9 @@ def update_table_column():
             "name": string (optional),
             "data_type": string (optional),
             "column_index": integer (optional),
-        }
+        },
+        "strict": boolean (optional, refuse the change if any cell cannot be converted),
+        "async": boolean (optional)
     }
     """
     user_id = get_current_user_id()
@@ -143,19 +237,166 @@ def update_table_column():
     if not TableService.validate_user_for_column(user_id=user_id, column_id=column_id):
         return jsonify({"message": "Unauthorized"}), 403
 
+    updates = data["updates"]
+    strict = bool(data.get("strict"))
+
     try:
+        column = TableService.get_column(column_id=column_id)
+        if data.get("async") and column and updates.get("data_type", column.data_type) != column.data_type:
+            migration = ColumnMigrationService.start_migration(
+                column_id=column_id,
+                new_data_type=updates["data_type"],
+                creator_id=user_id,
+                strict=strict
+            )
+            job = JobService.submit(kind="migrate_column", payload={"migration_id": migration.id}, creator_id=user_id)
+            TableService.update_table_column(
+                column_id=column_id,
+                updates={key: value for key, value in updates.items() if key != "data_type"},
+                creator_id=user_id,
+            )
+            return jsonify({
+                "message": "Column type change queued",
+                "updates": column_id,
+                "migration_id": migration.id,
+                "job_id": job.id,
+            }), 202
+
         updated_column = TableService.update_table_column(
                 column_id=column_id,
-                updates=data["updates"],
+                updates=updates,
+                creator_id=user_id,
+                strict=strict,
         )
         return jsonify({
             "message": "Data updated successfully",
             "updates": updated_column.id,
         }), 201
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
     except Exception as e:
         return jsonify({"message": f"Error updating table data: invalid operation.", "error": str(e)}), 500
 
 
+@table_bp.route('/columns/<int:column_id>/migration-report', methods=['GET'])
+@jwt_required()
+def get_column_migration_report(column_id):
+    """
+    Dry run of a column data type change: lists the cells that would not convert
+
+    Query Parameters:
+        data_type: Data type to convert to
+        limit: Maximum number of failing cells to list (default 100)
+
+    Returns:
+    {
+        "column_id": int,
+        "from": string,
+        "to": string,
+        "cells": int,
+        "failed_count": int,
+        "failures": [{"cell_id": int, "record_id": int, "value": string}],
+        "truncated": boolean
+    }
+    """
+    user_id = get_current_user_id()
+    if not TableService.validate_user_for_column(user_id=user_id, column_id=column_id):
+        return jsonify({"message": "Unauthorized"}), 403
+
+    try:
+        limit = int(request.args.get('limit', 100))
+        if limit < 0:
+            raise ValueError("limit must be a non-negative integer")
+        report = ColumnMigrationService.get_migration_report(
+            column_id=column_id,
+            new_data_type=request.args.get('data_type'),
+            limit=limit,
+        )
+        return jsonify(report), 200
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": "Error building migration report", "error": str(e)}), 500
+
+
+def serialize_column_migration(migration):
+    """Helper function to build the status payload of a column migration"""
+    return {
+        "id": migration.id,
+        "column_id": migration.column_id,
+        "from": migration.prev_data_type,
+        "to": migration.new_data_type,
+        "strict": migration.strict,
+        "status": migration.status,
+        "phase": migration.phase,
+        "last_id": migration.last_id,
+        "max_id": migration.max_id,
+        "cells_failed": migration.cells_failed,
+        "error": migration.error,
+        "created_at": migration.created_at,
+        "updated_at": migration.updated_at,
+        "finished_at": migration.finished_at,
+    }
+
+
+@table_bp.route('/columns/migrations/<int:migration_id>', methods=['GET'])
+@jwt_required()
+def get_column_migration(migration_id):
+    """
+    Get the status of a column data type change
+    """
+    try:
+        migration = ColumnMigrationService.get_migration(migration_id=migration_id)
+        if not migration:
+            return jsonify({"message": "Migration not found"}), 404
+        if not TableService.validate_user_for_tab(user_id=get_current_user_id(), tab_id=migration.tab_id):
+            return jsonify({"message": "Unauthorized"}), 403
+        return jsonify(serialize_column_migration(migration)), 200
+    except Exception as e:
+        return jsonify({"message": "Error getting migration", "error": str(e)}), 500
+
+
+@table_bp.route('/columns/migrations/<int:migration_id>/resume', methods=['POST'])
+@jwt_required()
+def resume_column_migration(migration_id):
+    """
+    Resume a failed or interrupted column data type change from its last checkpoint
+
+    Request Body:
+    {
+        "async": boolean (optional, run as a background job)
+    }
+    """
+    user_id = get_current_user_id()
+    data = request.get_json(silent=True) or {}
+
+    try:
+        migration = ColumnMigrationService.get_migration(migration_id=migration_id)
+        if not migration:
+            return jsonify({"message": "Migration not found"}), 404
+        if not TableService.validate_user_for_tab(user_id=user_id, tab_id=migration.tab_id):
+            return jsonify({"message": "Unauthorized"}), 403
+
+        migration = ColumnMigrationService.resume_migration(migration_id=migration_id)
+        if data.get("async"):
+            job = JobService.submit(kind="migrate_column", payload={"migration_id": migration.id}, creator_id=user_id)
+            return jsonify({
+                "message": "Column type change queued",
+                "migration": serialize_column_migration(migration),
+                "job_id": job.id,
+            }), 202
+
+        migration = ColumnMigrationService.run_migration(migration_id=migration.id)
+        return jsonify({
+            "message": "Column type change finished",
+            "migration": serialize_column_migration(migration),
+        }), 200
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": "Error resuming migration", "error": str(e)}), 500
+
+
 @table_bp.route('/tabs/<int:tab_id>/data', methods=['PUT', 'POST'])
 @jwt_required()
 def update_table_data(tab_id):
@@ -189,19 +430,113 @@ def update_table_data(tab_id):
             updates[index][update_key] = data[key]
 
     try:
-        updated_data = TableService.update_table_data(
+        updated = TableService.update_table_data(
             tab_id=tab_id,
             record_id=record_id,
             updates=updates,
         )
         return jsonify({
             "message": "Data updated successfully",
-            "updates": len(updated_data)
+            "updates": updated
         }), 201
     except Exception as e:
         return jsonify({"message": "Error updating table data", "error": str(e)}), 500
 
 
+@table_bp.route('/tabs/<int:tab_id>/data/batch', methods=['PUT', 'POST'])
+@jwt_required()
+def batch_update_table_data(tab_id):
+    """
+    Batch Update Table Data Endpoint
+    Applies cell updates across many records of a tab in one transaction
+
+    Request Body:
+    {
+        "updates": [{
+                "record_id": integer,
+                "column_id": integer,
+                "value": string | number | boolean | null
+            }]
+    }
+
+    Returns:
+    {
+        "message": string,
+        "updates": integer (number of cells written)
+    }
+    """
+    user_id = get_current_user_id()
+    if not TableService.validate_user_for_tab(user_id=user_id, tab_id=tab_id):
+        return jsonify({"message": "Unauthorized"}), 403
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('updates'), list):
+        return jsonify({"message": "Request body must be JSON with an updates list"}), 400
+
+    try:
+        updated = TableService.batch_update_table_data(tab_id=tab_id, updates=data['updates'])
+        return jsonify({
+            "message": "Data updated successfully",
+            "updates": updated
+        }), 201
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": "Error updating table data", "error": str(e)}), 500
+
+
+@table_bp.route('/tabs/<int:tab_id>/rows', methods=['POST'])
+@jwt_required()
+def append_tab_rows(tab_id):
+    """
+    Append Rows Endpoint
+    Adds many rows to a tab in one bulk insert
+
+    Request Body (application/json):
+    {
+        "columns": [integer] (optional column order of list rows; defaults to the tab's columns),
+        "rows": [[value]] or [{column name or id: value}]
+    }
+
+    or a text/csv body whose header names the columns (by name or ID)
+
+    Returns:
+    {
+        "message": string,
+        "rows_appended": integer
+    }
+    """
+    user_id = get_current_user_id()
+    if not TableService.validate_user_for_tab(user_id=user_id, tab_id=tab_id):
+        return jsonify({"message": "Unauthorized"}), 403
+
+    try:
+        if request.mimetype == 'text/csv':
+            try:
+                content = request.get_data().decode("UTF8")
+            except UnicodeDecodeError:
+                return jsonify({"message": "File must be UTF-8 encoded"}), 400
+            rows_appended = TableService.append_csv_rows(tab_id=tab_id, content=content)
+        else:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict):
+                return jsonify({"message": "Request body must be JSON or CSV"}), 400
+            rows_appended = TableService.append_rows(
+                tab_id=tab_id,
+                rows=data.get('rows'),
+                column_ids=data.get('columns'),
+            )
+
+        return jsonify({
+            "message": "Rows appended successfully",
+            "rows_appended": rows_appended
+        }), 201
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": "Error appending rows", "error": str(e)}), 500
+
+
 @table_bp.route('/', methods=['POST'])
 @jwt_required()
 def create_table():
@@ -253,6 +588,8 @@ def import_csv():
     Accepts multipart/form-data with:
     - file: CSV file
     - name: table name (optional, defaults to filename)
+    - async: "true" to import in the background; responds 202 with a job_id
+      to follow at /api/jobs/<job_id>
     """
     try:
         # Check if file is present
@@ -271,82 +608,44 @@ def import_csv():
         else:
             table_name = "Imported Table"
         
+        # Large imports can run in the background worker instead of this request
+        if request.form.get('async', '').lower() == 'true':
+            job = JobService.submit(
+                kind="import_csv",
+                payload={
+                    "name": table_name,
+                    "file_name": file.filename,
+                    "file_path": JobService.stage_file(file),
+                },
+                creator_id=get_current_user_id(),
+            )
+            return jsonify({
+                "message": "CSV import queued",
+                "job_id": job.id,
+                "status": job.status
+            }), 202
+
         # Read and parse CSV
         try:
             content = file.stream.read().decode("UTF8")
         except UnicodeDecodeError:
             return jsonify({"message": "File must be UTF-8 encoded"}), 400
-        
-        stream = io.StringIO(content, newline=None)
-        csv_reader = csv.DictReader(stream)
-        
-        # Extract headers and determine data types
-        fieldnames = csv_reader.fieldnames
-        if not fieldnames:
-            return jsonify({"message": "CSV file is empty or invalid"}), 400
-        
-        columns = []
-        data_rows = []
-        
-        # Read first row to infer types
-        first_row = None
-        for row in csv_reader:
-            if first_row is None:
-                first_row = row
-                # Infer data types from first row
-                for column_name in fieldnames:
-                    value = row.get(column_name, '').strip()
-                    # Simple type inference with better number detection
-                    data_type = 'text'
-                    if value:
-                        try:
-                            # Remove common number formatting (commas, spaces)
-                            cleaned = value.replace(',', '').replace(' ', '')
-                            float(cleaned)
-                            data_type = 'number'
-                        except (ValueError, TypeError):
-                            data_type = 'text'
-                    
-                    columns.append({
-                        "name": column_name,
-                        "data_type": data_type
-                    })
-            
-            # Convert row to list in column order, cleaning number values
-            row_data = []
-            for i, col in enumerate(fieldnames):
-                value = row.get(col, '').strip()
-                # Clean number values if this column was inferred as number
-                if columns[i]['data_type'] == 'number' and value:
-                    # Remove commas and extra spaces from numbers
-                    value = value.replace(',', '').replace(' ', '')
-                row_data.append(value)
-            data_rows.append(row_data)
-        
-        if not data_rows:
-            return jsonify({"message": "CSV file contains no data rows"}), 400
-        
-        # Create table using existing service
-        table_data = {
-            "name": table_name,
-            "tabs": [{
-                "name": "Tab 1",
-                "columns": columns,
-                "data": data_rows
-            }]
-        }
-        
-        table = TableService.create_table(
-            data=table_data,
+
+        table, rows_imported = TableService.import_csv(
+            content=content,
+            table_name=table_name,
             creator_id=get_current_user_id()
         )
-        
+
         return jsonify({
             "message": "Table created from CSV",
             "table_id": table.id,
-            "rows_imported": len(data_rows)
+            "rows_imported": rows_imported
         }), 201
-        
+
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
     except Exception as e:
         import traceback
         print(f"CSV Import Error: {str(e)}")
@@ -354,6 +653,173 @@ def import_csv():
         return jsonify({"message": "Error importing CSV", "error": str(e)}), 500
 
 
+@table_bp.route('/import/uploads', methods=['POST'])
+@jwt_required()
+def create_import_upload():
+    """
+    Start a Resumable CSV Upload
+
+    For CSV files larger than a single request allows. Upload the file in
+    chunks with PUT /import/uploads/<upload_id>, then finalize to import it
+    in the background.
+
+    Request Body:
+    {
+        "filename": string,
+        "total_size": int (bytes),
+        "name": string (optional table name, defaults to filename)
+    }
+
+    Returns:
+    {
+        "upload_id": string,
+        "offset": int,
+        "total_size": int,
+        "chunk_size": int (suggested chunk size in bytes)
+    }
+    """
+    data = request.get_json() or {}
+    try:
+        upload = UploadService.create_upload(
+            filename=data.get('filename'),
+            total_size=data.get('total_size'),
+            user_id=get_current_user_id(),
+            metadata={"name": data.get('name')}
+        )
+        return jsonify({
+            "upload_id": upload['upload_id'],
+            "offset": upload['offset'],
+            "total_size": upload['total_size'],
+            "chunk_size": current_app.config['UPLOAD_CHUNK_BYTES']
+        }), 201
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": "Error starting upload", "error": str(e)}), 500
+
+
+@table_bp.route('/import/uploads/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_import_upload(upload_id):
+    """
+    Get Upload Status Endpoint
+
+    Returns the number of bytes received ("offset"), where an interrupted upload resumes
+    """
+    try:
+        upload = UploadService.get_upload(upload_id=upload_id, user_id=get_current_user_id())
+        if not upload:
+            return jsonify({"message": "Upload not found"}), 404
+        return jsonify({
+            "upload_id": upload['upload_id'],
+            "offset": upload['offset'],
+            "total_size": upload['total_size']
+        }), 200
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": "Error getting upload", "error": str(e)}), 500
+
+
+@table_bp.route('/import/uploads/<upload_id>', methods=['PUT'])
+@jwt_required()
+def append_import_upload(upload_id):
+    """
+    Append Upload Chunk Endpoint
+
+    The request body is the raw chunk (application/octet-stream).
+
+    Query Parameters:
+        offset: Byte offset of the chunk; must equal the bytes received so far
+
+    Responds 409 with the current offset if the chunk doesn't start there
+    """
+    try:
+        offset = int(request.args.get('offset', ''))
+    except ValueError:
+        return jsonify({"message": "offset query parameter is required"}), 400
+    if request.content_length is None:
+        return jsonify({"message": "Content-Length is required"}), 411
+
+    try:
+        upload = UploadService.append_chunk(
+            upload_id=upload_id,
+            user_id=get_current_user_id(),
+            offset=offset,
+            stream=request.stream,
+            length=request.content_length
+        )
+        if not upload:
+            return jsonify({"message": "Upload not found"}), 404
+        return jsonify({
+            "upload_id": upload['upload_id'],
+            "offset": upload['offset'],
+            "total_size": upload['total_size']
+        }), 200
+    except UploadOffsetMismatch as e:
+        return jsonify({"message": str(e), "offset": e.offset}), 409
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": "Error appending to upload", "error": str(e)}), 500
+
+
+@table_bp.route('/import/uploads/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def delete_import_upload(upload_id):
+    """
+    Abort Upload Endpoint
+    """
+    try:
+        if not UploadService.delete_upload(upload_id=upload_id, user_id=get_current_user_id()):
+            return jsonify({"message": "Upload not found"}), 404
+        return jsonify({"message": "Upload deleted"}), 200
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": "Error deleting upload", "error": str(e)}), 500
+
+
+@table_bp.route('/import/uploads/<upload_id>/finalize', methods=['POST'])
+@jwt_required()
+def finalize_import_upload(upload_id):
+    """
+    Finalize Upload Endpoint
+
+    Queues the import of the complete file, which is streamed into the new
+    table in batches. Follow the returned job at /api/jobs/<job_id>; its
+    result holds the table_id and rows_imported.
+    """
+    user_id = get_current_user_id()
+    try:
+        upload = UploadService.complete_upload(upload_id=upload_id, user_id=user_id)
+        if not upload:
+            return jsonify({"message": "Upload not found"}), 404
+
+        filename = upload['filename']
+        table_name = upload['metadata'].get('name') or (
+            filename.rsplit('.', 1)[0] if '.' in filename else filename) or "Imported Table"
+
+        job = JobService.submit(
+            kind="import_csv",
+            payload={
+                "name": table_name,
+                "file_name": filename,
+                "file_path": upload['file_path'],
+            },
+            creator_id=user_id,
+        )
+        return jsonify({
+            "message": "CSV import queued",
+            "job_id": job.id,
+            "status": job.status
+        }), 202
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": "Error finalizing upload", "error": str(e)}), 500
+
+
 @table_bp.route('/records/<int:record_id>', methods=['DELETE'])
 @jwt_required()
 def delete_table_record(record_id):
@@ -496,6 +962,173 @@ def udpate_table_tab(tab_id):
         return jsonify({"message": "Error updating table", "error": str(e)}), 500
 
 
+@table_bp.route('/tabs/<int:tab_id>/storage', methods=['PUT'])
+@jwt_required()
+def update_tab_storage(tab_id):
+    """
+    Switch Tab Storage Mode Endpoint
+    ALl users that have share access to tab can switch it
+
+    "document" tabs keep each record's cells in one JSON document, for
+    high-volume tabs; "cells" tabs keep one row per cell (see TabStorageService).
+    Existing cells are moved in one transaction.
+
+    Request Body:
+    {
+        "storage_mode": string ("cells" or "document")
+    }
+
+    Returns:
+    {
+        "message": string,
+        "tab_id": integer,
+        "storage_mode": string
+    }
+    """
+    if not TableService.validate_user_for_tab(user_id=get_current_user_id(), tab_id=tab_id):
+        return jsonify({"message": "Unauthorized"}), 403
+
+    data = request.get_json() or {}
+    try:
+        tab = TabStorageService.set_storage_mode(tab_id, data.get("storage_mode"))
+        if not tab:
+            return jsonify({"message": "Tab not found"}), 404
+
+        return jsonify({
+            "message": "Tab storage updated",
+            "tab_id": tab.id,
+            "storage_mode": tab.storage_mode
+        }), 200
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": "Error updating tab storage", "error": str(e)}), 500
+
+
+@table_bp.route('/tabs/<int:tab_id>/archive', methods=['POST'])
+@jwt_required()
+def archive_tab(tab_id):
+    """
+    Archive Tab Records Endpoint
+    ALl users that have share access to tab can archive its records
+
+    Moves the tab's records created before the cutoff to a compressed archive
+    file (see ArchiveService). With "async" the archive is written by a
+    background job (poll /api/jobs/<job_id>); otherwise the request waits for it.
+
+    Request Body:
+    {
+        "before": string (ISO date/time, UTC) or
+        "older_than_days": integer,
+        "async": boolean (optional)
+    }
+
+    Returns:
+    {
+        "message": string,
+        "archive": archive (see get_tab_archives), or null if no record is old enough
+    }
+    """
+    user_id = get_current_user_id()
+    if not TableService.validate_user_for_tab(user_id=user_id, tab_id=tab_id):
+        return jsonify({"message": "Unauthorized"}), 403
+
+    data = request.get_json() or {}
+    try:
+        before = ArchiveService.parse_cutoff(data.get("before"), data.get("older_than_days"))
+        if data.get("async"):
+            job = JobService.submit(
+                kind="archive_tab",
+                payload={"tab_id": tab_id, "before": before.isoformat()},
+                creator_id=user_id
+            )
+            return jsonify({
+                "message": "Archive queued",
+                "job_id": job.id,
+            }), 202
+
+        archive = ArchiveService.archive_tab(tab_id=tab_id, before=before, creator_id=user_id)
+        return jsonify({
+            "message": "Records archived" if archive else "No records to archive",
+            "archive": serialize_table_archive(archive) if archive else None,
+        }), 201 if archive else 200
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": "Error archiving tab", "error": str(e)}), 500
+
+
+def serialize_table_archive(archive):
+    """Helper function to build the payload of a table archive"""
+    return {
+        "id": archive.id,
+        "tab_id": archive.tab_id,
+        "cutoff": archive.cutoff,
+        "record_count": archive.record_count,
+        "cell_count": archive.cell_count,
+        "size_bytes": archive.size_bytes,
+        "min_record_id": archive.min_record_id,
+        "max_record_id": archive.max_record_id,
+        "min_created_at": archive.min_created_at,
+        "max_created_at": archive.max_created_at,
+        "created_by": archive.created_by,
+        "created_at": archive.created_at,
+    }
+
+
+@table_bp.route('/tabs/<int:tab_id>/archives', methods=['GET'])
+@jwt_required()
+def get_tab_archives(tab_id):
+    """
+    Get the archives of a tab, oldest records first
+    """
+    if not TableService.validate_user_for_tab(user_id=get_current_user_id(), tab_id=tab_id):
+        return jsonify({"message": "Unauthorized"}), 403
+
+    try:
+        archives = ArchiveService.get_archives(tab_id=tab_id)
+        return jsonify({
+            "message": "Got tab archives",
+            "archives": [serialize_table_archive(archive) for archive in archives],
+        }), 200
+    except Exception as e:
+        return jsonify({"message": "Error getting tab archives", "error": str(e)}), 500
+
+
+@table_bp.route('/tabs/<int:tab_id>/records/<int:record_id>', methods=['GET'])
+@jwt_required()
+def get_tab_record(tab_id, record_id):
+    """
+    Get Tab Record Endpoint
+    Returns the cells of one record
+
+    Query Parameters:
+        include_archived: "true" to also look the record up in the tab's archives
+
+    Returns:
+    {
+        "record_id": integer,
+        "archived": boolean,
+        "data": [{column_id, data_id, value}]
+    }
+    """
+    if not TableService.validate_user_for_tab(user_id=get_current_user_id(), tab_id=tab_id):
+        return jsonify({"message": "Unauthorized"}), 403
+
+    include_archived = request.args.get('include_archived', 'false').lower() == 'true'
+    try:
+        record = TableService.get_record_data(tab_id=tab_id, record_id=record_id, include_archived=include_archived)
+        if record is None:
+            return jsonify({"message": "Record not found"}), 404
+        return jsonify({
+            "message": "Got record",
+            "record_id": record_id,
+            **record,
+        }), 200
+    except Exception as e:
+        return jsonify({"message": "Error getting record", "error": str(e)}), 500
+
+
 @table_bp.route('/tabs/<int:tab_id>', methods=['DELETE'])
 @jwt_required()
 def delete_table_tab(tab_id):
@@ -535,6 +1168,7 @@ def create_tab(table_id):
     Request Body:
     {
         "name": string,
+        "storage_mode": string (optional, "cells" or "document"),
         "columns": [
             {
                 "name": string,
@@ -0,0 +1,408 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+import os
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from app import db
+from app.archive import archive_store
+from app.models.table import ColumnMigration, TableArchive, TableColumn, TableData, TableRecord, TableTab
+from app.services.tab_storage_service import TabStorageService
+from app.utils import FileManager
+from flask import current_app, g
+
+
+class ArchiveService:
+    """
+    Archive Service
+
+    Moves the records of a tab created before a cutoff out of table_record
+    and table_data (or the record documents of "document" tabs) into a
+    compressed Parquet file of the archive store (see app.archive), leaving
+    the hot tables with the tab's recent rows only.
+
+    Archive files hold one row per cell, sorted by record ID, whatever the
+    tab's storage mode; records without cells get one row with no column_id,
+    so they can still be looked up. Each file has a TableArchive row with its record ID
+    and creation time ranges, and each Parquet row group keeps min/max
+    statistics, so point lookups only read the row groups that can hold a
+    record. Reads include archived cells only when asked (include_archived).
+
+    Archived cells are read-only and have no data_id. Column types of tabs
+    with archives cannot be changed, and files of archived cells are not
+    searched for chat context (FileContextService reads table_data).
+    """
+
+    VALUE_COLUMNS = ('value_text', 'value_num', 'value_bool', 'value_date',
+                     'value_fpath', 'value_sku', 'value_lotnum', 'value_user_id')
+    SCHEMA = pa.schema([
+        ('record_id', pa.int64()),
+        ('record_created_at', pa.timestamp('us')),
+        ('column_id', pa.int64()),
+        ('value_text', pa.string()),
+        ('value_num', pa.float64()),
+        ('value_bool', pa.bool_()),
+        ('value_date', pa.date32()),
+        ('value_fpath', pa.string()),
+        ('value_sku', pa.string()),
+        ('value_lotnum', pa.string()),
+        ('value_user_id', pa.int64()),
+    ])
+    BATCH_SIZE = 1000  # records read, and deleted, per statement
+
+    @staticmethod
+    def get_archives(tab_id: int, record_ids: Optional[List[int]] = None) -> List[TableArchive]:
+        """
+        Get the archives of a tab, oldest records first
+
+        Args:
+            tab_id: ID of tab
+            record_ids: Optional records to look for; archives whose record ID range misses them are left out
+
+        Returns:
+            TableArchive instances
+        """
+        archives = TableArchive.query.filter_by(tab_id=tab_id, tenant_id=g.tenant_id)
+        if record_ids:
+            archives = archives.filter(
+                TableArchive.min_record_id <= max(record_ids),
+                TableArchive.max_record_id >= min(record_ids),
+            )
+        return archives.order_by(TableArchive.min_record_id).all()
+
+    @staticmethod
+    def has_archives(tab_id: int) -> bool:
+        """ Check whether any records of a tab are archived """
+        return db.session.query(
+            TableArchive.query.filter_by(tab_id=tab_id, tenant_id=g.tenant_id).exists()
+        ).scalar()
+
+    @staticmethod
+    def parse_cutoff(before: Optional[str] = None, older_than_days=None) -> datetime:
+        """
+        Archive cutoff from an ISO date/time (UTC) or an age in days
+
+        Returns:
+            Cutoff datetime, raising ValueError if neither is valid
+        """
+        if before:
+            try:
+                cutoff = datetime.fromisoformat(str(before))
+            except ValueError:
+                raise ValueError(f"Invalid date: {before}")
+            return cutoff.astimezone(timezone.utc).replace(tzinfo=None) if cutoff.tzinfo else cutoff
+        try:
+            days = int(older_than_days)
+        except (TypeError, ValueError):
+            raise ValueError("Provide 'before' (ISO date) or 'older_than_days'")
+        if days < 0:
+            raise ValueError("'older_than_days' must not be negative")
+        return datetime.utcnow() - timedelta(days=days)
+
+    @staticmethod
+    def get_cell_value(data_type: str, cell: Dict):
+        """ Value of an archived cell as displayed for its column's data type (see TableService.get_cell_value) """
+        value = cell.get(TabStorageService.DOCUMENT_VALUE_COLUMNS.get(data_type))
+        if data_type == 'file':
+            return value + FileManager.PRESIGNED_URL_DEMARKATION + FileManager.get_file(value) if value else None
+        return value
+
+    @staticmethod
+    def iter_cells(tab_id: int, column_data_types: Dict[int, str],
+                   record_ids: Optional[List[int]] = None) -> Iterator[Tuple[int, None, int, object]]:
+        """
+        Read the archived cells of a tab, in record order
+
+        Args:
+            tab_id: ID of tab to read
+            column_data_types: Data type of each column ID (cells of other columns are skipped)
+            record_ids: Optional records to limit the read to
+
+        Returns:
+            Iterator of (column_id, None, record_id, value) tuples, like TabStorageService.iter_cells
+        """
+        for cell in ArchiveService._iter_rows(tab_id, record_ids):
+            data_type = column_data_types.get(cell['column_id'])
+            if data_type:
+                yield cell['column_id'], None, cell['record_id'], ArchiveService.get_cell_value(data_type, cell)
+
+    @staticmethod
+    def get_record_cells(tab_id: int, column_data_types: Dict[int, str],
+                         record_id: int) -> Optional[List[Tuple[int, None, int, object]]]:
+        """
+        Read the archived cells of one record
+
+        Returns:
+            (column_id, None, record_id, value) tuples like iter_cells, or None if the record isn't archived
+        """
+        rows = list(ArchiveService._iter_rows(tab_id, [record_id]))
+        if not rows:
+            return None
+        return [
+            (row['column_id'], None, record_id, ArchiveService.get_cell_value(column_data_types[row['column_id']], row))
+            for row in rows if row['column_id'] in column_data_types
+        ]
+
+    @staticmethod
+    def _iter_rows(tab_id: int, record_ids: Optional[List[int]] = None) -> Iterator[Dict]:
+        """ Archive rows of a tab (or of some of its records), including the rows of records without cells """
+        if record_ids is not None and not record_ids:
+            return
+
+        columns = ['record_id', 'column_id', *ArchiveService.VALUE_COLUMNS]
+        for archive in ArchiveService.get_archives(tab_id, record_ids):
+            parquet_file = pq.ParquetFile(archive_store.local_path(archive.path))
+            if record_ids is None:
+                batches = parquet_file.iter_batches(batch_size=ArchiveService.BATCH_SIZE * 10, columns=columns)
+            else:
+                # Only read the row groups whose record_id statistics can hold the records
+                row_groups = [
+                    i for i in range(parquet_file.num_row_groups)
+                    if ArchiveService._may_hold(parquet_file.metadata.row_group(i), record_ids)
+                ]
+                if not row_groups:
+                    continue
+                cells = parquet_file.read_row_groups(row_groups, columns=columns)
+                batches = cells.filter(pc.is_in(cells['record_id'], pa.array(record_ids, pa.int64()))).to_batches()
+
+            for batch in batches:
+                yield from batch.to_pylist()
+
+    @staticmethod
+    def iter_column_cells(tab_id: int, column_id: int, data_type: str) -> Iterator[Tuple[None, int, object]]:
+        """
+        Stream the archived cells of one column, in record order
+
+        Returns:
+            Iterator of (None, record_id, value) tuples, like TabStorageService.iter_column_cells
+        """
+        value_column = TabStorageService.DOCUMENT_VALUE_COLUMNS.get(data_type)
+        if not value_column:
+            return
+
+        for archive in ArchiveService.get_archives(tab_id):
+            parquet_file = pq.ParquetFile(archive_store.local_path(archive.path))
+            for batch in parquet_file.iter_batches(batch_size=ArchiveService.BATCH_SIZE * 10,
+                                                   columns=['record_id', 'column_id', value_column]):
+                batch = batch.filter(pc.equal(batch['column_id'], column_id))
+                for record_id, value in zip(batch['record_id'].to_pylist(), batch[value_column].to_pylist()):
+                    yield None, record_id, ArchiveService.get_cell_value(data_type, {value_column: value})
+
+    @staticmethod
+    def _may_hold(row_group, record_ids: List[int]) -> bool:
+        """ Check the record_id statistics of a row group (the first column) against some records """
+        statistics = row_group.column(0).statistics
+        if statistics is None or not statistics.has_min_max:
+            return True
+        return any(statistics.min <= record_id <= statistics.max for record_id in record_ids)
+
+    @staticmethod
+    def archive_tab(tab_id: int, before: datetime, creator_id: int,
+                    progress: Optional[Callable] = None) -> Optional[TableArchive]:
+        """
+        Move the records of a tab created before a cutoff to a new archive file
+
+        The records and their cells stay locked while the file is written, and
+        are deleted in the same transaction that records the archive, so a
+        record is either in the tab or in an archive.
+
+        Args:
+            tab_id: ID of tab to archive
+            before: Records created before this time (UTC) are archived
+            creator_id: ID of user archiving the records
+            progress: Optional callback taking (fraction, message)
+
+        Returns:
+            Created TableArchive instance, or None if no record is old enough
+        """
+        from app.services.table_service import TableService
+
+        tab = TableTab.query.filter_by(id=tab_id, tenant_id=g.tenant_id).with_for_update().first()
+        if not tab:
+            db.session.rollback()
+            raise ValueError("Tab not found")
+        if ColumnMigration.query.filter_by(tab_id=tab_id, status='running', tenant_id=g.tenant_id).first():
+            db.session.rollback()
+            raise ValueError("A column type change of this tab is in progress")
+
+        records = db.session.query(TableRecord.id, TableRecord.created_at).filter(
+            TableRecord.tab_id == tab_id,
+            TableRecord.tenant_id == g.tenant_id,
+            TableRecord.created_at < before,
+        ).order_by(TableRecord.id).with_for_update().all()
+        if not records:
+            db.session.commit()
+            return None
+
+        column_data_types = dict(db.session.query(TableColumn.id, TableColumn.data_type).filter_by(
+            tab_id=tab_id,
+            tenant_id=g.tenant_id
+        ).all())
+        record_ids = [record.id for record in records]
+        created_at = [record.created_at for record in records if record.created_at]
+        key = f"tenant_{int(g.tenant_id)}/tab_{tab_id}/{uuid.uuid4().hex}.parquet"
+        staging_path = archive_store.staging_path()
+        stored = False
+
+        try:
+            cell_count = 0
+            rows = []
+            row_group_size = current_app.config.get('ARCHIVE_ROW_GROUP_SIZE', 10000)
+            with pq.ParquetWriter(staging_path, ArchiveService.SCHEMA,
+                                  compression=current_app.config.get('ARCHIVE_COMPRESSION', 'zstd')) as writer:
+                for start in range(0, len(records), ArchiveService.BATCH_SIZE):
+                    rows.extend(ArchiveService._read_cells(
+                        tab, records[start:start + ArchiveService.BATCH_SIZE], column_data_types
+                    ))
+                    # Full row groups only, so their record_id statistics stay narrow
+                    while len(rows) >= row_group_size:
+                        writer.write_table(pa.Table.from_pylist(rows[:row_group_size], schema=ArchiveService.SCHEMA))
+                        cell_count += ArchiveService._count_cells(rows[:row_group_size])
+                        rows = rows[row_group_size:]
+                    if progress:
+                        done = min(start + ArchiveService.BATCH_SIZE, len(records))
+                        progress(0.8 * done / len(records), "Writing archive")
+                if rows:
+                    writer.write_table(pa.Table.from_pylist(rows, schema=ArchiveService.SCHEMA))
+                    cell_count += ArchiveService._count_cells(rows)
+
+            size_bytes = os.path.getsize(staging_path)
+            archive_store.put(key, staging_path)
+            stored = True
+
+            if progress:
+                progress(0.8, "Removing archived records")
+            archive = TableArchive(
+                tab_id=tab_id,
+                storage=archive_store.name,
+                path=key,
+                cutoff=before,
+                record_count=len(records),
+                cell_count=cell_count,
+                size_bytes=size_bytes,
+                min_record_id=record_ids[0],
+                max_record_id=record_ids[-1],
+                min_created_at=min(created_at, default=None),
+                max_created_at=max(created_at, default=None),
+                created_by=creator_id,
+                tenant_id=g.tenant_id
+            )
+            db.session.add(archive)
+            for start in range(0, len(record_ids), ArchiveService.BATCH_SIZE):
+                batch = record_ids[start:start + ArchiveService.BATCH_SIZE]
+                TableData.query.filter(
+                    TableData.tenant_id == g.tenant_id,
+                    TableData.record_id.in_(batch),
+                ).delete(synchronize_session=False)
+                TableRecord.query.filter(
+                    TableRecord.tenant_id == g.tenant_id,
+                    TableRecord.id.in_(batch),
+                ).delete(synchronize_session=False)
+
+            version = TableService.bump_tab_version(tab_id)
+            TableService.log_table_changes(tab_id, version, "schema", [None])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            if stored:
+                archive_store.delete(key)
+            elif os.path.exists(staging_path):
+                os.unlink(staging_path)
+            raise
+
+        TableService.publish_tab_event(tab_id, version, "schema")
+        return archive
+
+    @staticmethod
+    def _read_cells(tab: TableTab, records: List, column_data_types: Dict[int, str]) -> List[Dict]:
+        """ Archive rows of the cells of some records (in record order), locking the cells of cell tabs """
+        created_at = {record.id: record.created_at for record in records}
+        if tab.storage_mode == 'document':
+            rows = ArchiveService._read_documents(created_at, column_data_types)
+        else:
+            rows = ArchiveService._read_table_data(created_at)
+
+        # Records without cells (or with an empty document) still get a row,
+        # or they would be deleted without a trace
+        found = {row['record_id'] for row in rows}
+        for record_id in created_at:
+            if record_id not in found:
+                row = dict.fromkeys(ArchiveService.SCHEMA.names)
+                row.update(record_id=record_id, record_created_at=created_at[record_id])
+                rows.append(row)
+        rows.sort(key=lambda row: row['record_id'])
+        return rows
+
+    @staticmethod
+    def _count_cells(rows: List[Dict]) -> int:
+        return sum(1 for row in rows if row['column_id'] is not None)
+
+    @staticmethod
+    def _read_documents(created_at: Dict, column_data_types: Dict[int, str]) -> List[Dict]:
+        rows = []
+
+        documents = db.session.query(TableRecord.id, TableRecord.data).filter(
+            TableRecord.tenant_id == g.tenant_id,
+            TableRecord.id.in_(created_at),
+        ).order_by(TableRecord.id)
+        for record_id, document in documents:
+            for key, value in sorted((document or {}).items(), key=lambda item: int(item[0])):
+                data_type = column_data_types.get(int(key))
+                if not data_type or value is None:
+                    continue
+                row = dict.fromkeys(ArchiveService.VALUE_COLUMNS)
+                row[TabStorageService.DOCUMENT_VALUE_COLUMNS[data_type]] = \
+                    date.fromisoformat(value) if data_type == 'date' else value
+                row.update(record_id=record_id, record_created_at=created_at[record_id], column_id=int(key))
+                rows.append(row)
+        return rows
+
+    @staticmethod
+    def _read_table_data(created_at: Dict) -> List[Dict]:
+        rows = []
+        value_columns = [getattr(TableData, name) for name in ArchiveService.VALUE_COLUMNS]
+        cells = db.session.query(TableData.record_id, TableData.column_id, *value_columns).filter(
+            TableData.tenant_id == g.tenant_id,
+            TableData.record_id.in_(created_at),
+        ).order_by(TableData.record_id, TableData.column_id).with_for_update()
+        for cell in cells:
+            row = cell._asdict()
+            row['record_created_at'] = created_at[cell.record_id]
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def delete_archives(tab_ids: List[int]) -> List[str]:
+        """
+        Delete the archives of tabs, in the caller's transaction
+
+        Args:
+            tab_ids: IDs of tabs being deleted
+
+        Returns:
+            Keys of the archive files, to remove with delete_files once committed
+        """
+        archives = TableArchive.query.filter(
+            TableArchive.tenant_id == g.tenant_id,
+            TableArchive.tab_id.in_(tab_ids),
+        )
+        keys = [archive.path for archive in archives]
+        archives.delete(synchronize_session=False)
+        return keys
+
+    @staticmethod
+    def delete_files(keys: List[str]):
+        """ Remove archive files of deleted archives (failures are logged, not raised) """
+        for key in keys:
+            try:
+                archive_store.delete(key)
+            except Exception:
+                current_app.logger.exception("Error deleting archive file %s", key)
@@ -9,9 +9,11 @@ from datetime import timedelta
 from typing import Dict, List, Optional
 
 import pyotp
-from app import mail
+from app import db
+from app.hooks import EVENT_STREAM_SCOPE
+from app.mailer import mail_queue
 from app.models.user import User
-from flask import g, session
+from flask import current_app, g, session
 from flask_jwt_extended import create_access_token, get_jwt_identity
 from flask_mail import Message
 
@@ -33,6 +35,11 @@ class AuthService:
         """
         user = User.query.filter_by(tenant_id=g.tenant_id, username=username).first()
         if user and user.check_password(password) and not user.deactivated:
+            # Upgrade hashes made under an older hashing policy while the password is at hand
+            if user.password_needs_rehash():
+                user.set_password(password)
+                db.session.commit()
+
             access_token = create_access_token(
                 identity=str(user.id),
                 additional_claims={
@@ -44,6 +51,32 @@ class AuthService:
             return {'access_token': access_token, 'role': user.role}
         return None
 
+    @staticmethod
+    def create_event_stream_token(user_id: int, tenant_id: str, role: str) -> str:
+        """
+        Create a short-lived token for connecting to event streams
+
+        Only accepted by event stream endpoints (see app.hooks.event_stream_required),
+        which take it in the query string since EventSource can't send headers
+
+        Args:
+            user_id: ID of user connecting
+            tenant_id: Tenant of the user (from their access token)
+            role: Role of the user (from their access token)
+
+        Returns:
+            Encoded JWT
+        """
+        return create_access_token(
+            identity=str(user_id),
+            additional_claims={
+                'tenant_id': str(tenant_id),
+                'role': str(role),
+                'scope': EVENT_STREAM_SCOPE
+            },
+            expires_delta=timedelta(seconds=current_app.config['EVENT_STREAM_TOKEN_SECONDS'])
+        )
+
     @staticmethod
     def forgot_password(email: str) -> bool:
         """
@@ -71,7 +104,8 @@ class AuthService:
                       sender="noreply@bakedinsights.com",
                       recipients=[email])
         msg.body = f"Your one-time password is: {otp_code}. This code is valid for a limited time."
-        mail.send(msg)
+        # Sent in the background, so the request doesn't wait on the mail server
+        mail_queue.send(msg)
         return True
 
     @staticmethod
@@ -3,9 +3,10 @@ Copyright (c) BakedInsights, Inc. and affiliates.
 All rights reserved.
 """
 
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from app import db
+from app.events import event_broker
 from app.models.checklist import (Checklist, ChecklistAssignment,
                                   ChecklistField, ChecklistItem,
                                   ChecklistTemplate)
@@ -87,6 +88,79 @@ class ChecklistService:
             return False
         return True
 
+    @staticmethod
+    def get_template_version(template_id: int) -> Optional[int]:
+        """
+        Get the change counter of template with given id
+
+        Args:
+            template_id: ID of template being requested
+
+        Returns:
+            Current version of the template, or None if not found
+        """
+        return db.session.query(ChecklistTemplate.version) \
+            .filter_by(id=template_id, tenant_id=g.tenant_id).scalar()
+
+    @staticmethod
+    def get_checklist_version(checklist_id: int) -> Optional[str]:
+        """
+        Get the change counter of checklist with given id
+
+        Checklist items are rendered with their template's fields, so the
+        checklist version combines both counters.
+
+        Args:
+            checklist_id: ID of checklist being requested
+
+        Returns:
+            Current version of the checklist, or None if not found
+        """
+        versions = db.session.query(Checklist.version, ChecklistTemplate.version) \
+            .join(ChecklistTemplate, Checklist.template_id == ChecklistTemplate.id) \
+            .filter(Checklist.id == checklist_id, Checklist.tenant_id == g.tenant_id).first()
+        if versions is None:
+            return None
+        return f"{versions[0]}.{versions[1]}"
+
+    @staticmethod
+    def bump_template_version(template_id: int):
+        """
+        Increment the change counter of a template (committed with the caller's transaction)
+
+        Args:
+            template_id: ID of template that changed
+        """
+        ChecklistTemplate.query.filter_by(id=template_id, tenant_id=g.tenant_id).update(
+            {ChecklistTemplate.version: ChecklistTemplate.version + 1}, synchronize_session=False)
+
+    @staticmethod
+    def bump_checklist_version(checklist_id: int):
+        """
+        Increment the change counter of a checklist (committed with the caller's transaction)
+
+        Args:
+            checklist_id: ID of checklist that changed
+        """
+        Checklist.query.filter_by(id=checklist_id, tenant_id=g.tenant_id).update(
+            {Checklist.version: Checklist.version + 1}, synchronize_session=False)
+
+    @staticmethod
+    def publish_checklist_event(checklist_id: int, op: str, item_id: Optional[int] = None):
+        """
+        Notify live viewers that a checklist changed (call after the change is committed)
+
+        Args:
+            checklist_id: ID of checklist that changed
+            op: Change operation ("update", "submit")
+            item_id: ID of the changed item, if any
+        """
+        event_broker.publish(
+            [event_broker.channel(g.tenant_id), event_broker.channel(g.tenant_id, "checklist", checklist_id)],
+            "checklist",
+            {"checklist_id": checklist_id, "item_id": item_id, "op": op},
+        )
+
     @staticmethod
     def create_checklist_template(data: Dict, creator_id: int) -> ChecklistTemplate:
         """
@@ -150,6 +224,7 @@ class ChecklistService:
                     template.archived = False
                 else:
                     template.archived = True
+                template.version = ChecklistTemplate.version + 1
                 db.session.add(template)
             else:
                 for field in template.fields:
@@ -189,6 +264,7 @@ class ChecklistService:
             db.session.commit()
 
             db.session.delete(field)
+            ChecklistService.bump_template_version(field.template_id)
             db.session.commit()
             return field
         except Exception as e:
@@ -260,6 +336,7 @@ class ChecklistService:
                     field.order = order
                     db.session.add(field)
 
+        template.version = ChecklistTemplate.version + 1
         try:
             db.session.add(template)
             db.session.commit()
@@ -343,6 +420,7 @@ class ChecklistService:
             checklist.items.append(item)
 
         template.checklists.append(checklist)
+        template.version = ChecklistTemplate.version + 1
 
         try:
             db.session.add(template)
@@ -547,12 +625,15 @@ class ChecklistService:
 
         try:
             db.session.add(item)
+            ChecklistService.bump_checklist_version(item.checklist_id)
             db.session.commit()
-            return item
         except Exception as e:
             db.session.rollback()
             raise Exception(f"Error creating template: {str(e)}")
 
+        ChecklistService.publish_checklist_event(item.checklist_id, "update", item_id=item.id)
+        return item
+
     @staticmethod
     def submit_checklist(checklist_id: int) -> Checklist:
         """
@@ -572,14 +653,17 @@ class ChecklistService:
             raise ValueError("Checklist not found")
 
         checklist.submitted = True
+        checklist.version = Checklist.version + 1
         try:
             db.session.add(checklist)
             db.session.commit()
-            return checklist
         except Exception as e:
             db.session.rollback()
             raise Exception(f"Error deleting file: {str(e)}")
 
+        ChecklistService.publish_checklist_event(checklist_id, "submit")
+        return checklist
+
     @staticmethod
     def share_template(acting_user_id: int, template_id: int, user_ids: List[int]) -> List[ChecklistAssignment]:
         """
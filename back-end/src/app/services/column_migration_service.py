@@ -0,0 +1,445 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from app import db
+from app.bulk import bulk
+from app.models.table import ColumnMigration, TableColumn
+from app.services.archive_service import ArchiveService
+from app.services.tab_storage_service import TabStorageService
+from flask import current_app, g
+from sqlalchemy import text
+
+
+class ColumnMigrationService:
+    """
+    Column Type Migration Service
+
+    Changing a column's data type converts its cells between value_* columns
+    of table_data. Conversions run in batches of cell ids, each batch in its
+    own short transaction, so large columns never hold long row locks:
+
+        copy:    write the converted value next to the original; the column
+                 keeps its old type, so readers see unchanged data
+        switch:  catch up with cells written meanwhile and change the type
+        cleanup: clear the original values
+
+    The last finished id is checkpointed with every batch (ColumnMigration),
+    so a failed or interrupted migration resumes where it stopped.
+    """
+
+    # The table_data column holding each convertible data type
+    VALUE_COLUMNS = {
+        'text': 'value_text',
+        'long-text': 'value_text',
+        'number': 'value_num',
+        'boolean': 'value_bool',
+        'date': 'value_date',
+        'sku': 'value_sku',
+        'lot-number': 'value_lotnum',
+    }
+    TEXT_VALUE_COLUMNS = ('value_text', 'value_sku', 'value_lotnum')
+
+    NUMBER_PATTERN = r'^[-+]?([0-9]+(\.[0-9]*)?|\.[0-9]+)([eE][-+]?[0-9]+)?$'
+    DATE_PATTERN = r'^[1-9][0-9]{3}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])$'  # YYYY-MM-DD
+    TRUE_VALUES = ('true', 'yes', '1', 't')
+    FALSE_VALUES = ('false', 'no', '0', 'f')
+
+    @staticmethod
+    def validate_types(prev_data_type: str, new_data_type: str):
+        """ Raise ValueError unless cells of prev_data_type can be converted to new_data_type """
+        if prev_data_type == new_data_type:
+            raise ValueError(f"Column is already of type '{new_data_type}'")
+        if prev_data_type in ('file', 'user'):
+            raise ValueError(f"Cannot convert field of type '{prev_data_type}' to another format")
+        if new_data_type in ('file', 'user'):
+            raise ValueError(f"Cannot convert an existing field to type '{new_data_type}'")
+        if prev_data_type not in ColumnMigrationService.VALUE_COLUMNS:
+            raise ValueError(f"Invalid data type: {prev_data_type}")
+        if new_data_type not in ColumnMigrationService.VALUE_COLUMNS:
+            raise ValueError(f"Invalid data type: {new_data_type}")
+
+    @staticmethod
+    def conversion_sql(prev_data_type: str, new_data_type: str) -> Tuple[str, str, str, str]:
+        """
+        Build the SQL converting cells of one data type to another
+
+        Dialect-specific pieces come from the bulk backend (see app.bulk).
+
+        Args:
+            prev_data_type: Current data type of the column
+            new_data_type: Data type to convert to
+
+        Returns:
+            Tuple of (source column, destination column, converted value
+            expression, expression that is true when a non-null source value
+            converts without losing data). Expressions take the
+            :number_pattern and :date_pattern parameters (see sql_params).
+        """
+        source_col = ColumnMigrationService.VALUE_COLUMNS[prev_data_type]
+        dest_col = ColumnMigrationService.VALUE_COLUMNS[new_data_type]
+
+        source_text = source_col if source_col in ColumnMigrationService.TEXT_VALUE_COLUMNS \
+            else bulk.to_text(source_col, prev_data_type)
+        value = f"TRIM({source_text})"
+
+        if new_data_type == 'number':
+            is_number = bulk.regex_match(value, 'number_pattern')
+            convert = f"CASE WHEN {is_number} THEN {bulk.to_number(value)} END"
+            valid = f"({is_number} OR {value} = '')"
+        elif new_data_type == 'boolean':
+            # Unrecognized values become false
+            true_values = ", ".join(f"'{v}'" for v in ColumnMigrationService.TRUE_VALUES)
+            known_values = ", ".join(f"'{v}'" for v in
+                                     ColumnMigrationService.TRUE_VALUES + ColumnMigrationService.FALSE_VALUES + ('',))
+            convert = f"LOWER({value}) IN ({true_values})"
+            valid = f"LOWER({value}) IN ({known_values})"
+        elif new_data_type == 'date':
+            # Real calendar dates only (the pattern alone allows e.g. February 30)
+            is_date = (
+                f"CASE WHEN {bulk.regex_match(value, 'date_pattern')} "
+                f"THEN {bulk.is_calendar_date(value)} ELSE FALSE END"
+            )
+            convert = f"CASE WHEN {is_date} THEN {bulk.to_date(value)} END"
+            valid = f"({is_date} OR {value} = '')"
+        else:
+            convert = source_text
+            valid = "TRUE"
+
+        return source_col, dest_col, convert, valid
+
+    @staticmethod
+    def sql_params(**params) -> Dict:
+        """ Bind parameters of conversion_sql expressions, plus the given ones """
+        return {
+            'number_pattern': ColumnMigrationService.NUMBER_PATTERN,
+            'date_pattern': ColumnMigrationService.DATE_PATTERN,
+            'tenant_id': g.tenant_id,
+            **params,
+        }
+
+    @staticmethod
+    def check_storage(column: TableColumn):
+        """
+        Raise ValueError if the column's cells are kept in record documents
+        (see TabStorageService) or partly in archive files (see ArchiveService)
+        """
+        if TabStorageService.get_storage_mode(column.tab_id) == 'document':
+            raise ValueError("Column types of document tabs cannot be changed, switch the tab to cells storage first")
+        if ArchiveService.has_archives(column.tab_id):
+            raise ValueError("Column types of tabs with archived records cannot be changed")
+
+    @staticmethod
+    def get_migration_report(column_id: int, new_data_type: str, limit: int = 100) -> Dict:
+        """
+        Dry run of a type change: count the cells that cannot be converted
+
+        Nothing is written. Cells listed here are nulled by a migration
+        (booleans become false), or make a strict migration fail.
+
+        Args:
+            column_id: ID of column to convert
+            new_data_type: Data type to convert to
+            limit: Maximum number of failing cells to list
+
+        Returns:
+            Dictionary with column_id, from, to, cells (cells with a value),
+            failed_count, failures (cell_id, record_id and value of the first
+            failing cells) and truncated (if more cells failed than listed)
+        """
+        column = TableColumn.query.filter_by(id=column_id, tenant_id=g.tenant_id).first()
+        if not column:
+            raise ValueError("Column not found")
+        ColumnMigrationService.validate_types(column.data_type, new_data_type)
+        ColumnMigrationService.check_storage(column)
+
+        source_col, _, _, valid = ColumnMigrationService.conversion_sql(column.data_type, new_data_type)
+        params = ColumnMigrationService.sql_params(column_id=column_id, limit=limit)
+        failed = f"{source_col} IS NOT NULL AND NOT {valid}"
+
+        cells, failed_count = db.session.execute(text(f"""
+            SELECT COUNT({source_col}), COUNT(CASE WHEN {failed} THEN 1 END)
+            FROM table_data
+            WHERE column_id = :column_id AND tenant_id = :tenant_id
+        """), params).one()
+
+        failures = db.session.execute(text(f"""
+            SELECT id, record_id, CAST({source_col} AS TEXT)
+            FROM table_data
+            WHERE column_id = :column_id AND tenant_id = :tenant_id AND {failed}
+            ORDER BY id
+            LIMIT :limit
+        """), params).all() if failed_count else []
+
+        return {
+            "column_id": column_id,
+            "from": column.data_type,
+            "to": new_data_type,
+            "cells": cells,
+            "failed_count": failed_count,
+            "failures": [
+                {"cell_id": cell_id, "record_id": record_id, "value": value}
+                for cell_id, record_id, value in failures
+            ],
+            "truncated": failed_count > len(failures),
+        }
+
+    @staticmethod
+    def get_migration(migration_id: int) -> Optional[ColumnMigration]:
+        """
+        Get a column migration
+
+        Args:
+            migration_id: ID of migration to retrieve
+
+        Returns:
+            ColumnMigration instance if found, None otherwise
+        """
+        return ColumnMigration.query.filter_by(id=migration_id, tenant_id=g.tenant_id).first()
+
+    @staticmethod
+    def start_migration(column_id: int, new_data_type: str, creator_id: int, strict: bool = False) -> ColumnMigration:
+        """
+        Create the checkpoint of a column type change (run it with run_migration)
+
+        Args:
+            column_id: ID of column to convert
+            new_data_type: Data type to convert to
+            creator_id: ID of user changing the column
+            strict: Refuse the change if any cell cannot be converted,
+                    instead of nulling those cells
+
+        Returns:
+            Created ColumnMigration instance
+        """
+        column = TableColumn.query.filter_by(id=column_id, tenant_id=g.tenant_id).first()
+        if not column:
+            raise ValueError("Column not found")
+        ColumnMigrationService.validate_types(column.data_type, new_data_type)
+        ColumnMigrationService.check_storage(column)
+
+        if ColumnMigration.query.filter_by(column_id=column_id, status='running', tenant_id=g.tenant_id).first():
+            raise ValueError("A type change of this column is already in progress")
+
+        # A new type change supersedes failed ones, which can no longer be resumed
+        ColumnMigration.query.filter_by(
+            column_id=column_id,
+            status='failed',
+            tenant_id=g.tenant_id
+        ).update({'status': 'cancelled'}, synchronize_session=False)
+
+        if strict:
+            report = ColumnMigrationService.get_migration_report(column_id, new_data_type, limit=0)
+            if report['failed_count']:
+                raise ValueError(f"{report['failed_count']} cells cannot be converted to '{new_data_type}'")
+
+        migration = ColumnMigration(
+            column_id=column_id,
+            tab_id=column.tab_id,
+            prev_data_type=column.data_type,
+            new_data_type=new_data_type,
+            strict=strict,
+            created_by=creator_id,
+            tenant_id=g.tenant_id
+        )
+        db.session.add(migration)
+        db.session.commit()
+        return migration
+
+    @staticmethod
+    def resume_migration(migration_id: int) -> ColumnMigration:
+        """
+        Mark a failed (or abandoned) migration as running again (run it with run_migration)
+
+        A running migration counts as abandoned once it hasn't checkpointed for JOB_STALE_SECONDS.
+
+        Args:
+            migration_id: ID of migration to resume
+
+        Returns:
+            Resumed ColumnMigration instance, or None if not found
+        """
+        migration = ColumnMigrationService.get_migration(migration_id)
+        if not migration:
+            return None
+
+        stale_before = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_STALE_SECONDS'])
+        if migration.status in ('succeeded', 'cancelled'):
+            raise ValueError(f"Migration already {migration.status}")
+        if migration.status == 'running' and (migration.updated_at or migration.created_at) > stale_before:
+            raise ValueError("Migration is still running")
+
+        migration.status = 'running'
+        migration.error = None
+        migration.updated_at = datetime.utcnow()
+        db.session.commit()
+        return migration
+
+    @staticmethod
+    def run_migration(migration_id: int, progress: Callable = None) -> ColumnMigration:
+        """
+        Run (or continue) a column type change from its checkpoint
+
+        Args:
+            migration_id: ID of migration returned by start_migration or resume_migration
+            progress: Optional progress(fraction, message) callback
+
+        Returns:
+            Finished ColumnMigration instance
+        """
+        migration = ColumnMigrationService.get_migration(migration_id)
+        if not migration:
+            raise ValueError("Migration not found")
+        if migration.status != 'running':
+            return migration
+
+        source_col, dest_col, convert, _ = ColumnMigrationService.conversion_sql(
+            migration.prev_data_type, migration.new_data_type
+        )
+
+        try:
+            if migration.phase == 'copy':
+                if source_col != dest_col:
+                    ColumnMigrationService._run_phase(migration_id, f"""
+                        UPDATE table_data
+                        SET {dest_col} = {convert}
+                        WHERE column_id = :column_id AND tenant_id = :tenant_id AND id > :after_id AND id <= :upto_id
+                          AND ({source_col} IS NOT NULL OR {dest_col} IS NOT NULL)
+                    """, progress, 0, 0.5)
+                ColumnMigrationService._switch_type(migration_id)
+
+            if source_col != dest_col:
+                ColumnMigrationService._run_phase(migration_id, f"""
+                    UPDATE table_data
+                    SET {source_col} = NULL
+                    WHERE column_id = :column_id AND tenant_id = :tenant_id AND id > :after_id AND id <= :upto_id
+                      AND {source_col} IS NOT NULL
+                """, progress, 0.5, 1)
+
+            migration = ColumnMigrationService._lock(migration_id)
+            migration.status = 'succeeded'
+            migration.finished_at = datetime.utcnow()
+            db.session.commit()
+            return migration
+
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.exception("Column migration %s failed", migration_id)
+            migration = db.session.get(ColumnMigration, migration_id)
+            migration.status = 'failed'
+            migration.error = str(e)
+            migration.updated_at = datetime.utcnow()
+            db.session.commit()
+            raise
+
+    @staticmethod
+    def _lock(migration_id: int) -> ColumnMigration:
+        """ Load a migration with a row lock, so concurrent runners take turns per batch """
+        return ColumnMigration.query.filter_by(
+            id=migration_id
+        ).with_for_update().populate_existing().one()
+
+    @staticmethod
+    def _run_phase(migration_id: int, sql: str, progress: Optional[Callable], start: float, end: float):
+        """
+        Apply an UPDATE to the column's cells in batches of ids, checkpointing each batch
+
+        Args:
+            migration_id: ID of running migration
+            sql: UPDATE limited to ids in (:after_id, :upto_id] of :column_id
+            progress: Optional progress(fraction, message) callback
+            start, end: Progress fractions at the start and end of the phase
+        """
+        batch_size = current_app.config['COLUMN_MIGRATION_BATCH_SIZE']
+        migration = ColumnMigrationService._lock(migration_id)
+
+        if migration.max_id is None:
+            # Cells added later are written with the column's current type (or caught up at the switch)
+            first_id, max_id = db.session.execute(
+                text("SELECT MIN(id), MAX(id) FROM table_data WHERE column_id = :column_id AND tenant_id = :tenant_id"),
+                {'column_id': migration.column_id, 'tenant_id': migration.tenant_id}
+            ).one()
+            migration.first_id = first_id or 0
+            migration.max_id = max_id or 0
+            migration.last_id = migration.first_id - 1 if first_id else 0
+            db.session.commit()
+            migration = ColumnMigrationService._lock(migration_id)
+
+        while migration.last_id < migration.max_id:
+            upto_id = db.session.execute(text("""
+                SELECT id FROM table_data
+                WHERE column_id = :column_id AND tenant_id = :tenant_id AND id > :after_id
+                ORDER BY id
+                LIMIT 1 OFFSET :offset
+            """), {
+                'column_id': migration.column_id,
+                'tenant_id': migration.tenant_id,
+                'after_id': migration.last_id,
+                'offset': batch_size - 1,
+            }).scalar()
+            upto_id = min(upto_id or migration.max_id, migration.max_id)
+
+            db.session.execute(text(sql), ColumnMigrationService.sql_params(
+                column_id=migration.column_id,
+                tenant_id=migration.tenant_id,
+                after_id=migration.last_id,
+                upto_id=upto_id,
+            ))
+            migration.last_id = upto_id
+            migration.updated_at = datetime.utcnow()
+            db.session.commit()
+
+            if progress:
+                span = max(migration.max_id - migration.first_id, 1)
+                progress(start + (end - start) * (upto_id - migration.first_id) / span,
+                         f"Converting cells ({migration.phase})")
+            migration = ColumnMigrationService._lock(migration_id)
+
+        db.session.commit()
+
+    @staticmethod
+    def _switch_type(migration_id: int):
+        """ Catch up with cells written during the copy, then change the column's type """
+        from app.services.table_service import TableService
+
+        migration = ColumnMigrationService._lock(migration_id)
+        if migration.phase != 'copy':
+            db.session.commit()
+            return
+
+        column = TableColumn.query.filter_by(id=migration.column_id).with_for_update().one()
+        source_col, dest_col, convert, valid = ColumnMigrationService.conversion_sql(
+            migration.prev_data_type, migration.new_data_type
+        )
+        params = ColumnMigrationService.sql_params(column_id=migration.column_id, tenant_id=migration.tenant_id)
+
+        if source_col != dest_col:
+            # Writes under the old type clear the other value columns, including the copied value
+            db.session.execute(text(f"""
+                UPDATE table_data
+                SET {dest_col} = {convert}
+                WHERE column_id = :column_id AND tenant_id = :tenant_id AND {source_col} IS NOT NULL AND {dest_col} IS NULL
+            """), params)
+            migration.cells_failed = db.session.execute(text(f"""
+                SELECT COUNT(*) FROM table_data
+                WHERE column_id = :column_id AND tenant_id = :tenant_id AND {source_col} IS NOT NULL AND NOT {valid}
+            """), params).scalar()
+            if migration.strict and migration.cells_failed:
+                raise ValueError(f"{migration.cells_failed} cells cannot be converted to '{migration.new_data_type}'")
+        else:
+            migration.cells_failed = 0
+
+        column.data_type = migration.new_data_type
+        migration.phase = 'cleanup'
+        migration.first_id = migration.max_id = None
+        migration.last_id = 0
+        migration.updated_at = datetime.utcnow()
+
+        version = TableService.bump_tab_version(column.tab_id)
+        TableService.log_table_changes(column.tab_id, version, "schema", [None], [column.id])
+        db.session.commit()
+        TableService.publish_tab_event(column.tab_id, version, "schema")
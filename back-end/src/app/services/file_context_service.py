@@ -4,181 +4,298 @@ All rights reserved.
 """
 
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 
+from app import db
 from app.models.checklist import Checklist, ChecklistItem
-from app.models.table import Table, TableData
+from app.models.table import Table, TableColumn, TableData, TableTab
 from app.utils import FileManager
-from flask import g
+from flask import current_app, g
+from sqlalchemy.orm import aliased
 
 
 class FileContextService:
     """Service for retrieving and organizing file context for AI"""
 
+    TEXT_PREVIEW_CHARS = 2000  # text attachments (including PDFs) are truncated to this length
+    TRUNCATED_MARKER = "\n[Content truncated to fit the context budget]\n\n---\n\n"
+
+    @staticmethod
+    def get_file_path(value_fpath):
+        """
+        Extract the file path from a stored value (remove presigned URL if present)
+
+        Args:
+            value_fpath: Stored file path value
+
+        Returns:
+            S3 key of the file
+        """
+        if FileManager.PRESIGNED_URL_DEMARKATION in value_fpath:
+            return value_fpath.split(FileManager.PRESIGNED_URL_DEMARKATION)[0]
+        return value_fpath
+
     @staticmethod
-    def get_context_from_checklist_items(items):
+    def get_file_contents(file_paths, deadline=None):
+        """
+        Download and parse files concurrently with a bounded worker pool
+
+        Each distinct file is fetched once. Files that are not ready when the
+        deadline passes are reported as errors rather than delaying the request.
+
+        Args:
+            file_paths: List of S3 keys
+            deadline: time.monotonic() value by which results are needed
+                      (defaults to AI_CONTEXT_DEADLINE_SECONDS from now)
+
+        Returns:
+            List of FileManager.get_file_content results, in the order of file_paths
+        """
+        if not file_paths:
+            return []
+
+        if deadline is None:
+            deadline = time.monotonic() + current_app.config.get("AI_CONTEXT_DEADLINE_SECONDS", 60)
+        unique_paths = list(dict.fromkeys(file_paths))
+        max_workers = min(current_app.config.get("AI_CONTEXT_MAX_WORKERS", 8), len(unique_paths))
+
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai-context")
+        try:
+            # One character past the preview is enough for the formatter to mark PDF text as truncated
+            futures = {
+                path: executor.submit(FileManager.get_file_content, path,
+                                      max_chars=FileContextService.TEXT_PREVIEW_CHARS + 1)
+                for path in unique_paths
+            }
+            wait(futures.values(), timeout=max(deadline - time.monotonic(), 0))
+        finally:
+            # Don't wait for (or start) downloads that missed the deadline
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        contents = {}
+        for path, future in futures.items():
+            if not future.done() or future.cancelled():
+                contents[path] = {"error": f"Timed out retrieving file {path}"}
+            elif future.exception():
+                contents[path] = {"error": f"Error retrieving file {path}: {str(future.exception())}"}
+            else:
+                contents[path] = future.result()
+        return [contents[path] for path in file_paths]
+
+    @staticmethod
+    def get_context_from_checklist_items(items, deadline=None):
         """
         Extract file content from checklist items
 
         Args:
-            items: List of checklist items
+            items: List of checklist item rows with (id, value_fpath)
+            deadline: time.monotonic() value by which file contents are needed
 
         Returns:
             List of dictionaries with file content and metadata
         """
-        file_contexts = []
+        items = [item for item in items if item.value_fpath]
+        file_paths = [FileContextService.get_file_path(item.value_fpath) for item in items]
+        file_contents = FileContextService.get_file_contents(file_paths, deadline=deadline)
 
-        for item in items:
-            if item.value_fpath:
-                # Extract the file path (remove presigned URL if present)
-                file_path = item.value_fpath
-                if FileManager.PRESIGNED_URL_DEMARKATION in file_path:
-                    file_path = file_path.split(FileManager.PRESIGNED_URL_DEMARKATION)[0]
-
-                # Get file content
-                file_content = FileManager.get_file_content(file_path)
-
-                if not file_content.get("error"):
-                    file_contexts.append({
-                        "source": "checklist",
-                        "item_id": item.id,
-                        "file_path": file_path,
-                        "content_type": file_content.get("content_type", ""),
-                        "content": file_content.get("content", ""),
-                        "size": file_content.get("size", 0)
-                    })
+        file_contexts = []
+        for item, file_path, file_content in zip(items, file_paths, file_contents):
+            if not file_content.get("error"):
+                file_contexts.append({
+                    "source": "checklist",
+                    "item_id": item.id,
+                    "file_path": file_path,
+                    "content_type": file_content.get("content_type", ""),
+                    "content": file_content.get("content", ""),
+                    "size": file_content.get("size", 0)
+                })
 
         return file_contexts
 
     @staticmethod
-    def get_context_from_table_data(table_data):
+    def get_context_from_table_data(table_data, deadline=None):
         """
         Extract file content from table data
 
         Args:
-            table_data: List of TableData objects
+            table_data: List of table data rows with (id, column_id, value_fpath, column_name)
+            deadline: time.monotonic() value by which file contents are needed
 
         Returns:
             List of dictionaries with file content and metadata
         """
-        file_contexts = []
+        table_data = [data for data in table_data if data.value_fpath]
+        file_paths = [FileContextService.get_file_path(data.value_fpath) for data in table_data]
+        column_names = [data.column_name or "Unknown" for data in table_data]
+        file_contents = FileContextService.get_file_contents(file_paths, deadline=deadline)
 
-        for data in table_data:
-            if data.value_fpath:
-                # Extract the file path
-                file_path = data.value_fpath
-                if FileManager.PRESIGNED_URL_DEMARKATION in file_path:
-                    file_path = file_path.split(FileManager.PRESIGNED_URL_DEMARKATION)[0]
-
-                # Get file content
-                file_content = FileManager.get_file_content(file_path)
-
-                if not file_content.get("error"):
-                    # Get related column information
-                    column = data.table_column
-
-                    file_contexts.append({
-                        "source": "table",
-                        "data_id": data.id,
-                        "column_name": column.name if column else "Unknown",
-                        "file_path": file_path,
-                        "content_type": file_content.get("content_type", ""),
-                        "content": file_content.get("content", ""),
-                        "size": file_content.get("size", 0)
-                    })
+        file_contexts = []
+        for data, column_name, file_path, file_content in zip(table_data, column_names, file_paths, file_contents):
+            if not file_content.get("error"):
+                file_contexts.append({
+                    "source": "table",
+                    "data_id": data.id,
+                    "column_name": column_name,
+                    "file_path": file_path,
+                    "content_type": file_content.get("content_type", ""),
+                    "content": file_content.get("content", ""),
+                    "size": file_content.get("size", 0)
+                })
 
         return file_contexts
 
     @staticmethod
-    def format_file_context_for_ai(file_contexts):
+    def iter_file_lines(index, ctx):
         """
-        Format file contexts into a structure suitable for AI
+        Render one file context as lines of text, lazily
 
         Args:
-            file_contexts: List of file context dictionaries
+            index: Position of the file in the context (0-based)
+            ctx: File context dictionary
 
-        Returns:
-            Formatted string with file contexts
+        Yields:
+            Lines of formatted text (each ending with a newline)
         """
-        if not file_contexts:
-            return ""
+        source = ctx.get("source", "unknown")
+        file_path = ctx.get("file_path", "")
+        content_type = ctx.get("content_type", "")
+        content = ctx.get("content", "")
+
+        # Format header based on source
+        if source == "checklist":
+            yield f"### File {index+1}: Checklist Attachment - {file_path}\n"
+        elif source == "table":
+            column_name = ctx.get("column_name", "Unknown Field")
+            yield f"### File {index+1}: Table Attachment - {column_name} - {file_path}\n"
+        else:
+            yield f"### File {index+1}: {file_path}\n"
+
+        yield f"Type: {content_type}\n\n"
+
+        def format_row(j, row):
+            if isinstance(row, dict):
+                row_str = ", ".join(f"{k}: {v}" for k, v in row.items())
+                return f"Row {j+1}: {row_str}\n"
+            return f"Row {j+1}: {row}\n"
+
+        # Format content based on type
+        if isinstance(content, dict) or isinstance(content, list):
+            # Format structured data (CSV, Excel)
+            try:
+                # First, try to format as headers/data structure
+                if isinstance(content, dict) and "headers" in content and "data" in content:
+                    headers = content.get("headers", [])
+                    data = content.get("data", [])
+
+                    yield f"Headers: {', '.join(headers)}\n\n"
+                    yield "Data:\n"
+
+                    for j, row in enumerate(data):
+                        yield format_row(j, row)
+
+                # For Excel files (multiple sheets)
+                elif all(isinstance(sheet_data, dict) for sheet_data in content.values()):
+                    for sheet_name, sheet_data in content.items():
+                        yield f"\nSheet: {sheet_name}\n"
+                        headers = sheet_data.get("headers", [])
+                        data = sheet_data.get("data", [])
+
+                        yield f"Headers: {', '.join(headers)}\n"
+                        yield "Data:\n"
+
+                        for j, row in enumerate(data[:10]):  # Limit to first 10 rows
+                            if isinstance(row, dict):
+                                yield format_row(j, row)
 
-        result = "## Attached Files\n\n"
+                        if len(data) > 10:
+                            yield f"...and {len(data) - 10} more rows\n"
 
-        for i, ctx in enumerate(file_contexts):
-            source = ctx.get("source", "unknown")
-            file_path = ctx.get("file_path", "")
-            content_type = ctx.get("content_type", "")
-            content = ctx.get("content", "")
-
-            # Format header based on source
-            if source == "checklist":
-                result += f"### File {i+1}: Checklist Attachment - {file_path}\n"
-            elif source == "table":
-                column_name = ctx.get("column_name", "Unknown Field")
-                result += f"### File {i+1}: Table Attachment - {column_name} - {file_path}\n"
+                # Last resort - convert to JSON
+                else:
+                    yield json.dumps(content, indent=2)
+
+            except Exception as e:
+                yield f"Error formatting structured data: {str(e)}\n"
+                yield str(content)
+
+        elif isinstance(content, str):
+            # Text content
+            if len(content) > FileContextService.TEXT_PREVIEW_CHARS:
+                # Truncate long text
+                yield content[:FileContextService.TEXT_PREVIEW_CHARS] + "...\n[Content truncated due to length]\n"
             else:
-                result += f"### File {i+1}: {file_path}\n"
+                yield content + "\n"
+        else:
+            yield str(content) + "\n"
 
-            result += f"Type: {content_type}\n\n"
+        yield "\n---\n\n"
 
-            # Format content based on type
-            if isinstance(content, dict) or isinstance(content, list):
-                # Format structured data (CSV, Excel)
-                try:
-                    # First, try to format as headers/data structure
-                    if isinstance(content, dict) and "headers" in content and "data" in content:
-                        headers = content.get("headers", [])
-                        data = content.get("data", [])
+    @staticmethod
+    def iter_file_context_for_ai(file_contexts, max_chars=None):
+        """
+        Format file contexts for AI as a stream of text chunks within a character budget
 
-                        result += f"Headers: {', '.join(headers)}\n\n"
-                        result += "Data:\n"
+        The budget is shared fairly: each file may use an equal share of what is
+        left, so budget unused by small files goes to the files after them.
+        Files are rendered lazily and stop at their share, so large attachments
+        cost no more than their share in time or memory.
 
-                        for j, row in enumerate(data):
-                            if isinstance(row, dict):
-                                row_str = ", ".join(f"{k}: {v}" for k, v in row.items())
-                                result += f"Row {j+1}: {row_str}\n"
-                            else:
-                                result += f"Row {j+1}: {row}\n"
-
-                    # For Excel files (multiple sheets)
-                    elif all(isinstance(sheet_data, dict) for sheet_data in content.values()):
-                        for sheet_name, sheet_data in content.items():
-                            result += f"\nSheet: {sheet_name}\n"
-                            headers = sheet_data.get("headers", [])
-                            data = sheet_data.get("data", [])
-
-                            result += f"Headers: {', '.join(headers)}\n"
-                            result += "Data:\n"
-
-                            for j, row in enumerate(data[:10]):  # Limit to first 10 rows
-                                if isinstance(row, dict):
-                                    row_str = ", ".join(f"{k}: {v}" for k, v in row.items())
-                                    result += f"Row {j+1}: {row_str}\n"
-
-                            if len(data) > 10:
-                                result += f"...and {len(data) - 10} more rows\n"
-
-                    # Last resort - convert to JSON
-                    else:
-                        result += json.dumps(content, indent=2)
-
-                except Exception as e:
-                    result += f"Error formatting structured data: {str(e)}\n"
-                    result += str(content)
-
-            elif isinstance(content, str):
-                # Text content
-                if len(content) > 2000:
-                    # Truncate long text
-                    result += content[:2000] + "...\n[Content truncated due to length]\n"
-                else:
-                    result += content + "\n"
-            else:
-                result += str(content) + "\n"
+        Args:
+            file_contexts: List of file context dictionaries
+            max_chars: Total character budget (defaults to AI_CONTEXT_MAX_CHARS; 0 for no limit)
+
+        Yields:
+            Chunks of formatted text
+        """
+        if not file_contexts:
+            return
+
+        if max_chars is None:
+            max_chars = current_app.config.get("AI_CONTEXT_MAX_CHARS", 100000)
+
+        header = "## Attached Files\n\n"
+        yield header
+        remaining = max_chars - len(header) if max_chars else None
+
+        for i, ctx in enumerate(file_contexts):
+            share = remaining // (len(file_contexts) - i) if max_chars else None
+            if share is not None and share <= len(FileContextService.TRUNCATED_MARKER):
+                # Nothing meaningful fits any more; say so if there's room and stop
+                omitted = f"[{len(file_contexts) - i} more files omitted to fit the context budget]\n"
+                if len(omitted) <= remaining:
+                    yield omitted
+                return
+
+            used = 0
+            lines = FileContextService.iter_file_lines(i, ctx)
+            for line in lines:
+                if share is not None and used + len(line) > share - len(FileContextService.TRUNCATED_MARKER):
+                    fit = share - len(FileContextService.TRUNCATED_MARKER) - used
+                    chunk = line[:fit] + FileContextService.TRUNCATED_MARKER
+                    used += len(chunk)
+                    yield chunk
+                    lines.close()
+                    break
+                used += len(line)
+                yield line
+
+            if remaining is not None:
+                remaining -= used
+
+    @staticmethod
+    def format_file_context_for_ai(file_contexts, max_chars=None):
+        """
+        Format file contexts into a structure suitable for AI
 
-            result += "\n---\n\n"
+        Args:
+            file_contexts: List of file context dictionaries
+            max_chars: Total character budget (see iter_file_context_for_ai)
 
-        return result
+        Returns:
+            Formatted string with file contexts
+        """
+        return "".join(FileContextService.iter_file_context_for_ai(file_contexts, max_chars=max_chars))
 
     @staticmethod
     def get_file_context_for_ai(
@@ -188,6 +305,8 @@ class FileContextService:
         end_date=None,
         table_ids=None,
         template_ids=None,
+        max_chars=None,
+        stream=False,
     ):
         """
         Get File Context for AI Endpoint
@@ -199,6 +318,8 @@ class FileContextService:
             end_date: End date for date range
             table_ids: Table IDs to filter by (can be multiple)
             checklist_ids: Checklist IDs to filter by (can be multiple)
+            max_chars: Character budget for the formatted context (defaults to AI_CONTEXT_MAX_CHARS)
+            stream: Return the formatted context as a generator of text chunks instead of a string
 
         Returns:
             Structured file context information for AI
@@ -209,131 +330,120 @@ class FileContextService:
             if not any([sku, lot_number, start_date, end_date, table_ids, template_ids]):
                 raise Exception("At least one filter (SKU, LOT number, Date Range, Tables, Templates) must be provided")
 
-            # Find matching table data with file attachments
-            table_data_query = TableData.query.filter(
+            # Candidate table cells: one query returning only (id, column_id, value_fpath, column_name),
+            # with every filter compiled into semi-join subqueries over table_data
+            table_data_query = db.session.query(
+                TableData.id,
+                TableData.column_id,
+                TableData.value_fpath,
+                TableColumn.name.label("column_name"),
+            ).outerjoin(TableColumn, TableColumn.id == TableData.column_id).filter(
                 TableData.value_fpath.isnot(None),
                 TableData.tenant_id == g.tenant_id
             )
 
             # Apply table filter if specified
             if table_ids:
-                # Find tables with the specified IDs
-                tables = Table.query.filter(
+                tables_exist = db.session.query(Table.id).filter(
                     Table.id.in_(table_ids),
                     Table.tenant_id == g.tenant_id,
-                ).all()
-                if not tables:
+                ).first()
+                if not tables_exist:
                     raise Exception("No tables found with the provided IDs")
 
-                # Get all tab IDs from the selected tables
-                tab_ids = []
-                for table in tables:
-                    for tab in table.tabs:
-                        tab_ids.append(tab.id)
-
-                # Filter table data by tab IDs
+                # Filter table data by the tabs of the selected tables
+                tab_ids = db.session.query(TableTab.id).filter(
+                    TableTab.table_id.in_(table_ids),
+                    TableTab.tenant_id == g.tenant_id,
+                )
                 table_data_query = table_data_query.filter(TableData.tab_id.in_(tab_ids))
 
+            def record_has_cell(criteria):
+                """ EXISTS a cell in the same record matching criteria(cell) """
+                cell = aliased(TableData)
+                return db.session.query(cell.id).filter(
+                    cell.record_id == TableData.record_id,
+                    cell.tenant_id == g.tenant_id,
+                    *criteria(cell),
+                ).exists()
+
             # Apply filters
             if sku:
-                # Find records that have this SKU
-                sku_records = TableData.query.filter_by(value_sku=sku, tenant_id=g.tenant_id).all()
-                record_ids = [data.record_id for data in sku_records]
-                table_data_query = table_data_query.filter(TableData.record_id.in_(record_ids))
+                # Records that have this SKU
+                table_data_query = table_data_query.filter(
+                    record_has_cell(lambda cell: [cell.value_sku == sku]))
 
             if lot_number:
-                # Find records that have this lot number
-                lot_records = TableData.query.filter_by(value_lotnum=lot_number, tenant_id=g.tenant_id).all()
-                record_ids = [data.record_id for data in lot_records]
-                table_data_query = table_data_query.filter(TableData.record_id.in_(record_ids))
+                # Records that have this lot number
+                table_data_query = table_data_query.filter(
+                    record_has_cell(lambda cell: [cell.value_lotnum == lot_number]))
 
             if start_date or end_date:
-                # Find records that fall within the date range
-                date_records = []
-                date_query = TableData.query.filter(TableData.tenant_id == g.tenant_id)
-
-                if start_date and end_date:
-                    # Filter records between start_date and end_date
-                    date_records = date_query.filter(
-                        TableData.value_date >= start_date,
-                        TableData.value_date <= end_date
-                    ).all()
-                elif start_date:
-                    # Filter records on or after start_date
-                    date_records = date_query.filter(
-                        TableData.value_date >= start_date
-                    ).all()
-                elif end_date:
-                    # Filter records on or before end_date
-                    date_records = date_query.filter(
-                        TableData.value_date <= end_date
-                    ).all()
-
-                record_ids = [data.record_id for data in date_records]
-                table_data_query = table_data_query.filter(TableData.record_id.in_(record_ids))
+                # Records with a date that falls within the date range
+                def in_date_range(cell):
+                    criteria = []
+                    if start_date:
+                        criteria.append(cell.value_date >= start_date)
+                    if end_date:
+                        criteria.append(cell.value_date <= end_date)
+                    return criteria
+
+                table_data_query = table_data_query.filter(record_has_cell(in_date_range))
 
             # Execute query
             table_data = table_data_query.all()
 
-            # Find matching checklist items with file attachments
-            checklist_items_query = ChecklistItem.query.filter(
+            # Candidate checklist items: (id, value_fpath) only
+            checklist_items_query = db.session.query(
+                ChecklistItem.id,
+                ChecklistItem.value_fpath,
+            ).filter(
                 ChecklistItem.value_fpath.isnot(None),
                 ChecklistItem.tenant_id == g.tenant_id
             )
 
             # Apply filters to checklist items
             if template_ids:
-                # Find all checklists that belong to the specified templates
-                checklists_for_templates = Checklist.query.filter(
+                # Only items of checklists created from the specified templates
+                checklist_ids = db.session.query(Checklist.id).filter(
                     Checklist.template_id.in_(template_ids),
                     Checklist.tenant_id == g.tenant_id
-                ).all()
-
-                if not checklists_for_templates:
-                    # No checklists found for these templates, but that's okay - just empty results
-                    checklist_items_query = checklist_items_query.filter(False)
-                else:
-                    # Get all checklist IDs from the matching checklists
-                    checklist_ids = [checklist.id for checklist in checklists_for_templates]
-                    # Filter checklist items to only those from these checklists
-                    checklist_items_query = checklist_items_query.filter(ChecklistItem.checklist_id.in_(checklist_ids))
+                )
+                checklist_items_query = checklist_items_query.filter(ChecklistItem.checklist_id.in_(checklist_ids))
 
             if sku:
-                checklist_items_query = checklist_items_query.filter_by(value_sku=sku)
+                checklist_items_query = checklist_items_query.filter(ChecklistItem.value_sku == sku)
 
             if lot_number:
-                checklist_items_query = checklist_items_query.filter_by(value_lotnum=lot_number)
+                checklist_items_query = checklist_items_query.filter(ChecklistItem.value_lotnum == lot_number)
 
             # Apply date range filter to checklist items
-            if start_date or end_date:
-                if start_date and end_date:
-                    checklist_items_query = checklist_items_query.filter(
-                        ChecklistItem.completed_at >= start_date,
-                        ChecklistItem.completed_at <= end_date
-                    )
-                elif start_date:
-                    checklist_items_query = checklist_items_query.filter(
-                        ChecklistItem.completed_at >= start_date
-                    )
-                elif end_date:
-                    checklist_items_query = checklist_items_query.filter(
-                        ChecklistItem.completed_at <= end_date
-                    )
+            if start_date:
+                checklist_items_query = checklist_items_query.filter(ChecklistItem.completed_at >= start_date)
+            if end_date:
+                checklist_items_query = checklist_items_query.filter(ChecklistItem.completed_at <= end_date)
 
             # Execute query
             checklist_items = checklist_items_query.all()
 
-            # Get file context from both sources
-            table_file_contexts = FileContextService.get_context_from_table_data(table_data)
-            checklist_file_contexts = FileContextService.get_context_from_checklist_items(checklist_items)
+            # Get file context from both sources, sharing one deadline for the request
+            deadline = time.monotonic() + current_app.config.get("AI_CONTEXT_DEADLINE_SECONDS", 60)
+            table_file_contexts = FileContextService.get_context_from_table_data(table_data, deadline=deadline)
+            checklist_file_contexts = FileContextService.get_context_from_checklist_items(
+                checklist_items, deadline=deadline)
 
             # Combine contexts
             all_file_contexts = table_file_contexts + checklist_file_contexts
 
             # Format for AI
+            if stream:
+                return (
+                    all_file_contexts,
+                    FileContextService.iter_file_context_for_ai(all_file_contexts, max_chars=max_chars),
+                )
             return (
                 all_file_contexts,
-                FileContextService.format_file_context_for_ai(all_file_contexts),
+                FileContextService.format_file_context_for_ai(all_file_contexts, max_chars=max_chars),
             )
 
         except Exception as e:
@@ -0,0 +1,253 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from app import db
+from app.hooks import configure_db_transaction
+from app.models.job import Job
+from flask import current_app, g
+from werkzeug.utils import secure_filename
+
+
+class JobService:
+    """
+    Background Job Service
+
+    Jobs are rows in the job table: the API queues them and worker processes
+    (run_worker.py) claim them with SELECT ... FOR UPDATE SKIP LOCKED, so any
+    number of workers can share the queue. Handlers are registered in app.jobs.
+    """
+
+    @staticmethod
+    def stage_file(file) -> str:
+        """
+        Save an uploaded file where workers can read it
+
+        Args:
+            file: Uploaded file (werkzeug FileStorage)
+
+        Returns:
+            Path of the staged file
+        """
+        staging_dir = current_app.config['JOB_STAGING_DIR']
+        os.makedirs(staging_dir, exist_ok=True)
+        path = os.path.join(staging_dir, f"{uuid.uuid4().hex}-{secure_filename(file.filename)}")
+        file.save(path)
+        return path
+
+    @staticmethod
+    def get_staged_path(job: Job) -> Optional[str]:
+        """
+        Get the staged file of a job, checked to be inside a staging directory
+
+        Payload paths are only ever set by the server (stage_file, completed
+        uploads), but the worker reads and deletes them, so anything outside
+        JOB_STAGING_DIR and UPLOAD_STAGING_DIR is refused
+
+        Args:
+            job: Job whose payload may hold a file_path
+
+        Returns:
+            Resolved path of the staged file, or None if the job has none
+        """
+        path = (job.payload or {}).get('file_path')
+        if not path:
+            return None
+
+        real_path = os.path.realpath(path)
+        for staging_dir in (current_app.config['JOB_STAGING_DIR'], current_app.config['UPLOAD_STAGING_DIR']):
+            staging_dir = os.path.realpath(staging_dir)
+            if real_path != staging_dir and os.path.commonpath([real_path, staging_dir]) == staging_dir:
+                return real_path
+        raise ValueError("Staged file is outside the staging directories")
+
+    @staticmethod
+    def submit(kind: str, payload: Dict, creator_id: int) -> Job:
+        """
+        Queue a job for the workers
+
+        Args:
+            kind: Job kind (a key of app.jobs.JOB_HANDLERS)
+            payload: JSON-serializable job arguments
+            creator_id: ID of user submitting the job
+
+        Returns:
+            Created Job instance
+        """
+        from app.jobs import FILE_JOB_KINDS, JOB_HANDLERS
+
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Invalid job kind. Must be one of: {', '.join(JOB_HANDLERS)}")
+        if kind in FILE_JOB_KINDS and not payload.get('file_path'):
+            raise ValueError("No file provided")
+
+        job = Job(
+            kind=kind,
+            payload=payload,
+            created_by=creator_id,
+            tenant_id=g.tenant_id
+        )
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    @staticmethod
+    def get_job(job_id: int, user_id: int) -> Optional[Job]:
+        """
+        Get a job submitted by the user
+
+        Args:
+            job_id: ID of job to retrieve
+            user_id: ID of user requesting the job
+
+        Returns:
+            Job instance if found, None otherwise
+        """
+        return Job.query.filter_by(
+            id=job_id,
+            created_by=user_id,
+            tenant_id=g.tenant_id
+        ).first()
+
+    @staticmethod
+    def get_user_jobs(user_id: int, limit: int = 50) -> List[Job]:
+        """
+        Get the user's most recent jobs
+
+        Args:
+            user_id: ID of user whose jobs to retrieve
+            limit: Maximum number of jobs to return
+
+        Returns:
+            List of Job instances, newest first
+        """
+        return Job.query.filter_by(
+            created_by=user_id,
+            tenant_id=g.tenant_id
+        ).order_by(Job.id.desc()).limit(limit).all()
+
+    @staticmethod
+    def claim_next_job() -> Optional[Job]:
+        """
+        Claim the oldest queued job (worker side)
+
+        Returns:
+            Claimed Job instance, now running, or None if the queue is empty
+        """
+        job = Job.query.filter(
+            Job.status == 'queued'
+        ).order_by(Job.id).with_for_update(skip_locked=True).first()
+        if job is None:
+            db.session.rollback()
+            return None
+
+        now = datetime.utcnow()
+        job.status = 'running'
+        job.started_at = now
+        job.updated_at = now
+        job.attempts += 1
+        db.session.commit()
+        return job
+
+    @staticmethod
+    def report_progress(job_id: int, progress: float, message: str = None):
+        """
+        Record a running job's progress
+
+        Written on its own connection, so it is visible while the job's
+        own transaction is still open. The connection is scoped to the
+        job's tenant like the session's (see configure_db_transaction).
+
+        Args:
+            job_id: ID of running job
+            progress: Fraction of the work done (0 to 1)
+            message: Optional description of the current step
+        """
+        with db.engine.begin() as conn:
+            configure_db_transaction(None, None, conn)
+            conn.execute(
+                db.update(Job).where(Job.id == job_id).values(
+                    progress=min(max(progress, 0), 1),
+                    progress_message=message[:255] if message else None,
+                    updated_at=datetime.utcnow(),
+                )
+            )
+
+    @staticmethod
+    def run_job(job: Job):
+        """
+        Run a claimed job and store its result or error (worker side)
+
+        Runs with g.tenant_id set to the job's tenant, so handlers can use the
+        same services as the API, and with the job statement timeout (see
+        DB_JOB_STATEMENT_TIMEOUT_MS). Staged files are removed afterwards,
+        unless they are outside the staging directories (see get_staged_path).
+
+        Args:
+            job: Job instance returned by claim_next_job
+        """
+        from app.jobs import JOB_HANDLERS
+
+        job_id = job.id
+        staged_path = None
+        g.tenant_id = job.tenant_id
+        g.bypass_rls = False
+        # Jobs exist to run long work outside requests
+        g.statement_timeout_ms = current_app.config['DB_JOB_STATEMENT_TIMEOUT_MS']
+        # The job runs in transactions begun from here, under its tenant
+        db.session.rollback()
+
+        try:
+            staged_path = JobService.get_staged_path(job)
+            result = JOB_HANDLERS[job.kind](
+                job,
+                lambda progress, message=None: JobService.report_progress(job_id, progress, message)
+            )
+
+            job = db.session.get(Job, job_id)
+            job.status = 'succeeded'
+            job.result = result
+            job.progress = 1
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.exception("Job %s (%s) failed", job_id, job.kind)
+            job = db.session.get(Job, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+
+        finally:
+            if staged_path and os.path.exists(staged_path):
+                os.unlink(staged_path)
+
+    @staticmethod
+    def fail_stale_jobs() -> int:
+        """
+        Fail running jobs whose worker stopped reporting (worker side)
+
+        A job counts as stale once it hasn't reported progress for JOB_STALE_SECONDS.
+
+        Returns:
+            Number of jobs marked as failed
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_STALE_SECONDS'])
+        count = Job.query.filter(
+            Job.status == 'running',
+            Job.updated_at < cutoff
+        ).update({
+            'status': 'failed',
+            'error': "Job was interrupted before it finished",
+            'finished_at': datetime.utcnow(),
+        }, synchronize_session=False)
+        db.session.commit()
+        return count
@@ -0,0 +1,338 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app import db
+from app.bulk import CELL_COLUMNS, bulk
+from app.models.table import ColumnMigration, TableColumn, TableData, TableRecord, TableTab
+from app.utils import FileManager
+from flask import g
+
+
+class TabStorageService:
+    """
+    Tab Storage Service
+
+    A tab stores its cells in one of two layouts (TableTab.storage_mode):
+
+        cells:     one table_data row per cell, with a value_* column per
+                   data type (default)
+        document:  one JSON document per record (TableRecord.data) mapping
+                   column IDs to values
+
+    Document tabs write and read a whole row as one database row, so large
+    logging tabs scan far fewer rows. Cells of document tabs have no
+    data_id, their columns' data types cannot be changed, and their files
+    are not searched for chat context (FileContextService reads table_data).
+    """
+
+    # The cell value column whose value documents store, by data type
+    DOCUMENT_VALUE_COLUMNS = {
+        'text': 'value_text',
+        'long-text': 'value_text',
+        'number': 'value_num',
+        'boolean': 'value_bool',
+        'date': 'value_date',
+        'file': 'value_fpath',
+        'sku': 'value_sku',
+        'lot-number': 'value_lotnum',
+        'user': 'value_user_id',
+    }
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def validate_storage_mode(storage_mode: str) -> str:
+        """ Return storage_mode, raising ValueError unless it is a valid storage mode """
+        if storage_mode not in TableTab.STORAGE_MODES:
+            raise ValueError(f"Invalid storage mode. Must be one of: {', '.join(TableTab.STORAGE_MODES)}")
+        return storage_mode
+
+    @staticmethod
+    def get_storage_mode(tab_id: int, for_write: bool = False) -> str:
+        """
+        Storage mode of a tab ("cells" for unknown tabs)
+
+        Args:
+            tab_id: ID of tab
+            for_write: Share-lock the tab row until the caller's transaction
+                       ends, so set_storage_mode can't switch the layout
+                       before cells written in that mode are committed
+
+        Returns:
+            "cells" or "document"
+        """
+        query = db.session.query(TableTab.storage_mode).filter_by(
+            id=tab_id,
+            tenant_id=g.tenant_id
+        )
+        if for_write:
+            query = query.with_for_update(read=True)
+        return query.scalar() or 'cells'
+
+    @staticmethod
+    def to_document_value(data_type: str, cell: Dict):
+        """
+        Value stored in a record document for a cell
+
+        Args:
+            data_type: Data type of the cell's column
+            cell: The cell's value_* columns (see TableService.get_cell_columns)
+
+        Returns:
+            JSON value (dates as YYYY-MM-DD strings)
+        """
+        value = cell.get(TabStorageService.DOCUMENT_VALUE_COLUMNS.get(data_type))
+        if value == '' and data_type in ('date', 'user'):
+            return None
+        if data_type == 'date' and value is not None:
+            if isinstance(value, datetime):
+                value = value.date()
+            if not isinstance(value, date):
+                try:
+                    value = date.fromisoformat(str(value))
+                except ValueError:
+                    raise ValueError(f"Invalid date: {value}")
+            return value.isoformat()
+        if data_type == 'user' and value is not None:
+            return int(value)
+        return value
+
+    @staticmethod
+    def from_document_value(data_type: str, value):
+        """ Cell value as displayed for its column's data type (see TableService.get_cell_value) """
+        if value is None:
+            return None
+        if data_type == 'date':
+            return date.fromisoformat(value)
+        if data_type == 'boolean':
+            return bool(value)
+        if data_type == 'file':
+            return value + FileManager.PRESIGNED_URL_DEMARKATION + FileManager.get_file(value) if value else None
+        return value
+
+    @staticmethod
+    def iter_cells(tab_id: int, column_data_types: Dict[int, str], storage_mode: str,
+                   record_ids: Optional[List[int]] = None) -> Iterator[Tuple[int, Optional[int], int, object]]:
+        """
+        Read the cells of a tab, in record order
+
+        Args:
+            tab_id: ID of tab to read
+            column_data_types: Data type of each column ID
+            storage_mode: Storage mode of the tab
+            record_ids: Optional records to limit the read to
+
+        Returns:
+            Iterator of (column_id, data_id, record_id, value) tuples,
+            data_id being None for document tabs
+        """
+        from app.services.table_service import TableService
+
+        if storage_mode == 'document':
+            records = db.session.query(TableRecord.id, TableRecord.data).filter(
+                TableRecord.tab_id == tab_id,
+                TableRecord.tenant_id == g.tenant_id,
+            )
+            if record_ids is not None:
+                records = records.filter(TableRecord.id.in_(record_ids))
+            for record_id, document in records.order_by(TableRecord.id).yield_per(TabStorageService.BATCH_SIZE):
+                for key, value in (document or {}).items():
+                    column_id = int(key)
+                    if column_id in column_data_types:
+                        data_type = column_data_types[column_id]
+                        yield column_id, None, record_id, TabStorageService.from_document_value(data_type, value)
+            return
+
+        cells = TableData.query.filter(
+            TableData.tab_id == tab_id,
+            TableData.tenant_id == g.tenant_id,
+        )
+        if record_ids is not None:
+            cells = cells.filter(TableData.record_id.in_(record_ids))
+        for cell in cells.order_by(TableData.id).yield_per(TabStorageService.BATCH_SIZE):
+            data_type = column_data_types.get(cell.column_id)
+            yield cell.column_id, cell.id, cell.record_id, TableService.get_cell_value(data_type, cell)
+
+    @staticmethod
+    def iter_column_cells(tab_id: int, column_id: int, data_type: str) -> Iterator[Tuple[int, int, object]]:
+        """
+        Stream the cells of one column of a "cells" tab, in record order
+
+        Only the column's value is fetched, from a server-side cursor (yield_per),
+        so a column of any size is read with flat memory. Document tabs keep
+        all of a record's cells in one document, so they are read whole with
+        iter_cells instead of once per column.
+
+        Args:
+            tab_id: ID of tab owning the column
+            column_id: ID of column to read
+            data_type: Data type of the column
+
+        Returns:
+            Iterator of (data_id, record_id, value) tuples
+        """
+        value_column = TabStorageService.DOCUMENT_VALUE_COLUMNS.get(data_type)
+        cells = db.session.query(
+            TableData.id,
+            TableData.record_id,
+            getattr(TableData, value_column) if value_column else db.null(),
+        ).filter(
+            TableData.column_id == column_id,
+            TableData.tab_id == tab_id,
+            TableData.tenant_id == g.tenant_id,
+        ).order_by(TableData.id).yield_per(TabStorageService.BATCH_SIZE)
+        for data_id, record_id, value in cells:
+            if data_type == 'file':
+                value = value + FileManager.PRESIGNED_URL_DEMARKATION + FileManager.get_file(value) if value else None
+            yield data_id, record_id, value
+
+    @staticmethod
+    def write_cells(cells: List[Dict], column_data_types: Dict[int, str], storage_mode: str):
+        """
+        Write cells in the tab's storage mode, in the caller's transaction
+
+        Args:
+            cells: Cells as rows for bulk.upsert_cells (record_id, column_id, value_* columns, ...)
+            column_data_types: Data type of each column ID
+            storage_mode: Storage mode of the tab
+        """
+        if storage_mode != 'document':
+            bulk.upsert_cells(cells)
+            return
+
+        patches = {}
+        for cell in cells:
+            patches.setdefault(cell['record_id'], {})[str(cell['column_id'])] = \
+                TabStorageService.to_document_value(column_data_types[cell['column_id']], cell)
+        if patches:
+            bulk.merge_documents(g.tenant_id, patches)
+
+    @staticmethod
+    def get_file_paths(tab_id: int, record_id: int, column_ids: List[int], storage_mode: str) -> Dict[int, str]:
+        """ Stored file paths of a record's file cells, by column ID """
+        if not column_ids:
+            return {}
+        if storage_mode == 'document':
+            document = db.session.query(TableRecord.data).filter_by(
+                id=record_id,
+                tab_id=tab_id,
+                tenant_id=g.tenant_id
+            ).scalar() or {}
+            return {column_id: document[str(column_id)] for column_id in column_ids if document.get(str(column_id))}
+        return dict(db.session.query(TableData.column_id, TableData.value_fpath).filter(
+            TableData.tab_id == tab_id,
+            TableData.record_id == record_id,
+            TableData.column_id.in_(column_ids),
+            TableData.tenant_id == g.tenant_id,
+        ).all())
+
+    @staticmethod
+    def delete_column_cells(tab_id: int, column_id: int, storage_mode: str):
+        """ Delete a column's cells, in the caller's transaction """
+        if storage_mode == 'document':
+            bulk.remove_document_key(tab_id, g.tenant_id, str(column_id))
+        else:
+            TableData.query.filter_by(column_id=column_id, tenant_id=g.tenant_id).delete(synchronize_session=False)
+
+    @staticmethod
+    def set_storage_mode(tab_id: int, storage_mode: str) -> Optional[TableTab]:
+        """
+        Switch a tab's storage mode, moving its cells in batches of records
+
+        Runs in one transaction, so readers see either layout but never a mix.
+
+        Args:
+            tab_id: ID of tab to switch
+            storage_mode: "cells" or "document"
+
+        Returns:
+            Updated TableTab instance, or None if not found
+        """
+        from app.services.table_service import TableService
+
+        TabStorageService.validate_storage_mode(storage_mode)
+
+        tab = TableTab.query.filter_by(id=tab_id, tenant_id=g.tenant_id).with_for_update().first()
+        if not tab or tab.storage_mode == storage_mode:
+            db.session.commit()
+            return tab
+        if ColumnMigration.query.filter_by(tab_id=tab_id, status='running', tenant_id=g.tenant_id).first():
+            db.session.rollback()
+            raise ValueError("A column type change of this tab is in progress")
+
+        column_data_types = dict(db.session.query(TableColumn.id, TableColumn.data_type).filter_by(
+            tab_id=tab_id,
+            tenant_id=g.tenant_id
+        ).all())
+        record_ids = [record_id for (record_id,) in db.session.query(TableRecord.id).filter_by(
+            tab_id=tab_id,
+            tenant_id=g.tenant_id
+        ).order_by(TableRecord.id)]
+
+        try:
+            for start in range(0, len(record_ids), TabStorageService.BATCH_SIZE):
+                batch = record_ids[start:start + TabStorageService.BATCH_SIZE]
+                if storage_mode == 'document':
+                    TabStorageService._cells_to_documents(batch, column_data_types)
+                else:
+                    TabStorageService._documents_to_cells(tab_id, batch, column_data_types)
+
+            if storage_mode == 'document':
+                TableData.query.filter_by(tab_id=tab_id, tenant_id=g.tenant_id).delete(synchronize_session=False)
+            else:
+                TableRecord.query.filter_by(tab_id=tab_id, tenant_id=g.tenant_id).update(
+                    {'data': None}, synchronize_session=False
+                )
+
+            tab.storage_mode = storage_mode
+            version = TableService.bump_tab_version(tab_id)
+            TableService.log_table_changes(tab_id, version, "schema", [None])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        TableService.publish_tab_event(tab_id, version, "schema")
+        return tab
+
+    @staticmethod
+    def _cells_to_documents(record_ids: List[int], column_data_types: Dict[int, str]):
+        value_columns = [getattr(TableData, name) for name in CELL_COLUMNS if name.startswith('value_')]
+        cells = db.session.query(TableData.record_id, TableData.column_id, *value_columns).filter(
+            TableData.tenant_id == g.tenant_id,
+            TableData.record_id.in_(record_ids),
+        )
+
+        patches = {}
+        for cell in cells:
+            data_type = column_data_types.get(cell.column_id)
+            if data_type:
+                patches.setdefault(cell.record_id, {})[str(cell.column_id)] = \
+                    TabStorageService.to_document_value(data_type, cell._asdict())
+        if patches:
+            bulk.merge_documents(g.tenant_id, patches)
+
+    @staticmethod
+    def _documents_to_cells(tab_id: int, record_ids: List[int], column_data_types: Dict[int, str]):
+        documents = db.session.query(TableRecord.id, TableRecord.data).filter(
+            TableRecord.tenant_id == g.tenant_id,
+            TableRecord.id.in_(record_ids),
+        )
+
+        cells = []
+        for record_id, document in documents:
+            for key, value in (document or {}).items():
+                data_type = column_data_types.get(int(key))
+                if not data_type or value is None:
+                    continue
+                cell = dict.fromkeys(CELL_COLUMNS)
+                cell.update(tab_id=tab_id, column_id=int(key), record_id=record_id, tenant_id=g.tenant_id)
+                cell[TabStorageService.DOCUMENT_VALUE_COLUMNS[data_type]] = \
+                    date.fromisoformat(value) if data_type == 'date' else value
+                cells.append(tuple(cell[name] for name in CELL_COLUMNS))
+        if cells:
+            bulk.insert_cells(cells)
@@ -3,19 +3,32 @@ Copyright (c) BakedInsights, Inc. and affiliates.
 All rights reserved.
 """
 
-from typing import Dict, List
+import csv
+import io
+import itertools
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 from app import db
-from app.models.table import (Table, TableColumn, TableData, TableRecord,
-                              TableShare, TableTab)
+from app.bulk import CELL_COLUMNS, bulk
+from app.events import event_broker
+from app.models.table import (ColumnMigration, Table, TableChange,
+                              TableColumn, TableData, TableRecord, TableShare,
+                              TableTab)
+from app.services.archive_service import ArchiveService
+from app.services.tab_storage_service import TabStorageService
 from app.utils import FileManager
-from flask import g
+from flask import current_app, g
 from werkzeug.utils import secure_filename
 
 
 class TableService:
     """ Table Service """
 
+    CELL_VALUE_COLUMNS = ('value_text', 'value_num', 'value_bool', 'value_date',
+                          'value_fpath', 'value_sku', 'value_lotnum', 'value_user_id')
+
     @staticmethod
     def validate_user_for_record(user_id: int, record_id: int):
         """
@@ -108,6 +121,235 @@ class TableService:
         """
         return Table.query.filter_by(id=table_id, tenant_id=g.tenant_id).first()
 
+    @staticmethod
+    def get_table_version(table_id: int) -> Optional[int]:
+        """
+        Get the change counter of table with given id
+
+        Args:
+            table_id: ID of table being request
+
+        Returns:
+            Current version of the table, or None if not found
+        """
+        return db.session.query(Table.version).filter_by(id=table_id, tenant_id=g.tenant_id).scalar()
+
+    @staticmethod
+    def bump_table_version(table_id: int) -> Optional[int]:
+        """
+        Increment the change counter of a table (committed with the caller's transaction)
+
+        The row lock taken here is held until the caller commits, so concurrent
+        writes to the same table are serialized and versions follow commit order
+
+        Args:
+            table_id: ID of table that changed
+
+        Returns:
+            New version of the table
+        """
+        return db.session.execute(
+            db.update(Table)
+            .where(Table.id == table_id, Table.tenant_id == g.tenant_id)
+            .values(version=Table.version + 1)
+            .returning(Table.version)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+
+    @staticmethod
+    def bump_tab_version(tab_id: int) -> Optional[int]:
+        """
+        Increment the change counter of the table owning a tab (committed with the caller's transaction)
+
+        Args:
+            tab_id: ID of tab that changed
+
+        Returns:
+            New version of the table
+        """
+        table_id = db.session.query(TableTab.table_id).filter_by(id=tab_id).scalar_subquery()
+        return db.session.execute(
+            db.update(Table)
+            .where(Table.id == table_id, Table.tenant_id == g.tenant_id)
+            .values(version=Table.version + 1)
+            .returning(Table.version)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+
+    @staticmethod
+    def log_table_changes(tab_id: int, version: int, op: str, record_ids: List[int], column_ids: List[int] = None):
+        """
+        Append changes to a tab's change log (committed with the caller's transaction)
+
+        Args:
+            tab_id: ID of tab that changed
+            version: Table version returned by bump_tab_version for this transaction
+            op: "update", "insert", "delete" or "schema"
+            record_ids: IDs of changed records (None entries for schema changes)
+            column_ids: IDs of changed columns, aligned with record_ids (omit for whole records)
+        """
+        if not record_ids:
+            return
+        if column_ids is None:
+            column_ids = [None] * len(record_ids)
+        db.session.execute(db.insert(TableChange), [{
+            "tab_id": tab_id,
+            "version": version,
+            "op": op,
+            "record_id": record_id,
+            "column_id": column_id,
+            "tenant_id": g.tenant_id,
+        } for record_id, column_id in zip(record_ids, column_ids)])
+
+    @staticmethod
+    def publish_tab_event(tab_id: int, version: int, op: str):
+        """
+        Notify live viewers that a tab changed (call after the change is committed)
+
+        Args:
+            tab_id: ID of tab that changed
+            version: Table version of the change
+            op: Change operation ("update", "insert", "delete")
+        """
+        table_id = db.session.query(TableTab.table_id).filter_by(id=tab_id, tenant_id=g.tenant_id).scalar()
+        event_broker.publish(
+            [event_broker.channel(g.tenant_id), event_broker.channel(g.tenant_id, "table", table_id)],
+            "table",
+            {"table_id": table_id, "tab_id": tab_id, "version": version, "op": op},
+        )
+
+    @staticmethod
+    def get_tab_change_version(tab_id: int) -> int:
+        """
+        Get the latest version in a tab's change log
+
+        Args:
+            tab_id: ID of tab being requested
+
+        Returns:
+            Latest version, or 0 if the tab never changed
+        """
+        logged_version = db.session.query(db.func.max(TableChange.version)) \
+            .filter_by(tab_id=tab_id, tenant_id=g.tenant_id).scalar() or 0
+        pruned_version = db.session.query(TableTab.changes_pruned_version) \
+            .filter_by(id=tab_id, tenant_id=g.tenant_id).scalar() or 0
+        return max(logged_version, pruned_version)
+
+    @staticmethod
+    def prune_table_changes(retention_days: int = None) -> int:
+        """
+        Drop change log entries older than the retention period (worker side)
+
+        Whole versions are dropped at once, and each tab remembers the latest
+        version it dropped, so get_tab_changes can send older clients a full reload
+
+        Args:
+            retention_days: Days of changes to keep (defaults to TABLE_CHANGE_RETENTION_DAYS)
+
+        Returns:
+            Number of change log entries deleted
+        """
+        if retention_days is None:
+            retention_days = current_app.config['TABLE_CHANGE_RETENTION_DAYS']
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+
+        expired = db.session.query(TableChange.tab_id, db.func.max(TableChange.version)).filter(
+            TableChange.changed_at < cutoff
+        ).group_by(TableChange.tab_id).all()
+
+        deleted = 0
+        for tab_id, version in expired:
+            try:
+                TableTab.query.filter(
+                    TableTab.id == tab_id,
+                    TableTab.changes_pruned_version < version
+                ).update({'changes_pruned_version': version}, synchronize_session=False)
+                deleted += TableChange.query.filter(
+                    TableChange.tab_id == tab_id,
+                    TableChange.version <= version
+                ).delete(synchronize_session=False)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        return deleted
+
+    @staticmethod
+    def get_tab_changes(tab_id: int, since: int, limit: int = 10000) -> Dict:
+        """
+        Get the cells of a tab that changed after a given version
+
+        Clients that synced before the latest pruned version (see
+        prune_table_changes) get a full reload, since their changes are gone
+
+        Args:
+            tab_id: ID of tab being requested
+            since: Table version the client last synced
+            limit: Maximum number of log entries to replay before asking for a full reload
+
+        Returns:
+            {
+                version: latest version included,
+                full_resync: whether the client must reload the whole tab,
+                deleted_records: [record_id],
+                data: [{column_id, data_id, value, record_id}],
+            }
+        """
+        pruned_version = db.session.query(TableTab.changes_pruned_version) \
+            .filter_by(id=tab_id, tenant_id=g.tenant_id).scalar() or 0
+        changes = [] if since < pruned_version else TableChange.query.filter(
+            TableChange.tab_id == tab_id,
+            TableChange.tenant_id == g.tenant_id,
+            TableChange.version > since,
+        ).order_by(TableChange.version).limit(limit + 1).all()
+
+        version = changes[-1].version if changes else since
+        if since < pruned_version or len(changes) > limit or any(c.op == "schema" for c in changes):
+            return {
+                "version": TableService.get_tab_change_version(tab_id),
+                "full_resync": True,
+                "deleted_records": [],
+                "data": [],
+            }
+
+        deleted_records = set()
+        inserted_records = set()
+        updated_cells = set()
+        for change in changes:
+            if change.op == "delete":
+                deleted_records.add(change.record_id)
+            elif change.op == "insert":
+                inserted_records.add(change.record_id)
+            elif change.op == "update":
+                updated_cells.add((change.record_id, change.column_id))
+
+        record_ids = (inserted_records | {record_id for record_id, _ in updated_cells}) - deleted_records
+        data = []
+        if record_ids:
+            column_data_types = {
+                c.id: c.data_type
+                for c in TableColumn.query.filter_by(tab_id=tab_id, tenant_id=g.tenant_id).all()
+            }
+            cells = TabStorageService.iter_cells(
+                tab_id, column_data_types, TabStorageService.get_storage_mode(tab_id), list(record_ids)
+            )
+            for column_id, data_id, record_id, value in cells:
+                if record_id not in inserted_records and (record_id, column_id) not in updated_cells:
+                    continue
+                data.append({
+                    "column_id": column_id,
+                    "data_id": data_id,
+                    "value": value,
+                    "record_id": record_id,
+                })
+
+        return {
+            "version": version,
+            "full_resync": False,
+            "deleted_records": sorted(deleted_records),
+            "data": data,
+        }
+
     @staticmethod
     def get_table_shares(table_id: int):
         """
@@ -161,67 +403,207 @@ class TableService:
         return TableTab.query.filter_by(id=tab_id, tenant_id=g.tenant_id).first()
 
     @staticmethod
-    def get_tab_data(tab_id: int):
+    def get_tab_data(tab_id: int, include_archived: bool = False):
         """
         Get all data for given tab id
 
         Args:
             tab_id: ID of tab being request
+            include_archived: Whether to include the cells of archived records first (see ArchiveService)
 
         Returns:
             [column_data_i = {
                 header: {column_id, column_name, column_data_type, column_index},
                 data: {data_id, value, row_index}
             } for i in num. columns]
-
+            (data_id is None for document tabs and archived records)
         """
         # Get columns
         column_data = []
         tab = TableTab.query.filter_by(id=tab_id, tenant_id=g.tenant_id).first()
+        column_data_types = {c.id: c.data_type for c in tab.columns}
+
+        # One tenant-scoped read for all cells (prunes to the tenant's partition of table_data)
+        cells = TabStorageService.iter_cells(tab_id, column_data_types, tab.storage_mode)
+        if include_archived:
+            cells = itertools.chain(ArchiveService.iter_cells(tab_id, column_data_types), cells)
+
+        cells_by_column = {}
+        for column_id, data_id, record_id, value in cells:
+            cells_by_column.setdefault(column_id, []).append({
+                "data_id": data_id,
+                "value": value,
+                "record_id": record_id,
+            })
+
         for c in tab.columns:
-            data_type = c.data_type
             header = {
                 "column_id": c.id,
                 "column_name": c.name,
-                "column_data_type": data_type,
+                "column_data_type": c.data_type,
             }
-            # Get table data for each column
-            table_data = []
-            for t in c.table_data:
-                value = None
-                if data_type in ["text", "long-text"]:
-                    value = t.value_text
-                elif data_type == "number":
-                    value = t.value_num
-                elif data_type == "boolean":
-                    value = t.value_bool
-                elif data_type == "date":
-                    value = t.value_date
-                elif data_type == "file":
-                    if t.value_fpath:
-                        value = t.value_fpath \
-                                + FileManager.PRESIGNED_URL_DEMARKATION \
-                                + FileManager.get_file(t.value_fpath)
-                elif data_type == "sku":
-                    value = t.value_sku
-                elif data_type == "lot-number":
-                    value = t.value_lotnum
-                elif data_type == "user":
-                    value = t.value_user_id
-
-                table_data.append({
-                    "data_id": t.id,
-                    "value": value,
-                    "record_id": t.record_id,
-                })
-
             column_data.append({
                 "header": header,
-                "data": table_data,
+                "data": cells_by_column.get(c.id, []),
             })
 
         return column_data
 
+    @staticmethod
+    def iter_tab_data(tab_id: int, include_archived: bool = False) -> Iterator[Dict]:
+        """
+        Stream the data of a tab, one column at a time (for JSONStream)
+
+        Same format as get_tab_data, but for "cells" tabs each column's data is
+        an iterator over its own server-side cursor (see
+        TabStorageService.iter_column_cells), read while the response is
+        written, so memory stays flat for tabs of any size. Document tabs are
+        read in one pass over their records, as get_tab_data does, and their
+        cells are buffered per column: reading a column at a time would go
+        through every record document once per column.
+
+        Args:
+            tab_id: ID of tab being request
+            include_archived: Whether to include the cells of archived records first (see ArchiveService)
+
+        Returns:
+            Iterator of {header, data: iterator of {data_id, value, record_id}} per column
+        """
+        tab = TableTab.query.filter_by(id=tab_id, tenant_id=g.tenant_id).first()
+        if tab.storage_mode == 'document':
+            document_cells = {}
+            column_data_types = {c.id: c.data_type for c in tab.columns}
+            for column_id, data_id, record_id, value in TabStorageService.iter_cells(
+                tab_id, column_data_types, tab.storage_mode
+            ):
+                document_cells.setdefault(column_id, []).append((data_id, record_id, value))
+
+        for c in tab.columns:
+            if tab.storage_mode == 'document':
+                cells = document_cells.pop(c.id, [])
+            else:
+                cells = TabStorageService.iter_column_cells(tab_id, c.id, c.data_type)
+            if include_archived:
+                cells = itertools.chain(ArchiveService.iter_column_cells(tab_id, c.id, c.data_type), cells)
+            yield {
+                "header": {
+                    "column_id": c.id,
+                    "column_name": c.name,
+                    "column_data_type": c.data_type,
+                },
+                "data": ({
+                    "data_id": data_id,
+                    "value": value,
+                    "record_id": record_id,
+                } for data_id, record_id, value in cells),
+            }
+
+    @staticmethod
+    def get_record_data(tab_id: int, record_id: int, include_archived: bool = False) -> Optional[Dict]:
+        """
+        Get the cells of one record of a tab
+
+        Args:
+            tab_id: ID of tab owning the record
+            record_id: ID of record being requested
+            include_archived: Whether to look for the record in the tab's archives too
+
+        Returns:
+            {archived, data: [{column_id, data_id, value}]}, or None if not found
+        """
+        tab = TableTab.query.filter_by(id=tab_id, tenant_id=g.tenant_id).first()
+        if not tab:
+            return None
+        column_data_types = {c.id: c.data_type for c in tab.columns}
+
+        if TableRecord.query.filter_by(id=record_id, tab_id=tab_id, tenant_id=g.tenant_id).first():
+            archived = False
+            cells = TabStorageService.iter_cells(tab_id, column_data_types, tab.storage_mode, [record_id])
+        elif include_archived:
+            archived = True
+            cells = ArchiveService.get_record_cells(tab_id, column_data_types, record_id)
+            if cells is None:
+                return None
+        else:
+            return None
+
+        return {
+            "archived": archived,
+            "data": [{
+                "column_id": column_id,
+                "data_id": data_id,
+                "value": value,
+            } for column_id, data_id, _, value in cells],
+        }
+
+    @staticmethod
+    def get_cell_value(data_type: str, cell: TableData):
+        """
+        Get the value of a cell as displayed for its column's data type
+
+        Args:
+            data_type: Data type of the cell's column
+            cell: TableData instance
+
+        Returns:
+            Cell value (file cells get a presigned URL appended)
+        """
+        value = None
+        if data_type in ["text", "long-text"]:
+            value = cell.value_text
+        elif data_type == "number":
+            value = cell.value_num
+        elif data_type == "boolean":
+            value = cell.value_bool
+        elif data_type == "date":
+            value = cell.value_date
+        elif data_type == "file":
+            if cell.value_fpath:
+                value = cell.value_fpath \
+                        + FileManager.PRESIGNED_URL_DEMARKATION \
+                        + FileManager.get_file(cell.value_fpath)
+        elif data_type == "sku":
+            value = cell.value_sku
+        elif data_type == "lot-number":
+            value = cell.value_lotnum
+        elif data_type == "user":
+            value = cell.value_user_id
+        return value
+
+    @staticmethod
+    def get_cell_columns(data_type: str, value) -> Dict:
+        """
+        Map a value to the TableData column that stores its data type
+
+        Args:
+            data_type: Data type of the cell's column
+            value: Value to store (file cells take the S3 key of an uploaded file)
+
+        Returns:
+            Dictionary of every value_* column, None except for the one holding the value
+        """
+        columns = dict.fromkeys(TableService.CELL_VALUE_COLUMNS)
+        if data_type in ['text', 'long-text']:
+            columns['value_text'] = value
+        elif data_type == 'number':
+            try:
+                columns['value_num'] = float(value) if value not in [None, ''] else None
+            except (ValueError, TypeError):
+                columns['value_num'] = None
+        elif data_type == 'boolean':
+            columns['value_bool'] = value in ["true", "True", "TRUE", True]
+        elif data_type == 'date':
+            columns['value_date'] = value
+        elif data_type == 'file':
+            columns['value_fpath'] = value
+        elif data_type == 'sku':
+            columns['value_sku'] = value
+        elif data_type == 'lot-number':
+            columns['value_lotnum'] = value
+        elif data_type == 'user':
+            columns['value_user_id'] = value
+        return columns
+
     @staticmethod
     def delete_table_column(column_id: int) -> bool:
         """
@@ -239,8 +621,13 @@ class TableService:
 
         try:
             # Delete data first, then column using bulk operations
-            TableData.query.filter_by(column_id=column_id).delete(synchronize_session=False)
+            TabStorageService.delete_column_cells(
+                column.tab_id, column_id, TabStorageService.get_storage_mode(column.tab_id, for_write=True)
+            )
+            ColumnMigration.query.filter_by(column_id=column_id).delete(synchronize_session=False)
             TableColumn.query.filter_by(id=column_id).delete(synchronize_session=False)
+            version = TableService.bump_tab_version(column.tab_id)
+            TableService.log_table_changes(column.tab_id, version, "schema", [None], [column_id])
             db.session.commit()
             return True
         except Exception as e:
@@ -268,12 +655,25 @@ class TableService:
             
             if tab_ids:
                 # Delete in correct order using bulk DELETE statements (much faster)
+                # 0. TableChange (references tabs)
+                TableChange.query.filter(TableChange.tab_id.in_(tab_ids)).delete(synchronize_session=False)
                 # 1. TableData (references records, columns, tabs)
-                TableData.query.filter(TableData.tab_id.in_(tab_ids)).delete(synchronize_session=False)
+                TableData.query.filter(
+                    TableData.tenant_id == g.tenant_id,
+                    TableData.tab_id.in_(tab_ids)
+                ).delete(synchronize_session=False)
                 # 2. TableRecord (references tabs)
-                TableRecord.query.filter(TableRecord.tab_id.in_(tab_ids)).delete(synchronize_session=False)
+                TableRecord.query.filter(
+                    TableRecord.tenant_id == g.tenant_id,
+                    TableRecord.tab_id.in_(tab_ids)
+                ).delete(synchronize_session=False)
                 # 3. TableColumn (references tabs)
+                ColumnMigration.query.filter(ColumnMigration.tab_id.in_(tab_ids)).delete(synchronize_session=False)
                 TableColumn.query.filter(TableColumn.tab_id.in_(tab_ids)).delete(synchronize_session=False)
+                # 3b. TableArchive (references tabs), files removed once committed
+                archive_keys = ArchiveService.delete_archives(tab_ids)
+            else:
+                archive_keys = []
             
             # 4. TableShare (references table)
             TableShare.query.filter_by(table_id=table_id).delete(synchronize_session=False)
@@ -282,6 +682,7 @@ class TableService:
             # 6. Table itself - use bulk delete to avoid stale session issues
             Table.query.filter_by(id=table_id).delete(synchronize_session=False)
             db.session.commit()
+            ArchiveService.delete_files(archive_keys)
             return True
         except Exception as e:
             db.session.rollback()
@@ -304,15 +705,22 @@ class TableService:
 
         try:
             # Delete in correct order using bulk DELETE statements (much faster)
+            # 0. TableChange (references tabs)
+            TableChange.query.filter_by(tab_id=tab_id).delete(synchronize_session=False)
             # 1. TableData (references records, columns, tabs)
-            TableData.query.filter_by(tab_id=tab_id).delete(synchronize_session=False)
+            TableData.query.filter_by(tab_id=tab_id, tenant_id=g.tenant_id).delete(synchronize_session=False)
             # 2. TableRecord (references tabs)
-            TableRecord.query.filter_by(tab_id=tab_id).delete(synchronize_session=False)
+            TableRecord.query.filter_by(tab_id=tab_id, tenant_id=g.tenant_id).delete(synchronize_session=False)
             # 3. TableColumn (references tabs)
+            ColumnMigration.query.filter_by(tab_id=tab_id).delete(synchronize_session=False)
             TableColumn.query.filter_by(tab_id=tab_id).delete(synchronize_session=False)
+            # 3b. TableArchive (references tabs), files removed once committed
+            archive_keys = ArchiveService.delete_archives([tab_id])
             # 4. Tab itself - use bulk delete to avoid stale session issues
             TableTab.query.filter_by(id=tab_id).delete(synchronize_session=False)
+            TableService.bump_table_version(tab.table_id)
             db.session.commit()
+            ArchiveService.delete_files(archive_keys)
             return True
         except Exception as e:
             db.session.rollback()
@@ -329,6 +737,7 @@ class TableService:
                     name,
                     tabs: [{
                         name,
+                        storage_mode (optional, "cells" or "document"),
                         columns: [{
                             name,
                             data_type,
@@ -361,6 +770,7 @@ class TableService:
                 name=tab_data['name'].strip(),
                 table_id=table.id,
                 tab_index=i,
+                storage_mode=TabStorageService.validate_storage_mode(tab_data.get('storage_mode', 'cells')),
                 tenant_id=g.tenant_id
             )
             table.tabs.append(tab)
@@ -396,7 +806,10 @@ class TableService:
         # Add cell data using optimized raw SQL bulk insert (32x faster than ORM)
         for tab_id, column_ids, rows_data in tabs_info:
             # Fetch fresh column info in new session (after commit above)
-            fresh_columns = TableColumn.query.filter(TableColumn.id.in_(column_ids)).all()
+            fresh_columns = TableColumn.query.filter(
+                TableColumn.tenant_id == g.tenant_id,
+                TableColumn.id.in_(column_ids)
+            ).all()
             column_order = {cid: i for i, cid in enumerate(column_ids)}
             fresh_columns.sort(key=lambda c: column_order[c.id])
 
@@ -405,11 +818,204 @@ class TableService:
                 tab_id=tab_id,
                 columns=fresh_columns,
                 rows_data=rows_data,
+                log_changes=False,
             )
 
         # Return fresh table object
         return Table.query.get(table_id)
 
+    @staticmethod
+    def infer_csv_columns(fieldnames: List[str], first_row: Dict) -> List[Dict]:
+        """
+        Infer column definitions from the first row of a CSV file
+
+        Columns whose first value is a number (ignoring commas and spaces)
+        become number columns, the rest text.
+
+        Args:
+            fieldnames: CSV header
+            first_row: First data row (csv.DictReader row)
+
+        Returns:
+            List of column definitions in the format expected by create_table
+        """
+        columns = []
+        for column_name in fieldnames:
+            value = (first_row.get(column_name) or '').strip()
+            # Simple type inference with better number detection
+            data_type = 'text'
+            if value:
+                try:
+                    # Remove common number formatting (commas, spaces)
+                    cleaned = value.replace(',', '').replace(' ', '')
+                    float(cleaned)
+                    data_type = 'number'
+                except (ValueError, TypeError):
+                    data_type = 'text'
+
+            columns.append({
+                "name": column_name,
+                "data_type": data_type
+            })
+        return columns
+
+    @staticmethod
+    def clean_csv_row(fieldnames: List[str], columns: List[Dict], row: Dict) -> List:
+        """
+        Convert a CSV row to a list of values in column order, cleaning number values
+
+        Args:
+            fieldnames: CSV header
+            columns: Column definitions from infer_csv_columns
+            row: Data row (csv.DictReader row)
+
+        Returns:
+            List of cell values
+        """
+        row_data = []
+        for i, col in enumerate(fieldnames):
+            value = (row.get(col) or '').strip()
+            # Clean number values if this column was inferred as number
+            if columns[i]['data_type'] == 'number' and value:
+                # Remove commas and extra spaces from numbers
+                value = value.replace(',', '').replace(' ', '')
+            row_data.append(value)
+        return row_data
+
+    @staticmethod
+    def parse_csv(content: str) -> Tuple[List[Dict], List[List]]:
+        """
+        Parse CSV text into column definitions and row data
+
+        Args:
+            content: CSV text with a header row
+
+        Returns:
+            Tuple of (columns, rows) in the format expected by create_table
+        """
+        stream = io.StringIO(content, newline=None)
+        csv_reader = csv.DictReader(stream)
+
+        # Extract headers and determine data types
+        fieldnames = csv_reader.fieldnames
+        if not fieldnames:
+            raise ValueError("CSV file is empty or invalid")
+
+        columns = None
+        data_rows = []
+        for row in csv_reader:
+            if columns is None:
+                columns = TableService.infer_csv_columns(fieldnames, row)
+            data_rows.append(TableService.clean_csv_row(fieldnames, columns, row))
+
+        if not data_rows:
+            raise ValueError("CSV file contains no data rows")
+
+        return columns, data_rows
+
+    @staticmethod
+    def import_csv(content: str, table_name: str, creator_id: int) -> Tuple[Table, int]:
+        """
+        Create a new single-tab table from CSV text
+
+        Args:
+            content: CSV text with a header row
+            table_name: Name of the new table
+            creator_id: ID of user creating the table
+
+        Returns:
+            Tuple of (created Table instance, number of rows imported)
+        """
+        columns, data_rows = TableService.parse_csv(content)
+
+        # Create table using existing service
+        table_data = {
+            "name": table_name,
+            "tabs": [{
+                "name": "Tab 1",
+                "columns": columns,
+                "data": data_rows
+            }]
+        }
+
+        table = TableService.create_table(
+            data=table_data,
+            creator_id=creator_id
+        )
+        return table, len(data_rows)
+
+    @staticmethod
+    def import_csv_file(
+        path: str,
+        table_name: str,
+        creator_id: int,
+        batch_size: int = 5000,
+        progress: Optional[Callable[[float, str], None]] = None,
+    ) -> Tuple[Table, int]:
+        """
+        Create a new single-tab table from a CSV file, streaming it in batches
+
+        Only one batch of rows is held in memory at a time, so the file can
+        be far larger than an upload. The table is removed again if the
+        import fails part-way.
+
+        Args:
+            path: Path of the UTF-8 CSV file (with a header row)
+            table_name: Name of the new table
+            creator_id: ID of user creating the table
+            batch_size: Number of rows inserted per batch
+            progress: Optional callback receiving (fraction of the file read, message)
+
+        Returns:
+            Tuple of (created Table instance, number of rows imported)
+        """
+        total_bytes = os.path.getsize(path) or 1
+        with open(path, 'rb') as raw_file:
+            text_file = io.TextIOWrapper(raw_file, encoding='UTF8', newline='')
+            try:
+                csv_reader = csv.DictReader(text_file)
+                fieldnames = csv_reader.fieldnames
+                if not fieldnames:
+                    raise ValueError("CSV file is empty or invalid")
+
+                first_row = next(csv_reader, None)
+                if first_row is None:
+                    raise ValueError("CSV file contains no data rows")
+                columns = TableService.infer_csv_columns(fieldnames, first_row)
+
+                table = TableService.create_table(
+                    data={"name": table_name, "tabs": [{"name": "Tab 1", "columns": columns}]},
+                    creator_id=creator_id
+                )
+                table_id = table.id
+                tab = table.tabs[0]
+                tab_id = tab.id
+                tab_columns = [{"id": column.id, "data_type": column.data_type} for column in tab.columns]
+
+                try:
+                    rows_imported = 0
+                    batch = [TableService.clean_csv_row(fieldnames, columns, first_row)]
+                    for row in csv_reader:
+                        batch.append(TableService.clean_csv_row(fieldnames, columns, row))
+                        if len(batch) >= batch_size:
+                            rows_imported += TableService.bulk_insert_table_data(
+                                tab_id=tab_id, columns=tab_columns, rows_data=batch, log_changes=False)
+                            batch = []
+                            if progress:
+                                progress(raw_file.tell() / total_bytes, f"Imported {rows_imported} rows")
+                    rows_imported += TableService.bulk_insert_table_data(
+                        tab_id=tab_id, columns=tab_columns, rows_data=batch, log_changes=False)
+                except Exception:
+                    TableService.delete_table(table_id)
+                    raise
+
+            except UnicodeDecodeError:
+                raise ValueError("File must be UTF-8 encoded")
+            finally:
+                text_file.detach()
+
+        return Table.query.get(table_id), rows_imported
+
     @staticmethod
     def create_tab(data: Dict, table_id: int) -> Table:
         """
@@ -419,6 +1025,7 @@ class TableService:
             data: Dictionary containing tab data
                 {
                     name,
+                    storage_mode (optional, "cells" or "document"),
                     columns: [{
                         name,
                         data_type,
@@ -437,6 +1044,7 @@ class TableService:
             name=data['name'].strip(),
             table_id=table_id,
             tab_index=tab_index,
+            storage_mode=TabStorageService.validate_storage_mode(data.get('storage_mode', 'cells')),
             tenant_id=g.tenant_id,
         )
 
@@ -451,44 +1059,41 @@ class TableService:
             tab.columns.append(column)
 
         db.session.add(tab)
+        TableService.bump_table_version(table_id)
         db.session.commit()
         return tab
 
     @staticmethod
-    def update_table_column(column_id: int, updates: dict) -> TableColumn:
+    def update_table_column(column_id: int, updates: dict, creator_id: int, strict: bool = False) -> TableColumn:
         """
         Update table column name and/or data type.
-        Uses bulk SQL updates for data type changes to handle large tables efficiently.
+        Data type changes convert the existing cells in batches (see ColumnMigrationService).
 
         Args:
             column_id: ID of column being updated
             updates: dict with optional 'name' and 'data_type' keys
+            creator_id: ID of user updating the column
+            strict: Refuse a data type change that cannot convert every cell
 
         Returns:
             Updated TableColumn instance
         """
+        from app.services.column_migration_service import ColumnMigrationService
+
         column = TableColumn.query.filter_by(id=column_id, tenant_id=g.tenant_id).first()
         if column:
             if "name" in updates:
                 column.name = updates["name"].strip()
 
-            if "data_type" in updates:
-                prev_data_type = column.data_type
-                new_data_type = updates["data_type"]
-                
-                if prev_data_type == 'file':
-                    raise Exception("Cannot convert field of type 'file' to another format")
-                if prev_data_type == 'user':
-                    raise Exception("Cannot convert field of type 'user' to another format")
-                if new_data_type == 'file':
-                    raise Exception("Cannot convert an existing field to type 'file'")
-                if new_data_type == 'user':
-                    raise Exception("Cannot convert an existing field to type 'user'")
-                
-                if prev_data_type != new_data_type:
-                    TableService._bulk_migrate_column_data(column_id, prev_data_type, new_data_type)
-                
-                column.data_type = new_data_type
+            if updates.get("data_type", column.data_type) != column.data_type:
+                # Switches the column's type once its cells are converted
+                migration = ColumnMigrationService.start_migration(
+                    column_id=column.id,
+                    new_data_type=updates["data_type"],
+                    creator_id=creator_id,
+                    strict=strict
+                )
+                ColumnMigrationService.run_migration(migration.id)
 
         else:
             column = TableColumn(
@@ -498,114 +1103,13 @@ class TableService:
                 tenant_id=g.tenant_id,
             )
             db.session.add(column)
+            db.session.flush()
 
+        version = TableService.bump_tab_version(column.tab_id)
+        TableService.log_table_changes(column.tab_id, version, "schema", [None], [column.id])
         db.session.commit()
         return column
 
-    @staticmethod
-    def _bulk_migrate_column_data(column_id: int, prev_data_type: str, new_data_type: str):
-        """
-        Bulk migrate data values from one column type to another using raw SQL.
-        This is much faster than ORM row-by-row updates for large tables.
-        """
-        from sqlalchemy import text
-        
-        source_column_map = {
-            'text': 'value_text',
-            'long-text': 'value_text',
-            'number': 'value_num',
-            'boolean': 'value_bool',
-            'date': 'value_date',
-            'sku': 'value_sku',
-            'lot-number': 'value_lotnum',
-        }
-        
-        dest_column_map = {
-            'text': 'value_text',
-            'long-text': 'value_text',
-            'number': 'value_num',
-            'boolean': 'value_bool',
-            'date': 'value_date',
-            'sku': 'value_sku',
-            'lot-number': 'value_lotnum',
-        }
-        
-        source_col = source_column_map.get(prev_data_type)
-        dest_col = dest_column_map.get(new_data_type)
-        
-        if not source_col or not dest_col:
-            return
-        
-        if source_col == dest_col:
-            return
-        
-        if new_data_type == 'boolean':
-            if prev_data_type == 'boolean':
-                sql = text(f"""
-                    UPDATE table_data 
-                    SET {dest_col} = {source_col},
-                        {source_col} = NULL
-                    WHERE column_id = :column_id
-                """)
-            else:
-                sql = text(f"""
-                    UPDATE table_data 
-                    SET {dest_col} = CASE 
-                        WHEN LOWER(CAST({source_col} AS TEXT)) IN ('true', 'yes', '1', 't') THEN TRUE 
-                        ELSE FALSE 
-                    END,
-                    {source_col} = NULL
-                    WHERE column_id = :column_id
-                """)
-        elif new_data_type == 'number':
-            if prev_data_type == 'number':
-                sql = text(f"""
-                    UPDATE table_data 
-                    SET {dest_col} = {source_col},
-                        {source_col} = NULL
-                    WHERE column_id = :column_id
-                """)
-            else:
-                sql = text(f"""
-                    UPDATE table_data 
-                    SET {dest_col} = CAST(NULLIF(TRIM({source_col}), '') AS DOUBLE PRECISION),
-                        {source_col} = NULL
-                    WHERE column_id = :column_id AND {source_col} ~ '^-?[0-9]+(\\.[0-9]+)?$'
-                """)
-                db.session.execute(sql, {'column_id': column_id})
-                sql = text(f"""
-                    UPDATE table_data 
-                    SET {source_col} = NULL
-                    WHERE column_id = :column_id
-                """)
-        elif new_data_type == 'date':
-            if prev_data_type == 'date':
-                sql = text(f"""
-                    UPDATE table_data 
-                    SET {dest_col} = {source_col},
-                        {source_col} = NULL
-                    WHERE column_id = :column_id
-                """)
-            else:
-                sql = text(f"""
-                    UPDATE table_data 
-                    SET {dest_col} = CAST({source_col} AS DATE),
-                        {source_col} = NULL
-                    WHERE column_id = :column_id AND {source_col} IS NOT NULL
-                """)
-        elif new_data_type in ['text', 'long-text', 'sku', 'lot-number']:
-            sql = text(f"""
-                UPDATE table_data 
-                SET {dest_col} = CAST({source_col} AS TEXT),
-                    {source_col} = NULL
-                WHERE column_id = :column_id
-            """)
-        else:
-            return
-        
-        db.session.execute(sql, {'column_id': column_id})
-        db.session.commit()
-
     @staticmethod
     def update_tab(tab_id: int, name: str) -> Table:
         """
@@ -623,6 +1127,7 @@ class TableService:
             return False
 
         tab.name = name.strip()
+        TableService.bump_table_version(tab.table_id)
         db.session.commit()
         return tab
 
@@ -643,6 +1148,7 @@ class TableService:
             return False
 
         table.name = name.strip()
+        TableService.bump_table_version(table.id)
         db.session.commit()
         return table
 
@@ -660,9 +1166,14 @@ class TableService:
         record = TableRecord.query.filter_by(id=record_id, tenant_id=g.tenant_id).first()
         if record:
             # Delete data first, then record using bulk operations
-            TableData.query.filter_by(record_id=record_id).delete(synchronize_session=False)
-            TableRecord.query.filter_by(id=record_id).delete(synchronize_session=False)
+            TableData.query.filter_by(record_id=record_id, tenant_id=g.tenant_id).delete(synchronize_session=False)
+            TableRecord.query.filter_by(id=record_id, tenant_id=g.tenant_id).delete(synchronize_session=False)
+            # Keep the returned instance readable: once committed, its row can't be reloaded
+            db.session.expunge(record)
+            version = TableService.bump_tab_version(record.tab_id)
+            TableService.log_table_changes(record.tab_id, version, "delete", [record_id])
             db.session.commit()
+            TableService.publish_tab_event(record.tab_id, version, "delete")
         return record
 
     @staticmethod
@@ -670,44 +1181,33 @@ class TableService:
         tab_id: int,
         columns: List[TableColumn],
         rows_data: List[List],
+        log_changes: bool = True,
     ) -> int:
         """
         Bulk insert table data for multiple rows (optimized for CSV upload)
-        Uses raw psycopg2 execute_values for 30x+ performance improvement.
+        Records and cells are sent many rows per statement (see app.bulk).
 
         Args:
             tab_id: ID of tab being updated
             columns: List of TableColumn instances (or dicts with 'id' and 'data_type')
             rows_data: List of rows, where each row is a list of values
+            log_changes: Whether to record the new rows in the tab's change log
+                         (not needed for tabs that were just created)
 
         Returns:
             Number of rows inserted
         """
-        from psycopg2.extras import execute_values
-
         if not rows_data:
             return 0
 
         tenant_id = g.tenant_id
         num_rows = len(rows_data)
-
-        # Get raw psycopg2 connection from SQLAlchemy
-        raw_conn = db.session.connection().connection
-        cursor = raw_conn.cursor()
+        # Document tabs insert each row as one record document instead of cells
+        documents = [] if TabStorageService.get_storage_mode(tab_id, for_write=True) == 'document' else None
 
         try:
-            # Bulk insert records using execute_values with RETURNING
-            # IMPORTANT: page_size must be >= num_rows to get all IDs in one batch
-            # Default page_size=100 would only return IDs from the last batch
-            record_data = [(tab_id, tenant_id) for _ in range(num_rows)]
-            execute_values(
-                cursor,
-                'INSERT INTO table_record (tab_id, tenant_id) VALUES %s RETURNING id',
-                record_data,
-                template='(%s, %s)',
-                page_size=max(num_rows, 1000)  # Ensure all rows in one batch
-            )
-            record_ids = [row[0] for row in cursor.fetchall()]
+            if documents is None:
+                record_ids = bulk.insert_records(tab_id, tenant_id, num_rows)
 
             # Build column info for fast lookup (handle both objects and dicts)
             col_info = []
@@ -720,7 +1220,8 @@ class TableService:
             # Prepare all table data for bulk insert
             table_data_values = []
             for row_idx, row_values in enumerate(rows_data):
-                record_id = record_ids[row_idx]
+                record_id = record_ids[row_idx] if documents is None else None
+                document = {}
 
                 for col_idx, (col_id, data_type) in enumerate(col_info):
                     if col_idx >= len(row_values):
@@ -756,41 +1257,141 @@ class TableService:
                     elif data_type == 'user':
                         value_user_id = value
 
-                    table_data_values.append((
+                    cell = (
                         tab_id, col_id, record_id,
                         value_text, value_num, value_bool, value_date,
                         value_fpath, value_sku, value_lotnum, value_user_id,
                         tenant_id
-                    ))
+                    )
+                    if documents is None:
+                        table_data_values.append(cell)
+                    else:
+                        document_value = TabStorageService.to_document_value(data_type, dict(zip(CELL_COLUMNS, cell)))
+                        if document_value is not None:
+                            document[str(col_id)] = document_value
+
+                if documents is not None:
+                    documents.append(document)
+
+            if documents is not None:
+                record_ids = bulk.insert_records(tab_id, tenant_id, num_rows, documents)
 
             # Bulk insert all table data
             if table_data_values:
-                execute_values(
-                    cursor,
-                    '''INSERT INTO table_data 
-                       (tab_id, column_id, record_id, value_text, value_num, value_bool, value_date,
-                        value_fpath, value_sku, value_lotnum, value_user_id, tenant_id) 
-                       VALUES %s''',
-                    table_data_values,
-                    page_size=1000
-                )
+                bulk.insert_cells(table_data_values)
 
+            version = TableService.bump_tab_version(tab_id)
+            if log_changes:
+                TableService.log_table_changes(tab_id, version, "insert", record_ids)
             db.session.commit()
+            if log_changes:
+                TableService.publish_tab_event(tab_id, version, "insert")
             return num_rows
 
         except Exception as e:
             db.session.rollback()
             raise Exception(f"Error in bulk insert: {str(e)}")
 
+    @staticmethod
+    def append_rows(tab_id: int, rows: List, column_ids: List[int] = None) -> int:
+        """
+        Append rows to an existing tab with one bulk insert
+
+        Args:
+            tab_id: ID of tab to append to
+            rows: Rows, each either a list of values (in the order of column_ids)
+                  or a dictionary of values keyed by column name or column ID
+            column_ids: Column order of list rows (defaults to the tab's columns in creation order)
+
+        Returns:
+            Number of rows appended
+        """
+        if not rows:
+            raise ValueError("No rows provided")
+
+        columns = TableColumn.query.filter_by(
+            tab_id=tab_id,
+            tenant_id=g.tenant_id
+        ).order_by(TableColumn.id).all()
+        if not columns:
+            raise ValueError("Tab has no columns")
+        columns_by_id = {column.id: column for column in columns}
+        columns_by_name = {column.name: column for column in columns}
+        column_index = {column.id: i for i, column in enumerate(columns)}
+
+        def find_column(key):
+            if key in columns_by_name:
+                return columns_by_name[key]
+            try:
+                return columns_by_id[int(key)]
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"Unknown column: {key}")
+
+        list_columns = [find_column(column_id) for column_id in column_ids] if column_ids else columns
+
+        rows_data = []
+        for row in rows:
+            values = [None] * len(columns)
+            if isinstance(row, dict):
+                cells = [(find_column(key), value) for key, value in row.items()]
+            elif isinstance(row, list):
+                if len(row) > len(list_columns):
+                    raise ValueError(f"Row has {len(row)} values but only {len(list_columns)} columns")
+                cells = zip(list_columns, row)
+            else:
+                raise ValueError("Each row must be a list or an object")
+
+            for column, value in cells:
+                if value is None:
+                    continue
+                if column.data_type == 'file':
+                    raise ValueError(f"File column '{column.name}' cannot be set when appending rows")
+                if column.data_type in ['text', 'long-text', 'sku', 'lot-number', 'date']:
+                    value = str(value)
+                values[column_index[column.id]] = value
+            rows_data.append(values)
+
+        return TableService.bulk_insert_table_data(
+            tab_id=tab_id,
+            columns=[{"id": column.id, "data_type": column.data_type} for column in columns],
+            rows_data=rows_data,
+        )
+
+    @staticmethod
+    def append_csv_rows(tab_id: int, content: str) -> int:
+        """
+        Append the rows of a CSV file to an existing tab
+
+        Args:
+            tab_id: ID of tab to append to
+            content: CSV text whose header names the tab's columns (by name or ID)
+
+        Returns:
+            Number of rows appended
+        """
+        csv_reader = csv.DictReader(io.StringIO(content, newline=None))
+        if not csv_reader.fieldnames:
+            raise ValueError("CSV file is empty or invalid")
+
+        rows = []
+        for row in csv_reader:
+            if None in row:
+                raise ValueError(f"Row {csv_reader.line_num} has more values than the header")
+            rows.append({key: (value if value != '' else None) for key, value in row.items()})
+        return TableService.append_rows(tab_id=tab_id, rows=rows)
+
     @staticmethod
     def update_table_data(
         tab_id: int,
         record_id: int,
         updates: List[Dict],
-    ) -> List[TableData]:
+    ) -> int:
         """
         Update or create table data entries
 
+        Cells are written with one upsert (or one document merge for document
+        tabs), so concurrent edits of the same cell never create duplicates.
+
         Args:
             tab_id: ID of tab being updated
             updates: List of data updates
@@ -800,11 +1401,12 @@ class TableService:
                 } for num updates]
 
         Returns:
-            List of updated/created TableData instances
+            Number of cells written
         """
 
-        table_record = TableRecord.query.filter_by(id=record_id, tenant_id=g.tenant_id).first()
-        if not table_record:
+        table_record = TableRecord.query.filter_by(id=int(record_id), tenant_id=g.tenant_id).first()
+        new_record = table_record is None
+        if new_record:
             table_record = TableRecord(
                 tab_id=tab_id,
                 tenant_id=g.tenant_id
@@ -813,6 +1415,10 @@ class TableService:
             db.session.commit()
         record_id = table_record.id
 
+        # Column IDs arrive as strings from form-encoded requests
+        for update in updates:
+            update['column_id'] = int(update['column_id'])
+
         # PERFORMANCE FIX: Batch fetch all columns and their data types in one query
         column_ids = [update['column_id'] for update in updates]
         columns = TableColumn.query.filter(
@@ -821,16 +1427,14 @@ class TableService:
         ).all()
         column_data_types = {col.id: col.data_type for col in columns}
 
-        # PERFORMANCE FIX: Batch fetch all existing table data in one query
-        existing_data = TableData.query.filter(
-            TableData.tab_id == tab_id,
-            TableData.record_id == record_id,
-            TableData.column_id.in_(column_ids),
-            TableData.tenant_id == g.tenant_id,
-        ).all()
-        existing_data_map = {data.column_id: data for data in existing_data}
+        # The mode stays share-locked until commit, so a switch of the tab's
+        # layout waits for these cells. Files being replaced are removed from the bucket
+        storage_mode = TabStorageService.get_storage_mode(tab_id, for_write=True)
+        file_column_ids = [column_id for column_id in column_ids if column_data_types.get(column_id) == 'file']
+        previous_files = TabStorageService.get_file_paths(tab_id, record_id, file_column_ids, storage_mode)
 
-        updated_data = []
+        # Later updates of the same cell win
+        cells = {}
         for update in updates:
             column_id = update['column_id']
             data_type = column_data_types.get(column_id)
@@ -838,84 +1442,119 @@ class TableService:
             if not data_type:
                 continue
 
-            (
-                value_text,
-                value_num,
-                value_bool,
-                value_date,
-                value_fpath,
-                value_sku,
-                value_lotnum,
-                value_user_id,
-            ) = None, None, None, None, None, None, None, None
-            if data_type in ['text', 'long-text']:
-                value_text = update['value']
-            elif data_type == 'number':
-                try:
-                    value_num = float(update['value']) if update['value'] not in [None, ''] else None
-                except (ValueError, TypeError):
-                    value_num = None
-            elif data_type == 'boolean':
-                value_bool = update['value'] in ["true", "True", "TRUE", True]
-            elif data_type == 'date':
-                value_date = update['value']
-            elif data_type == 'file':
-                value_fpath = update['value']
-                # If provided new file object, then upload to s3
-                if hasattr(value_fpath, 'filename'):
-                    value_fpath = FileManager.save_file_to_bucket(
-                        filename=secure_filename(update['value'].filename),
-                        file=update['value']
-                    )
-            elif data_type == 'sku':
-                value_sku = update['value']
-            elif data_type == 'lot-number':
-                value_lotnum = update['value']
-            elif data_type == 'user':
-                value_user_id = update['value']
-
-            table_data = existing_data_map.get(column_id)
-
-            # Overwrite the entry in this table cell
-            if table_data:
-                # SC: If update type file may need to delete previous file from bucket
-                if data_type == 'file' and table_data.value_fpath:
-                    FileManager.delete_file_from_bucket(
-                        filename=secure_filename(table_data.value_fpath)
-                    )
-
-                table_data.value_text = value_text
-                table_data.value_num = value_num
-                table_data.value_bool = value_bool
-                table_data.value_date = value_date
-                table_data.value_sku = value_sku
-                table_data.value_lotnum = value_lotnum
-                table_data.value_user_id = value_user_id
-                table_data.value_fpath = value_fpath
+            value = update['value']
+            # If provided new file object, then upload to s3
+            if data_type == 'file' and hasattr(value, 'filename'):
+                value = FileManager.save_file_to_bucket(
+                    filename=secure_filename(value.filename),
+                    file=value
+                )
 
-            # Create new entry for table cell
-            else:
-                table_data = TableData(
-                    tab_id=tab_id,
-                    column_id=column_id,
-                    record_id=record_id,
-                    value_text=value_text,
-                    value_num=value_num,
-                    value_bool=value_bool,
-                    value_date=value_date,
-                    value_fpath=value_fpath,
-                    value_sku=value_sku,
-                    value_lotnum=value_lotnum,
-                    value_user_id=value_user_id,
-                    tenant_id=g.tenant_id,
+            # SC: If update type file may need to delete previous file from bucket
+            if data_type == 'file' and previous_files.get(column_id):
+                FileManager.delete_file_from_bucket(
+                    filename=secure_filename(previous_files.pop(column_id))
                 )
-                db.session.add(table_data)
 
-            updated_data.append(table_data)
+            cells[column_id] = {
+                "tab_id": tab_id,
+                "column_id": column_id,
+                "record_id": record_id,
+                "tenant_id": g.tenant_id,
+                **TableService.get_cell_columns(data_type, value),
+            }
+
+        TabStorageService.write_cells(list(cells.values()), column_data_types, storage_mode)
 
+        version = TableService.bump_tab_version(tab_id)
+        if new_record:
+            TableService.log_table_changes(tab_id, version, "insert", [record_id])
+        else:
+            TableService.log_table_changes(tab_id, version, "update",
+                                           [record_id] * len(cells),
+                                           list(cells))
         db.session.commit()
+        TableService.publish_tab_event(tab_id, version, "insert" if new_record else "update")
+
+        return len(cells)
+
+    @staticmethod
+    def batch_update_table_data(tab_id: int, updates: List[Dict]) -> int:
+        """
+        Apply many cell updates across records of a tab in one transaction
+
+        Records and columns are validated against the tab with one query
+        each, and all cells are written with one upsert (or document merge).
+
+        Args:
+            tab_id: ID of tab being updated
+            updates: List of cell updates
+                [{
+                    record_id,
+                    column_id,
+                    value,
+                } for num updates]
+
+        Returns:
+            Number of cells written
+        """
+        if not updates:
+            raise ValueError("No updates provided")
+
+        # Later updates of the same cell win
+        cells = {}
+        for update in updates:
+            try:
+                key = (int(update['record_id']), int(update['column_id']))
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("Each update needs an integer record_id and column_id")
+            cells[key] = update.get('value')
+
+        record_ids = {record_id for record_id, _ in cells}
+        column_ids = {column_id for _, column_id in cells}
+
+        found_records = {row.id for row in db.session.query(TableRecord.id).filter(
+            TableRecord.id.in_(record_ids),
+            TableRecord.tab_id == tab_id,
+            TableRecord.tenant_id == g.tenant_id
+        )}
+        if found_records != record_ids:
+            missing = sorted(record_ids - found_records)
+            raise ValueError(f"Records not found in tab: {', '.join(map(str, missing))}")
+
+        column_data_types = dict(db.session.query(TableColumn.id, TableColumn.data_type).filter(
+            TableColumn.id.in_(column_ids),
+            TableColumn.tab_id == tab_id,
+            TableColumn.tenant_id == g.tenant_id
+        ).all())
+        if set(column_data_types) != column_ids:
+            missing = sorted(column_ids - set(column_data_types))
+            raise ValueError(f"Columns not found in tab: {', '.join(map(str, missing))}")
+        if 'file' in column_data_types.values():
+            raise ValueError("File columns cannot be updated in a batch")
+
+        try:
+            TabStorageService.write_cells([{
+                "tab_id": tab_id,
+                "column_id": column_id,
+                "record_id": record_id,
+                "tenant_id": g.tenant_id,
+                **TableService.get_cell_columns(column_data_types[column_id], value),
+            } for (record_id, column_id), value in cells.items()],
+                column_data_types,
+                TabStorageService.get_storage_mode(tab_id, for_write=True))
+
+            version = TableService.bump_tab_version(tab_id)
+            TableService.log_table_changes(tab_id, version, "update",
+                                           [record_id for record_id, _ in cells],
+                                           [column_id for _, column_id in cells])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
 
-        return updated_data
+        TableService.publish_tab_event(tab_id, version, "update")
+        return len(cells)
 
     @staticmethod
     def share_table(acting_user_id: int, table_id: int, user_ids: List[int]) -> List[TableShare]:
@@ -951,5 +1590,6 @@ class TableService:
                     continue
                 db.session.delete(share)
 
+        TableService.bump_table_version(table_id)
         db.session.commit()
         return shares
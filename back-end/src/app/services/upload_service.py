@@ -0,0 +1,228 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+import fcntl
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from typing import Dict, Optional
+
+from flask import current_app, g
+from werkzeug.exceptions import ClientDisconnected
+from werkzeug.utils import secure_filename
+
+
+class UploadOffsetMismatch(Exception):
+    """ Raised when a chunk doesn't start where the upload currently ends """
+
+    def __init__(self, offset: int):
+        super().__init__(f"Chunk offset does not match the upload; resume from offset {offset}")
+        self.offset = offset
+
+
+class UploadService:
+    """
+    Resumable Chunked Upload Service
+
+    Files too large for one request are uploaded in chunks appended at an
+    explicit offset. Chunks are staged on local disk as <upload_id>.part
+    with the upload's metadata in <upload_id>.json; a client whose
+    connection drops asks for the current offset and resumes from there.
+    """
+
+    UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+    @staticmethod
+    def _paths(upload_id: str):
+        """ Get the (data, metadata) paths of an upload """
+        if not UploadService.UPLOAD_ID_PATTERN.match(upload_id):
+            raise ValueError("Invalid upload ID")
+        staging_dir = current_app.config['UPLOAD_STAGING_DIR']
+        return (os.path.join(staging_dir, f"{upload_id}.part"),
+                os.path.join(staging_dir, f"{upload_id}.json"))
+
+    @staticmethod
+    def create_upload(filename: str, total_size: int, user_id: int, metadata: Dict = None) -> Dict:
+        """
+        Start a chunked upload
+
+        Args:
+            filename: Name of the file being uploaded
+            total_size: Size of the complete file in bytes
+            user_id: ID of user uploading the file
+            metadata: Optional extra values kept with the upload (e.g. table name)
+
+        Returns:
+            Upload status (see get_upload)
+        """
+        if not filename:
+            raise ValueError("No file name provided")
+        if not isinstance(total_size, int) or total_size <= 0:
+            raise ValueError("total_size must be a positive integer")
+        if total_size > current_app.config['UPLOAD_MAX_BYTES']:
+            raise ValueError(f"File exceeds the maximum upload size of {current_app.config['UPLOAD_MAX_BYTES']} bytes")
+
+        UploadService.remove_expired_uploads()
+
+        upload_id = uuid.uuid4().hex
+        data_path, meta_path = UploadService._paths(upload_id)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        open(data_path, 'wb').close()
+        with open(meta_path, 'w', encoding='utf-8') as meta_file:
+            json.dump({
+                "filename": secure_filename(filename),
+                "total_size": total_size,
+                "user_id": user_id,
+                "tenant_id": str(g.tenant_id),
+                "created_at": time.time(),
+                "metadata": metadata or {},
+            }, meta_file)
+
+        return UploadService.get_upload(upload_id, user_id)
+
+    @staticmethod
+    def get_upload(upload_id: str, user_id: int) -> Optional[Dict]:
+        """
+        Get the status of an upload
+
+        Args:
+            upload_id: ID of upload
+            user_id: ID of user requesting the upload
+
+        Returns:
+            Dictionary with upload_id, filename, offset (bytes received),
+            total_size and metadata, or None if not found
+        """
+        data_path, meta_path = UploadService._paths(upload_id)
+        try:
+            with open(meta_path, encoding='utf-8') as meta_file:
+                meta = json.load(meta_file)
+            offset = os.path.getsize(data_path)
+        except (OSError, ValueError):
+            return None
+
+        # Uploads are only visible to the user (and tenant) that started them
+        if meta['user_id'] != user_id or meta['tenant_id'] != str(g.tenant_id):
+            return None
+
+        return {
+            "upload_id": upload_id,
+            "filename": meta['filename'],
+            "offset": offset,
+            "total_size": meta['total_size'],
+            "metadata": meta['metadata'],
+        }
+
+    @staticmethod
+    def append_chunk(upload_id: str, user_id: int, offset: int, stream, length: int) -> Dict:
+        """
+        Append a chunk at the given offset
+
+        The offset must equal the number of bytes received so far, so a
+        repeated or out-of-order chunk is rejected instead of corrupting the file.
+
+        Args:
+            upload_id: ID of upload
+            user_id: ID of user uploading the chunk
+            offset: Byte offset of the chunk in the file
+            stream: File-like object to read the chunk from
+            length: Size of the chunk in bytes
+
+        Returns:
+            Upload status after the append, or None if the upload was not found
+        """
+        upload = UploadService.get_upload(upload_id, user_id)
+        if not upload:
+            return None
+        if offset + length > upload['total_size']:
+            raise ValueError("Chunk extends past the declared file size")
+
+        data_path, meta_path = UploadService._paths(upload_id)
+        with open(data_path, 'ab') as data_file:
+            # Serialize appends to the same upload (e.g. a retried request racing the original)
+            fcntl.flock(data_file, fcntl.LOCK_EX)
+            current_offset = data_file.seek(0, os.SEEK_END)
+            if offset != current_offset:
+                raise UploadOffsetMismatch(current_offset)
+            try:
+                shutil.copyfileobj(stream, data_file, 1024 * 1024)
+                complete = data_file.tell() == offset + length
+            except ClientDisconnected:
+                # Request streams raise on a dropped connection instead of returning short
+                complete = False
+            if not complete:
+                # Incomplete chunk: keep only what precedes it, so the client resumes from offset
+                data_file.truncate(offset)
+                raise ValueError("Incomplete chunk")
+
+        # Uploads expire UPLOAD_EXPIRY_SECONDS after their last chunk
+        os.utime(meta_path)
+        upload['offset'] = offset + length
+        return upload
+
+    @staticmethod
+    def complete_upload(upload_id: str, user_id: int) -> Dict:
+        """
+        Finish an upload, handing its file over to the caller
+
+        The upload's metadata is removed; the caller owns (and must delete) the file.
+
+        Args:
+            upload_id: ID of upload
+            user_id: ID of user finishing the upload
+
+        Returns:
+            Upload status plus the path of the complete file, or None if the upload was not found
+        """
+        upload = UploadService.get_upload(upload_id, user_id)
+        if not upload:
+            return None
+        if upload['offset'] != upload['total_size']:
+            raise ValueError(f"Upload incomplete: received {upload['offset']} of {upload['total_size']} bytes")
+
+        data_path, meta_path = UploadService._paths(upload_id)
+        os.unlink(meta_path)
+        upload['file_path'] = data_path
+        return upload
+
+    @staticmethod
+    def delete_upload(upload_id: str, user_id: int) -> bool:
+        """
+        Abort an upload and remove its staged data
+
+        Args:
+            upload_id: ID of upload
+            user_id: ID of user aborting the upload
+
+        Returns:
+            Boolean indicating if the upload was found and removed
+        """
+        if not UploadService.get_upload(upload_id, user_id):
+            return False
+        for path in UploadService._paths(upload_id):
+            if os.path.exists(path):
+                os.unlink(path)
+        return True
+
+    @staticmethod
+    def remove_expired_uploads():
+        """ Remove uploads that received no chunk for UPLOAD_EXPIRY_SECONDS """
+        staging_dir = current_app.config['UPLOAD_STAGING_DIR']
+        if not os.path.isdir(staging_dir):
+            return
+
+        cutoff = time.time() - current_app.config['UPLOAD_EXPIRY_SECONDS']
+        for entry in os.scandir(staging_dir):
+            if entry.name.endswith('.json') and entry.stat().st_mtime < cutoff:
+                upload_id = entry.name[:-len('.json')]
+                for path in (os.path.join(staging_dir, f"{upload_id}.part"), entry.path):
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+
@@ -3,14 +3,28 @@ Copyright (c) BakedInsights, Inc. and affiliates.
 All rights reserved.
 """
 
+import getpass
+import hashlib
+import logging
 import os
+import pickle
+import stat
 import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import ExitStack
+from datetime import date, datetime, timedelta
+from datetime import time as dt_time
 
 import boto3
 import botocore
+import openpyxl
 import requests
 import pandas as pd
 import PyPDF2
+from flask import current_app, make_response, request, stream_with_context
 
 
 class FileManager:
@@ -21,6 +35,9 @@ class FileManager:
     BUCKET_NAME = "bakedinsights-multi-tenant-beta-bucket"
 
     PRESIGNED_URL_DEMARKATION = ":BAKEDINSIGHTS-DEMARKATION-PRESIGNED-URL:"
+    PRESIGNED_URL_EXPIRY = 3600  # seconds
+    # Downloads up to this size are kept in memory; larger ones spill to a temporary file
+    SPOOL_MAX_MEMORY = int(os.environ.get('FILE_SPOOL_MAX_MEMORY', 8 * 1024 * 1024))
 
     @staticmethod
     def save_file_to_bucket(filename, file):
@@ -78,9 +95,23 @@ class FileManager:
                                                       FileManager.BUCKET_NAME,
                                                       'Key': filename
                                                   },
-                                                  ExpiresIn=3600)
+                                                  ExpiresIn=FileManager.PRESIGNED_URL_EXPIRY)
         return presigned_url
 
+    @staticmethod
+    def get_presigned_url_window():
+        """
+        Get the current presigned URL window
+
+        Responses embedding presigned URLs can be reused for as long as the
+        window doesn't change, since URLs handed out in the window are valid
+        for at least half of PRESIGNED_URL_EXPIRY.
+
+        Returns:
+            Integer identifying the current window
+        """
+        return int(time.time() // (FileManager.PRESIGNED_URL_EXPIRY // 2))
+
     @staticmethod
     def delete_file_from_bucket(filename):
         """
@@ -110,12 +141,14 @@ class FileManager:
         bucket.objects.all().delete()
 
     @staticmethod
-    def get_file_content(filename):
+    def get_file_content(filename, max_chars=None, pages=None):
         """
         Download and get the content of a file from S3
 
         Args:
             filename: Name of the file in S3
+            max_chars: For PDFs, stop extracting text once this many characters are collected
+            pages: For PDFs, (first, last) 1-based page range to extract
 
         Returns:
             Dictionary with file content and metadata
@@ -133,16 +166,21 @@ class FileManager:
                                                Key=filename)
                 content_type = head_response.get('ContentType', '')
                 file_size = head_response.get('ContentLength', 0)
+                etag = head_response.get('ETag', '')
             except botocore.exceptions.ClientError:
                 # If file doesn't exist or other error
                 return {"error": f"File {filename} not found or inaccessible"}
 
-            # Download the file to a temporary file
-            with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                s3.download_file(Bucket=FileManager.BUCKET_NAME,
-                                 Key=filename,
-                                 Filename=temp_file.name)
-                temp_path = temp_file.name
+            # Determine file type from extension
+            file_ext = os.path.splitext(filename)[1].lower()
+            is_pdf = file_ext == '.pdf' or content_type == 'application/pdf'
+
+            # The ETag changes whenever the object does, so cached content is never stale.
+            # PDFs are cached page by page instead, as usually only their first pages are read.
+            cache_key = FileContentCache.make_key("content", filename, etag)
+            cached = FileContentCache.get(cache_key) if not is_pdf else None
+            if cached is not None:
+                return cached
 
             # Process file based on its type
             result = {
@@ -153,13 +191,22 @@ class FileManager:
                 "error": None
             }
 
-            # Determine file type from extension
-            file_ext = os.path.splitext(filename)[1].lower()
+            buffers = []
+
+            def download():
+                """ Download the file into a spooled buffer, once """
+                if not buffers:
+                    buffers.append(tempfile.SpooledTemporaryFile(max_size=FileManager.SPOOL_MAX_MEMORY))
+                    s3.download_fileobj(Bucket=FileManager.BUCKET_NAME,
+                                        Key=filename,
+                                        Fileobj=buffers[0])
+                buffers[0].seek(0)
+                return buffers[0]
 
             try:
                 # CSV files
                 if file_ext == '.csv' or content_type == 'text/csv':
-                    df = pd.read_csv(temp_path)
+                    df = pd.read_csv(download())
                     result["content"] = {
                         "headers": df.columns.tolist(),
                         "data": df.to_dict('records')
@@ -168,7 +215,7 @@ class FileManager:
                 # Excel files
                 elif file_ext in ['.xlsx', '.xls'
                                   ] or 'excel' in content_type.lower():
-                    xls = pd.ExcelFile(temp_path)
+                    xls = pd.ExcelFile(download())
                     excel_data = {}
 
                     for sheet_name in xls.sheet_names:
@@ -180,25 +227,18 @@ class FileManager:
 
                     result["content"] = excel_data
 
-                # PDF files
-                elif file_ext == '.pdf' or content_type == 'application/pdf':
-                    text = ""
-                    with open(temp_path, 'rb') as pdf_file:
-                        reader = PyPDF2.PdfReader(pdf_file)
-                        for page_num in range(len(reader.pages)):
-                            page = reader.pages[page_num]
-                            text += page.extract_text() + "\n\n"
-
-                    result["content"] = text
+                # PDF files (downloaded only if a needed page isn't cached yet)
+                elif is_pdf:
+                    pdf = FileProcessingService.extract_pdf_text(
+                        download, max_chars=max_chars, pages=pages, cache_prefix=("pdf", filename, etag))
+                    result["content"] = pdf["text"]
+                    result["page_count"] = pdf["page_count"]
+                    result["truncated"] = pdf["truncated"]
 
                 # Text files
                 elif file_ext in ['.txt', '.md', '.log'
                                   ] or content_type.startswith('text/'):
-                    with open(temp_path,
-                              'r',
-                              encoding='utf-8',
-                              errors='ignore') as text_file:
-                        result["content"] = text_file.read()
+                    result["content"] = download().read().decode('utf-8', errors='ignore')
 
                 # Other file types - return error
                 else:
@@ -206,13 +246,13 @@ class FileManager:
 
             except Exception as e:
                 result["error"] = f"Error processing file {filename}: {str(e)}"
+            finally:
+                # Release the buffer (and its temporary file, if it spilled to disk)
+                for buffer in buffers:
+                    buffer.close()
 
-            # Clean up the temporary file
-            try:
-                os.unlink(temp_path)
-            except:
-                pass
-
+            if not result["error"] and not is_pdf:
+                FileContentCache.put(cache_key, result)
             return result
 
         except Exception as e:
@@ -233,11 +273,6 @@ class FileManager:
             response = requests.get(url)
             response.raise_for_status()
 
-            # Create a temporary file
-            with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                temp_file.write(response.content)
-                temp_path = temp_file.name
-
             # Try to determine content type from headers
             content_type = response.headers.get('Content-Type', '')
 
@@ -249,24 +284,363 @@ class FileManager:
                 "error": None
             }
 
-            # Clean up and return result
-            os.unlink(temp_path)
             return result
 
         except Exception as e:
             return {"error": f"Error retrieving content from URL: {str(e)}"}
 
 
+class FileContentCache:
+    """
+    Size-bounded LRU cache of extracted file contents on local disk
+
+    Entries are pickled into CACHE_DIR under a hash of their key, and an
+    in-memory index ordered by last use decides what to evict once the
+    cache grows past MAX_BYTES. The index is rebuilt from the directory
+    every INDEX_REFRESH_SECONDS, so the cache survives restarts and can be
+    shared by gunicorn workers: MAX_BYTES bounds the whole directory, give
+    or take what other workers wrote since the last refresh (an entry
+    evicted by another worker is a miss).
+
+    Unpickling runs code, so CACHE_DIR must be private: it is created with
+    mode 0700, and the cache is disabled if it belongs to another user or
+    others can write to it.
+    """
+
+    CACHE_DIR = os.environ.get('FILE_CONTENT_CACHE_DIR', os.path.join(
+        tempfile.gettempdir(), f"bakedinsights-file-cache-{getattr(os, 'getuid', getpass.getuser)()}"))
+    MAX_BYTES = int(os.environ.get('FILE_CONTENT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    INDEX_REFRESH_SECONDS = 60
+
+    _index = None  # OrderedDict of entry name -> size in bytes, least recently used first
+    _index_loaded_at = 0
+    _size = 0
+    _private_dir = None  # whether CACHE_DIR was found private, checked once per process
+    _lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts):
+        """
+        Build a cache key from the parts identifying a piece of content
+
+        Args:
+            parts: Values identifying the content (e.g. kind, S3 key, ETag)
+
+        Returns:
+            Cache key string
+        """
+        return hashlib.sha256("\0".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get(key):
+        """
+        Get cached content
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            Cached value, or None on a miss
+        """
+        if FileContentCache.MAX_BYTES <= 0:
+            return None
+
+        with FileContentCache._lock:
+            if not FileContentCache._check_dir():
+                return None
+            FileContentCache._load_index()
+            if key not in FileContentCache._index:
+                return None
+            FileContentCache._index.move_to_end(key)
+
+        path = os.path.join(FileContentCache.CACHE_DIR, key)
+        try:
+            with open(path, 'rb') as cache_file:
+                value = pickle.load(cache_file)
+            os.utime(path)
+            return value
+        except Exception:
+            with FileContentCache._lock:
+                FileContentCache._forget(key)
+            return None
+
+    @staticmethod
+    def put(key, value):
+        """
+        Store content in the cache, evicting least recently used entries if needed
+
+        Args:
+            key: Cache key from make_key
+            value: Picklable value to cache
+        """
+        if FileContentCache.MAX_BYTES <= 0:
+            return
+
+        with FileContentCache._lock:
+            if not FileContentCache._check_dir():
+                return
+
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(data) > FileContentCache.MAX_BYTES:
+                return
+
+            with tempfile.NamedTemporaryFile(dir=FileContentCache.CACHE_DIR, prefix='.tmp-', delete=False) as temp_file:
+                temp_file.write(data)
+            os.replace(temp_file.name, os.path.join(FileContentCache.CACHE_DIR, key))
+        except OSError:
+            return
+
+        with FileContentCache._lock:
+            FileContentCache._load_index()
+            FileContentCache._forget(key)
+            FileContentCache._index[key] = len(data)
+            FileContentCache._size += len(data)
+            while FileContentCache._size > FileContentCache.MAX_BYTES and FileContentCache._index:
+                oldest = next(iter(FileContentCache._index))
+                FileContentCache._forget(oldest)
+                try:
+                    os.unlink(os.path.join(FileContentCache.CACHE_DIR, oldest))
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _check_dir():
+        """ Create CACHE_DIR, or check that an existing one is private to this user (caller holds _lock) """
+        if FileContentCache._private_dir is None:
+            try:
+                os.makedirs(FileContentCache.CACHE_DIR, mode=0o700, exist_ok=True)
+                dir_stat = os.lstat(FileContentCache.CACHE_DIR)
+                FileContentCache._private_dir = (
+                    stat.S_ISDIR(dir_stat.st_mode)
+                    and (not hasattr(os, 'getuid') or dir_stat.st_uid == os.getuid())
+                    and not dir_stat.st_mode & 0o022
+                )
+                if FileContentCache._private_dir and dir_stat.st_mode & 0o077:
+                    os.chmod(FileContentCache.CACHE_DIR, 0o700)
+            except OSError:
+                FileContentCache._private_dir = False
+            if not FileContentCache._private_dir:
+                logging.getLogger(__name__).warning(
+                    "File content cache disabled: %s is not a directory private to this user",
+                    FileContentCache.CACHE_DIR)
+        return FileContentCache._private_dir
+
+    @staticmethod
+    def _load_index():
+        """ Build the in-memory index from the cache directory, if stale (caller holds _lock) """
+        if FileContentCache._index is not None and \
+                time.monotonic() - FileContentCache._index_loaded_at < FileContentCache.INDEX_REFRESH_SECONDS:
+            return
+
+        entries = []
+        if os.path.isdir(FileContentCache.CACHE_DIR):
+            for entry in os.scandir(FileContentCache.CACHE_DIR):
+                if entry.is_file() and not entry.name.startswith('.tmp-'):
+                    entry_stat = entry.stat()
+                    entries.append((entry_stat.st_mtime, entry.name, entry_stat.st_size))
+        entries.sort()
+        FileContentCache._index = OrderedDict((name, size) for _, name, size in entries)
+        FileContentCache._size = sum(size for _, _, size in entries)
+        FileContentCache._index_loaded_at = time.monotonic()
+
+    @staticmethod
+    def _forget(key):
+        """ Drop an entry from the in-memory index (caller holds _lock) """
+        size = FileContentCache._index.pop(key, None)
+        if size is not None:
+            FileContentCache._size -= size
+
+
+class ConditionalResponse:
+    """ Helpers for version-based ETags and conditional GET requests """
+
+    @staticmethod
+    def make_etag(*parts):
+        """
+        Build an ETag from the parts identifying a version of a resource
+
+        Args:
+            parts: Values identifying the resource and its version
+
+        Returns:
+            ETag string (unquoted)
+        """
+        return "-".join(str(part) for part in parts)
+
+    @staticmethod
+    def is_not_modified(etag):
+        """
+        Check whether the client already holds the given version
+
+        Args:
+            etag: ETag of the current version of the resource
+
+        Returns:
+            Boolean indicating whether the request's If-None-Match matches etag
+        """
+        return request.if_none_match.contains(etag)
+
+    @staticmethod
+    def not_modified(etag):
+        """
+        Build an empty 304 Not Modified response
+
+        Args:
+            etag: ETag of the current version of the resource
+
+        Returns:
+            Flask response
+        """
+        return ConditionalResponse.tag(make_response("", 304), etag)
+
+    @staticmethod
+    def tag(response, etag):
+        """
+        Attach an ETag to a response and require clients to revalidate it
+
+        Args:
+            response: Flask response
+            etag: ETag of the version of the resource in the response
+
+        Returns:
+            Tagged Flask response
+        """
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+
+class JSONStream:
+    """
+    Streaming JSON encoder for large responses
+
+    Encodes like jsonify (the app's JSON provider, compact, keys sorted), but
+    iterators and generators found in the value are encoded as arrays while
+    they are consumed, so a response built from database cursors is written
+    out chunk by chunk instead of being held in memory as a whole.
+    """
+
+    CHUNK_SIZE = 64 * 1024  # characters buffered before a chunk is sent
+    ITEMS_PER_DUMP = 500  # plain array items encoded per json.dumps call
+    SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+
+    @staticmethod
+    def response(value):
+        """
+        Build a streaming JSON response (must be called in a request)
+
+        The request context, and so g and the database session, stay available
+        until the body is sent. The session's transaction (and its pooled
+        connection) stays open too, while the client reads: PostgreSQL ends it
+        after DB_IDLE_IN_TRANSACTION_TIMEOUT_MS without a query, cutting off
+        clients that stall. Errors past the first chunk can only cut the body
+        short, so they are logged here.
+
+        Args:
+            value: Value to encode, possibly holding iterators
+
+        Returns:
+            Streaming Flask response
+        """
+        app = current_app._get_current_object()
+
+        def generate():
+            try:
+                yield from JSONStream.iter_encode(value)
+            except Exception:
+                app.logger.exception("Error streaming JSON response")
+                raise
+
+        return app.response_class(stream_with_context(generate()), mimetype=app.json.mimetype)
+
+    @staticmethod
+    def iter_encode(value) -> Iterator[str]:
+        """
+        Encode a value as JSON text chunks (ending with a newline, like jsonify)
+
+        Args:
+            value: Value to encode, possibly holding iterators
+
+        Returns:
+            Iterator of JSON text chunks
+        """
+        provider = current_app.json
+
+        def dumps(obj):
+            return provider.dumps(obj, separators=(",", ":"))
+
+        buffer, size = [], 0
+        for piece in JSONStream._encode(value, dumps, provider.sort_keys):
+            buffer.append(piece)
+            size += len(piece)
+            if size >= JSONStream.CHUNK_SIZE:
+                yield "".join(buffer)
+                buffer, size = [], 0
+        buffer.append("\n")
+        yield "".join(buffer)
+
+    @staticmethod
+    def _is_plain(value) -> bool:
+        """ Check whether a value holds no iterator, so it can be encoded in one call """
+        if isinstance(value, (dict, list, tuple)):
+            for item in (value.values() if isinstance(value, dict) else value):
+                if type(item) not in JSONStream.SCALAR_TYPES and not JSONStream._is_plain(item):
+                    return False
+            return True
+        return not isinstance(value, Iterator)
+
+    @staticmethod
+    def _encode(value, dumps, sort_keys):
+        if JSONStream._is_plain(value):
+            yield dumps(value)
+            return
+
+        if isinstance(value, dict):
+            # Not empty, as it holds an iterator
+            separator = "{"
+            for key in (sorted(value) if sort_keys else value):
+                yield separator + dumps(key) + ":"
+                yield from JSONStream._encode(value[key], dumps, sort_keys)
+                separator = ","
+            yield "}"
+            return
+
+        # Runs of plain items are encoded together, as a list without its brackets
+        separator = ""
+        batch = []
+        yield "["
+        for item in value:
+            plain = JSONStream._is_plain(item)
+            if plain:
+                batch.append(item)
+                if len(batch) < JSONStream.ITEMS_PER_DUMP:
+                    continue
+            if batch:
+                yield separator + dumps(batch)[1:-1]
+                separator = ","
+                batch = []
+            if not plain:
+                yield separator
+                yield from JSONStream._encode(item, dumps, sort_keys)
+                separator = ","
+        if batch:
+            yield separator + dumps(batch)[1:-1]
+        yield "]"
+
+
 class FileProcessingService:
     """Service for processing various file types"""
 
+    STREAMABLE_EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+
     @staticmethod
     def process_excel(filepath):
         """
         Process Excel file and return structured data
 
         Args:
-            filepath: Path to the Excel file
+            filepath: Path or binary file object of the Excel file
 
         Returns:
             Dictionary with sheet data
@@ -290,23 +664,196 @@ class FileProcessingService:
         return result
 
     @staticmethod
-    def process_pdf(filepath):
+    def iter_excel_rows(filepath, sheets=None, offset=0, max_rows=None):
+        """
+        Stream an Excel workbook row by row without loading it into memory
+
+        Uses openpyxl in read-only mode, so memory use stays flat regardless
+        of the workbook size. The first row of each sheet is its header row,
+        as with process_excel; fully empty rows are skipped.
+
+        Args:
+            filepath: Path or binary file object of the .xlsx/.xlsm file
+            sheets: Names of the sheets to read (None for all sheets)
+            offset: Number of data rows to skip in each sheet
+            max_rows: Maximum number of data rows to return per sheet (None for no limit)
+
+        Yields:
+            Events as dictionaries, in order for each sheet:
+            {"sheet", "headers"}, then {"sheet", "row"} per data row,
+            then {"sheet", "rows", "has_more"}
+        """
+        workbook = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+        try:
+            if sheets:
+                missing = [name for name in sheets if name not in workbook.sheetnames]
+                if missing:
+                    raise ValueError(f"Sheets not found: {', '.join(missing)}")
+            sheet_names = sheets or workbook.sheetnames
+
+            for sheet_name in sheet_names:
+                rows = (
+                    row for row in workbook[sheet_name].iter_rows(values_only=True)
+                    if any(value is not None for value in row)
+                )
+                header_row = next(rows, ())
+                headers = [
+                    str(value) if value is not None else f"Unnamed: {i}"
+                    for i, value in enumerate(header_row)
+                ]
+                yield {"sheet": sheet_name, "headers": headers}
+
+                count = 0
+                has_more = False
+                for index, row in enumerate(rows):
+                    if index < offset:
+                        continue
+                    if max_rows is not None and count >= max_rows:
+                        has_more = True
+                        break
+                    yield {
+                        "sheet": sheet_name,
+                        "row": {
+                            header: FileProcessingService.excel_value(value)
+                            for header, value in zip(headers, row)
+                        },
+                    }
+                    count += 1
+
+                yield {"sheet": sheet_name, "rows": count, "has_more": has_more}
+        finally:
+            # Read-only workbooks keep the file open until closed
+            workbook.close()
+
+    @staticmethod
+    def process_excel_page(filepath, sheets=None, offset=0, max_rows=1000):
+        """
+        Read one page of rows from each sheet of an Excel file
+
+        Args:
+            filepath: Path or binary file object of the .xlsx/.xlsm file
+            sheets: Names of the sheets to read (None for all sheets)
+            offset: Number of data rows to skip in each sheet
+            max_rows: Maximum number of data rows to return per sheet
+
+        Returns:
+            Dictionary with sheet data, like process_excel, plus offset and has_more per sheet
+        """
+        result = {}
+        for event in FileProcessingService.iter_excel_rows(filepath, sheets=sheets, offset=offset, max_rows=max_rows):
+            if "headers" in event:
+                result[event["sheet"]] = {'headers': event["headers"], 'data': [], 'offset': offset}
+            elif "row" in event:
+                result[event["sheet"]]['data'].append(event["row"])
+            else:
+                result[event["sheet"]]['has_more'] = event["has_more"]
+
+        return result
+
+    @staticmethod
+    def excel_value(value):
+        """ Convert a cell value read by openpyxl to a JSON-serializable value """
+        if isinstance(value, (datetime, date, dt_time)):
+            return value.isoformat()
+        if isinstance(value, timedelta):
+            return value.total_seconds()
+        return value
+
+    @staticmethod
+    def process_pdf(filepath, max_chars=None, pages=None):
         """
         Extract text from PDF file
 
         Args:
-            filepath: Path to the PDF file
+            filepath: Path or binary file object of the PDF file
+            max_chars: Stop extracting once this many characters are collected
+            pages: (first, last) 1-based page range to extract
 
         Returns:
             Extracted text content
         """
-        text = ""
+        return FileProcessingService.extract_pdf_text(lambda: filepath, max_chars=max_chars, pages=pages)["text"]
+
+    @staticmethod
+    def parse_page_range(value):
+        """
+        Parse a 1-based page range such as "3" or "2-5"
+
+        Args:
+            value: Page range string
+
+        Returns:
+            (first, last) tuple, last being None for an open range ("4-")
+        """
+        first, _, last = value.partition('-')
+        try:
+            first = int(first)
+            last = int(last) if last else (None if _ else first)
+        except ValueError:
+            raise ValueError("Invalid page range. Use a page number or a range like 2-5")
+        if first < 1 or (last is not None and last < first):
+            raise ValueError("Invalid page range. Use a page number or a range like 2-5")
+        return first, last
+
+    @staticmethod
+    def extract_pdf_text(open_pdf, max_chars=None, pages=None, cache_prefix=None):
+        """
+        Extract text from a PDF page by page, stopping once enough text is collected
 
-        with open(filepath, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
+        Pages are only parsed when needed. With cache_prefix, the text of each
+        page (and the page count) is kept in FileContentCache, and the PDF isn't
+        opened at all when every page needed is cached.
 
-            for page_num in range(len(reader.pages)):
-                page = reader.pages[page_num]
-                text += page.extract_text() + "\n\n"
+        Args:
+            open_pdf: Callable returning the PDF file as a path or binary file object
+            max_chars: Stop once this many characters are collected (None for no limit)
+            pages: (first, last) 1-based page range (None for all pages)
+            cache_prefix: Tuple identifying this version of the PDF (e.g. S3 key and ETag)
 
-        return text
+        Returns:
+            Dictionary with text, page_count and truncated (whether text was left out)
+        """
+        with ExitStack() as stack:
+            reader = None
+
+            def get_reader():
+                nonlocal reader
+                if reader is None:
+                    pdf_file = open_pdf()
+                    if isinstance(pdf_file, (str, os.PathLike)):
+                        pdf_file = stack.enter_context(open(pdf_file, 'rb'))
+                    reader = PyPDF2.PdfReader(pdf_file)
+                return reader
+
+            def cached(key_parts, compute):
+                if cache_prefix is None:
+                    return compute()
+                key = FileContentCache.make_key(*cache_prefix, *key_parts)
+                value = FileContentCache.get(key)
+                if value is None:
+                    value = compute()
+                    FileContentCache.put(key, value)
+                return value
+
+            page_count = cached(("page_count",), lambda: len(get_reader().pages))
+            first, last = pages or (1, None)
+            last = page_count if last is None else min(last, page_count)
+
+            texts = []
+            length = 0
+            truncated = False
+            for page_num in range(first - 1, last):
+                if max_chars is not None and length >= max_chars:
+                    truncated = True
+                    break
+                text = cached(("page", page_num),
+                              lambda: (get_reader().pages[page_num].extract_text() or "") + "\n\n")
+                texts.append(text)
+                length += len(text)
+
+            text = "".join(texts)
+            if max_chars is not None and len(text) > max_chars:
+                text = text[:max_chars]
+                truncated = True
+
+        return {"text": text, "page_count": page_count, "truncated": truncated}
@@ -0,0 +1,93 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+
+Benchmark of login throughput under a burst of concurrent logins (e.g. a
+shift change), to size gunicorn workers and the password hashing policy.
+
+    python benchmarks/bench_login.py --concurrency 16 --logins 200
+    python benchmarks/bench_login.py --method pbkdf2:sha256:600000 --hash-workers 4
+"""
+
+import statistics
+import threading
+import time
+
+from common import create_bench_app, parse_args, timed
+
+
+def main():
+    args = parse_args(
+        __doc__.split('\n\n')[1],
+        method=(str, None, "PASSWORD_HASH_METHOD to benchmark (default: configured policy)"),
+        hash_workers=(int, None, "PASSWORD_HASH_WORKERS (default: configured)"),
+        cache_seconds=(int, 0, "PASSWORD_VERIFY_CACHE_SECONDS"),
+        users=(int, 50, "Distinct users logging in"),
+        logins=(int, 200, "Total logins"),
+        concurrency=(int, 8, "Simultaneous logins (request threads)"),
+    )
+    app, tenant_id, _ = create_bench_app(args.database_url)
+    if args.method:
+        app.config['PASSWORD_HASH_METHOD'] = args.method
+    if args.hash_workers:
+        app.config['PASSWORD_HASH_WORKERS'] = args.hash_workers
+    app.config['PASSWORD_VERIFY_CACHE_SECONDS'] = args.cache_seconds
+
+    from app import db
+    from app.models.user import User
+
+    with app.app_context():
+        print(f"Policy: {app.config['PASSWORD_HASH_METHOD']}, "
+              f"{app.config['PASSWORD_HASH_WORKERS']} hash workers, cache {args.cache_seconds}s")
+        # Same password for everyone: hash once
+        template = User(password_hash=None)
+        template.set_password('Password123')
+        usernames = [f"staff-{tenant_id}-{i}" for i in range(args.users)]
+        db.session.add_all([User(
+            tenant_id=tenant_id,
+            name=username,
+            username=username,
+            email=f"{username}@example.com",
+            phone=username,
+            employee_id=username,
+            role='staff',
+            password_hash=template.password_hash,
+        ) for username in usernames])
+        db.session.commit()
+
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    remaining = iter(range(args.logins))
+
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                index = next(remaining, None)
+            if index is None:
+                return
+            start = time.perf_counter()
+            response = client.post(f"/api/auth/login/{tenant_id}", json={
+                "username": usernames[index % len(usernames)],
+                "password": "Password123",
+            })
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    with timed(f"{args.logins} logins, {args.concurrency} at a time", args.logins, 'logins'):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    latencies.sort()
+    print(f"Latency p50 {statistics.median(latencies) * 1000:.0f}ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f}ms, "
+          f"max {latencies[-1] * 1000:.0f}ms")
+    print(f"Responses: {dict(sorted(statuses.items()))}")
+
+
+if __name__ == '__main__':
+    main()
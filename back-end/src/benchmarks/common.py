@@ -0,0 +1,78 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args(description, **arguments):
+    """
+    Parse the benchmark's command line
+
+    Every benchmark takes --database-url; without it a throwaway SQLite
+    database is used. Extra arguments are given as name=(type, default, help).
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--database-url', help="Database to benchmark against (default: a temporary SQLite file)")
+    for name, (arg_type, default, help_text) in arguments.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=arg_type, default=default, help=help_text)
+    return parser.parse_args()
+
+
+def create_bench_app(database_url=None):
+    """
+    Create the app against the benchmark database, with a tenant and user of its own
+
+    The environment's DATABASE_URL is never used implicitly, so a benchmark
+    can't write into a real database by accident.
+
+    Returns:
+        Tuple of (app, tenant ID, user ID)
+    """
+    os.environ['DATABASE_URL'] = database_url or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bakedinsights-bench-'), 'bench.db')}"
+
+    from app import create_app, db
+    from app.models.tenant import Tenant
+    from app.models.user import User
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        tenant = Tenant(name=f"Benchmark {uuid.uuid4().hex[:8]}")
+        db.session.add(tenant)
+        db.session.commit()
+        user = User(
+            tenant_id=tenant.id,
+            name='Benchmark',
+            username=f"bench-{uuid.uuid4().hex[:8]}",
+            email=f"bench-{uuid.uuid4().hex[:8]}@example.com",
+            phone='000-000-0000',
+            employee_id='BENCH',
+            role='super_admin',
+            deactivated=False
+        )
+        user.set_password('Benchmark123')
+        db.session.add(user)
+        db.session.commit()
+        print(f"Database: {db.engine.url.render_as_string(hide_password=True)}")
+        return app, tenant.id, user.id
+
+
+@contextmanager
+def timed(label, count=None, unit='rows'):
+    """ Print how long the block took (and its throughput when count is given) """
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    rate = f" ({count / elapsed:,.0f} {unit}/s)" if count else ""
+    print(f"{label:<40} {elapsed:8.3f}s{rate}")
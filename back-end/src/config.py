@@ -1,17 +1,117 @@
 import os
+import tempfile
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///bakedinsights.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool per process (each gunicorn worker has its own): connections
+    # are checked before use and recycled before the server or a proxy drops them
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    SQLALCHEMY_ENGINE_OPTIONS = {} if SQLALCHEMY_DATABASE_URI.startswith('sqlite') else {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+    # PostgreSQL transactions are tagged "<DB_APPLICATION_NAME> tenant=<id>" in
+    # pg_stat_activity; request statements are cancelled after DB_STATEMENT_TIMEOUT_MS
+    # (0 disables), background jobs use DB_JOB_STATEMENT_TIMEOUT_MS and scripts have no limit.
+    # Request transactions left idle for DB_IDLE_IN_TRANSACTION_TIMEOUT_MS (e.g. a
+    # streamed response waiting on a slow client) are ended by the server, closing
+    # their connection, so they can't hold locks and pooled connections indefinitely
+    DB_APPLICATION_NAME = os.environ.get('DB_APPLICATION_NAME', 'bakedinsights')
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+    DB_JOB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_JOB_STATEMENT_TIMEOUT_MS', 0))
+    DB_IDLE_IN_TRANSACTION_TIMEOUT_MS = int(os.environ.get('DB_IDLE_IN_TRANSACTION_TIMEOUT_MS', 120000))
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'dev-jwt-secret-key-change-in-production')
+    # Event streams (EventSource can't set headers) take a token as ?token=<token>
+    JWT_QUERY_STRING_NAME = 'token'
     
     # File upload configuration (16MB limit)
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
 
+    # Password hashing policy: a werkzeug method and its cost. Hashes made under
+    # another policy are upgraded on login. Hashing runs on a pool of
+    # PASSWORD_HASH_WORKERS threads per process; logins waiting longer than
+    # PASSWORD_HASH_TIMEOUT_SECONDS get a 503. PASSWORD_VERIFY_CACHE_SECONDS > 0
+    # remembers successful logins in memory to skip re-hashing
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_TIMEOUT_SECONDS = float(os.environ.get('PASSWORD_HASH_TIMEOUT_SECONDS', 10))
+    PASSWORD_VERIFY_CACHE_SECONDS = int(os.environ.get('PASSWORD_VERIFY_CACHE_SECONDS', 0))
+
     MAIL_SERVER = 'smtp.gmail.com'
     MAIL_PORT = 587
     MAIL_USE_TLS = True
     MAIL_USE_SSL = False
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME', 'noreply@bakedinsights.com')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD', '')
+    # Outbound mail is queued and sent by a background thread (see app.mailer):
+    # 'smtp' sends with the settings above over one reused connection, 'file'
+    # writes .eml files to MAIL_FILE_DIR and 'memory' keeps them (for tests)
+    MAIL_TRANSPORT = os.environ.get('MAIL_TRANSPORT', 'smtp')
+    MAIL_FILE_DIR = os.environ.get('MAIL_FILE_DIR', os.path.join(tempfile.gettempdir(), 'bakedinsights-mail'))
+    MAIL_QUEUE_SIZE = int(os.environ.get('MAIL_QUEUE_SIZE', 1000))
+    MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE', 50))
+    MAIL_IDLE_SECONDS = int(os.environ.get('MAIL_IDLE_SECONDS', 30))  # close the SMTP connection once idle
+    MAIL_MAX_RETRIES = int(os.environ.get('MAIL_MAX_RETRIES', 5))
+    MAIL_RETRY_BACKOFF_SECONDS = float(os.environ.get('MAIL_RETRY_BACKOFF_SECONDS', 2))  # doubled on each retry
+
+    # AI file context: attachments are downloaded and parsed concurrently,
+    # and files not ready by the deadline are left out of the context
+    AI_CONTEXT_MAX_WORKERS = int(os.environ.get('AI_CONTEXT_MAX_WORKERS', 8))
+    AI_CONTEXT_DEADLINE_SECONDS = int(os.environ.get('AI_CONTEXT_DEADLINE_SECONDS', 60))
+    # Upper bound on the formatted context, shared fairly between the attached files
+    AI_CONTEXT_MAX_CHARS = int(os.environ.get('AI_CONTEXT_MAX_CHARS', 100000))
+
+    # Rows per sheet returned by /api/files/process-excel with format=paged unless max_rows is given
+    EXCEL_PAGE_SIZE = int(os.environ.get('EXCEL_PAGE_SIZE', 1000))
+
+    # Background jobs (run_worker.py): uploads are staged on local disk shared
+    # with the workers, and running jobs that stop reporting progress are failed
+    JOB_STAGING_DIR = os.environ.get('JOB_STAGING_DIR', os.path.join(tempfile.gettempdir(), 'bakedinsights-jobs'))
+    JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 1))
+    JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', 3600))
+
+    # Resumable chunked uploads (CSV imports beyond MAX_CONTENT_LENGTH): chunks are
+    # staged next to the job files, so the worker can import the finished file
+    UPLOAD_STAGING_DIR = os.environ.get('UPLOAD_STAGING_DIR', os.path.join(JOB_STAGING_DIR, 'uploads'))
+    UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 1024 * 1024 * 1024))
+    UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024  # suggested chunk size, below MAX_CONTENT_LENGTH
+    UPLOAD_EXPIRY_SECONDS = int(os.environ.get('UPLOAD_EXPIRY_SECONDS', 24 * 3600))
+
+    # The change log behind GET /api/tables/tabs/<id>/changes keeps this many days;
+    # clients that last synced before the pruned versions get full_resync
+    TABLE_CHANGE_RETENTION_DAYS = int(os.environ.get('TABLE_CHANGE_RETENTION_DAYS', 30))
+
+    # Column type changes convert this many cells per transaction, bounding row locks and WAL per commit
+    COLUMN_MIGRATION_BATCH_SIZE = int(os.environ.get('COLUMN_MIGRATION_BATCH_SIZE', 5000))
+
+    # Archived records (see ArchiveService) are moved out of the database into
+    # compressed Parquet files, kept in ARCHIVE_DIR ('local') or in the S3 bucket
+    # under ARCHIVE_S3_PREFIX ('s3', downloaded to ARCHIVE_DIR when read).
+    # Point lookups read a whole row group of ARCHIVE_ROW_GROUP_SIZE cells.
+    # ARCHIVE_DIR defaults to the instance folder, next to the SQLite database
+    ARCHIVE_STORAGE = os.environ.get('ARCHIVE_STORAGE', 'local')
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'instance', 'archive'))
+    ARCHIVE_S3_PREFIX = os.environ.get('ARCHIVE_S3_PREFIX', 'archive/')
+    ARCHIVE_COMPRESSION = os.environ.get('ARCHIVE_COMPRESSION', 'zstd')
+    ARCHIVE_ROW_GROUP_SIZE = int(os.environ.get('ARCHIVE_ROW_GROUP_SIZE', 10000))
+
+    # Live update (SSE) configuration
+    # 'local' only reaches clients of the same worker process; use 'postgres'
+    # (LISTEN/NOTIFY) when running several gunicorn workers
+    EVENT_BROKER_BACKEND = os.environ.get('EVENT_BROKER_BACKEND', 'local')
+    EVENT_STREAM_HEARTBEAT_SECONDS = 15
+    EVENT_STREAM_MAX_SECONDS = 300
+    EVENT_STREAM_QUEUE_SIZE = 100
+    # Lifetime of the tokens from POST /api/events/token, only checked when a stream connects
+    EVENT_STREAM_TOKEN_SECONDS = int(os.environ.get('EVENT_STREAM_TOKEN_SECONDS', 60))
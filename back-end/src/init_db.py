@@ -4,6 +4,7 @@ All rights reserved.
 """
 
 from app import create_app, db
+from app.hooks import bypass_tenant_isolation
 from app.models.tenant import Tenant
 from app.models.user import User
 
@@ -13,6 +14,8 @@ def init_db():
     """ Initialize the database Admin User """
 
     with app.app_context():
+        bypass_tenant_isolation()
+
         # Drop all tables and recreate them
         db.drop_all()
         db.create_all()
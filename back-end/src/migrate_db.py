@@ -0,0 +1,63 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+import os
+import sys
+
+from app import create_app, db
+from app.hooks import bypass_tenant_isolation
+from sqlalchemy import text
+
+app = create_app()
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+def pending_migrations(applied):
+    """ List migration files in MIGRATIONS_DIR that have not been applied yet """
+    return [
+        name for name in sorted(os.listdir(MIGRATIONS_DIR))
+        if name.endswith('.sql') and name not in applied
+    ]
+
+
+def migrate_db(dry_run=False):
+    """
+    Apply pending SQL migrations to an existing PostgreSQL database
+
+    Fresh databases created by init_db.py already have the latest schema;
+    this brings long-lived databases up to date without dropping data.
+    """
+    with app.app_context():
+        # Migrations rewrite rows of every tenant
+        bypass_tenant_isolation()
+        db.session.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migration ("
+            " name VARCHAR(255) PRIMARY KEY,"
+            " applied_at TIMESTAMP NOT NULL DEFAULT NOW())"
+        ))
+        db.session.commit()
+
+        applied = {row[0] for row in db.session.execute(text("SELECT name FROM schema_migration"))}
+        for name in pending_migrations(applied):
+            print(f"- {name}")
+            if dry_run:
+                continue
+            with open(os.path.join(MIGRATIONS_DIR, name), encoding='utf-8') as sql_file:
+                sql = sql_file.read()
+            try:
+                db.session.execute(text(sql))
+                db.session.execute(
+                    text("INSERT INTO schema_migration (name) VALUES (:name)"),
+                    {'name': name},
+                )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+
+if __name__ == '__main__':
+    migrate_db(dry_run='--dry-run' in sys.argv)
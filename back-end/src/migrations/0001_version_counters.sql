@@ -0,0 +1,4 @@
+-- Change counters backing the ETags of table and checklist reads
+ALTER TABLE "table" ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE checklist_template ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE checklist ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0;
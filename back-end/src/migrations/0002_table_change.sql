@@ -0,0 +1,12 @@
+-- Change log backing delta sync of tabs
+CREATE TABLE IF NOT EXISTS table_change (
+    id SERIAL PRIMARY KEY,
+    tenant_id INTEGER NOT NULL REFERENCES tenant (id),
+    tab_id INTEGER NOT NULL REFERENCES table_tab (id),
+    version INTEGER NOT NULL,
+    op VARCHAR(20) NOT NULL,
+    record_id INTEGER,
+    column_id INTEGER,
+    changed_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS ix_table_change_tab_version ON table_change (tab_id, version);
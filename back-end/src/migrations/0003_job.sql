@@ -0,0 +1,19 @@
+-- Background job queue claimed by run_worker.py
+CREATE TABLE IF NOT EXISTS job (
+    id SERIAL PRIMARY KEY,
+    tenant_id INTEGER NOT NULL REFERENCES tenant (id),
+    kind VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    payload JSON NOT NULL,
+    result JSON,
+    error TEXT,
+    progress FLOAT NOT NULL,
+    progress_message VARCHAR(255),
+    attempts INTEGER NOT NULL,
+    created_by INTEGER NOT NULL REFERENCES "user" (id),
+    created_at TIMESTAMP,
+    started_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS ix_job_status_id ON job (status, id);
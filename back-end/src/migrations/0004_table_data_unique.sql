@@ -0,0 +1,17 @@
+-- One cell per (record_id, column_id); cell writes upsert against this constraint.
+-- Duplicates left by earlier concurrent writes keep their newest row.
+DELETE FROM table_data older
+USING table_data newer
+WHERE older.record_id = newer.record_id
+  AND older.column_id = newer.column_id
+  AND older.id < newer.id;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'uq_table_data_record_column'
+    ) THEN
+        ALTER TABLE table_data
+            ADD CONSTRAINT uq_table_data_record_column UNIQUE (record_id, column_id);
+    END IF;
+END $$;
@@ -0,0 +1,25 @@
+-- Batched column type migrations walk a column's cells in id order
+CREATE INDEX IF NOT EXISTS ix_table_data_column_id_id ON table_data (column_id, id);
+
+-- Checkpoints of column type migrations (see ColumnMigrationService)
+CREATE TABLE IF NOT EXISTS column_migration (
+    id SERIAL PRIMARY KEY,
+    tenant_id INTEGER NOT NULL REFERENCES tenant (id),
+    column_id INTEGER NOT NULL REFERENCES table_column (id),
+    tab_id INTEGER NOT NULL REFERENCES table_tab (id),
+    prev_data_type VARCHAR(50) NOT NULL,
+    new_data_type VARCHAR(50) NOT NULL,
+    strict BOOLEAN NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    phase VARCHAR(20) NOT NULL,
+    first_id INTEGER,
+    max_id INTEGER,
+    last_id INTEGER NOT NULL,
+    cells_failed INTEGER,
+    error TEXT,
+    created_by INTEGER NOT NULL REFERENCES "user" (id),
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS ix_column_migration_column_id ON column_migration (column_id);
@@ -0,0 +1,38 @@
+-- Tenant isolation in the database: every tenant-scoped table only shows and
+-- accepts rows of the tenant set for the transaction in app.tenant_id (see
+-- configure_db_transaction). Without a tenant (logins, job claims, maintenance
+-- scripts) rows are not filtered. FORCE applies the policy to the table owner
+-- too; superusers and BYPASSRLS roles still skip it, so the app must connect
+-- as an ordinary role.
+DO $$
+DECLARE
+    tenant_table TEXT;
+BEGIN
+    FOREACH tenant_table IN ARRAY ARRAY[
+        'user', 'table', 'table_tab', 'table_column', 'table_record', 'table_data',
+        'table_share', 'table_change', 'column_migration', 'checklist_template',
+        'checklist_field', 'checklist', 'checklist_item', 'checklist_assignment', 'job'
+    ] LOOP
+        EXECUTE 'ALTER TABLE ' || quote_ident(tenant_table) || ' ENABLE ROW LEVEL SECURITY';
+        EXECUTE 'ALTER TABLE ' || quote_ident(tenant_table) || ' FORCE ROW LEVEL SECURITY';
+        EXECUTE 'DROP POLICY IF EXISTS tenant_isolation ON ' || quote_ident(tenant_table);
+        EXECUTE 'CREATE POLICY tenant_isolation ON ' || quote_ident(tenant_table) || ' USING ('
+            || 'NULLIF(current_setting(''app.tenant_id'', true), '''') IS NULL '
+            || 'OR tenant_id = CAST(current_setting(''app.tenant_id'', true) AS INTEGER))';
+    END LOOP;
+END $$;
+
+-- Tenant-leading indexes for the per-tenant lookups of the API
+CREATE INDEX IF NOT EXISTS ix_table_tab_tenant_id_table_id ON table_tab (tenant_id, table_id);
+CREATE INDEX IF NOT EXISTS ix_table_column_tenant_id_tab_id ON table_column (tenant_id, tab_id);
+CREATE INDEX IF NOT EXISTS ix_table_record_tenant_id_tab_id_id ON table_record (tenant_id, tab_id, id);
+CREATE INDEX IF NOT EXISTS ix_table_data_tenant_id_tab_id ON table_data (tenant_id, tab_id);
+CREATE INDEX IF NOT EXISTS ix_table_share_tenant_id_user_id ON table_share (tenant_id, user_id);
+CREATE INDEX IF NOT EXISTS ix_column_migration_tenant_id_running
+    ON column_migration (tenant_id, column_id) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS ix_checklist_field_tenant_id_template_id ON checklist_field (tenant_id, template_id);
+CREATE INDEX IF NOT EXISTS ix_checklist_tenant_id_template_id ON checklist (tenant_id, template_id);
+CREATE INDEX IF NOT EXISTS ix_checklist_item_tenant_id_checklist_id ON checklist_item (tenant_id, checklist_id);
+CREATE INDEX IF NOT EXISTS ix_checklist_item_tenant_id_field_id ON checklist_item (tenant_id, field_id);
+CREATE INDEX IF NOT EXISTS ix_checklist_assignment_tenant_id_user_id ON checklist_assignment (tenant_id, user_id);
+CREATE INDEX IF NOT EXISTS ix_job_tenant_id_created_by_id ON job (tenant_id, created_by, id);
@@ -0,0 +1,3 @@
+-- Tabs can keep each record's cells in one JSONB document (see TabStorageService)
+ALTER TABLE table_tab ADD COLUMN IF NOT EXISTS storage_mode VARCHAR(20) NOT NULL DEFAULT 'cells';
+ALTER TABLE table_record ADD COLUMN IF NOT EXISTS data JSONB;
@@ -0,0 +1,23 @@
+-- Records moved out of tabs into archive files (see ArchiveService)
+CREATE TABLE IF NOT EXISTS table_archive (
+    id SERIAL PRIMARY KEY,
+    tenant_id INTEGER NOT NULL REFERENCES tenant (id),
+    tab_id INTEGER NOT NULL REFERENCES table_tab (id),
+    storage VARCHAR(20) NOT NULL,
+    path VARCHAR(255) NOT NULL,
+    cutoff TIMESTAMP NOT NULL,
+    record_count INTEGER NOT NULL,
+    cell_count INTEGER NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    min_record_id INTEGER NOT NULL,
+    max_record_id INTEGER NOT NULL,
+    min_created_at TIMESTAMP,
+    max_created_at TIMESTAMP,
+    created_by INTEGER NOT NULL REFERENCES "user" (id),
+    created_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS ix_table_archive_tenant_id_tab_id_min_record_id ON table_archive (tenant_id, tab_id, min_record_id);
+ALTER TABLE table_archive ENABLE ROW LEVEL SECURITY;
+ALTER TABLE table_archive FORCE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS tenant_isolation ON table_archive;
+CREATE POLICY tenant_isolation ON table_archive USING (NULLIF(current_setting('app.tenant_id', true), '') IS NULL OR tenant_id = CAST(current_setting('app.tenant_id', true) AS INTEGER));
@@ -0,0 +1,3 @@
+-- The change log is pruned by age; tabs remember the latest pruned version
+ALTER TABLE table_tab ADD COLUMN IF NOT EXISTS changes_pruned_version INTEGER NOT NULL DEFAULT 0;
+CREATE INDEX IF NOT EXISTS ix_table_change_changed_at ON table_change (changed_at);
@@ -0,0 +1,20 @@
+-- Tenant isolation fails closed: a transaction without app.tenant_id sees and
+-- writes no rows. Code working across tenants by design (scripts, the worker's
+-- queue housekeeping) sets app.bypass_rls = 'on' explicitly (see
+-- bypass_tenant_isolation).
+DO $$
+DECLARE
+    tenant_table TEXT;
+BEGIN
+    FOREACH tenant_table IN ARRAY ARRAY[
+        'user', 'table', 'table_tab', 'table_column', 'table_record', 'table_data',
+        'table_share', 'table_change', 'column_migration', 'checklist_template',
+        'checklist_field', 'checklist', 'checklist_item', 'checklist_assignment', 'job',
+        'table_archive'
+    ] LOOP
+        EXECUTE 'DROP POLICY IF EXISTS tenant_isolation ON ' || quote_ident(tenant_table);
+        EXECUTE 'CREATE POLICY tenant_isolation ON ' || quote_ident(tenant_table) || ' USING ('
+            || 'current_setting(''app.bypass_rls'', true) = ''on'' '
+            || 'OR tenant_id = CAST(NULLIF(current_setting(''app.tenant_id'', true), '''') AS INTEGER))';
+    END LOOP;
+END $$;
@@ -0,0 +1,249 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+import argparse
+
+from app import create_app, db
+from app.hooks import bypass_tenant_isolation
+from app.models.table import TableData, TableRecord
+from app.models.tenant import TENANT_POLICY, Tenant
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+
+app = create_app()
+
+# Tables partitioned by tenant_id, referenced tables first (table_data references table_record)
+PARTITIONED_TABLES = (TableRecord.__table__, TableData.__table__)
+
+
+def partition_name(table, tenant_id) -> str:
+    """ Name of a tenant's own partition of a table """
+    return f"{table.name}_tenant_{int(tenant_id)}"
+
+
+def default_partition_name(table) -> str:
+    """ Name of the partition holding the rows of tenants without their own partition """
+    return f"{table.name}_default"
+
+
+def get_connection():
+    """ Connection of the current session, which must be on PostgreSQL (sees every tenant's rows) """
+    bypass_tenant_isolation()
+    connection = db.session.connection()
+    if connection.dialect.name != 'postgresql':
+        raise SystemExit("Partitioning requires PostgreSQL")
+    return connection
+
+
+def is_partitioned(connection, name: str) -> bool:
+    """ Check whether a table is partitioned """
+    return connection.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:name))"),
+        {'name': name}
+    ).scalar()
+
+
+def table_exists(connection, name: str) -> bool:
+    """ Check whether a table (or partition) exists """
+    return connection.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': name}).scalar()
+
+
+def add_constraints(connection, table):
+    """
+    Recreate a model's keys, indexes and row-level security on its partitioned table
+
+    Keys must include the partition key, so tenant_id leads the primary key,
+    the unique constraints and the foreign keys to other partitioned tables.
+    """
+    quote = connection.dialect.identifier_preparer.quote
+    partitioned = {t.name for t in PARTITIONED_TABLES}
+
+    connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD CONSTRAINT {table.name}_pkey PRIMARY KEY (tenant_id, id)")
+
+    for constraint in table.constraints:
+        if isinstance(constraint, db.UniqueConstraint):
+            columns = ['tenant_id'] + [c.name for c in constraint.columns if c.name != 'tenant_id']
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table.name} ADD CONSTRAINT {constraint.name} UNIQUE ({', '.join(columns)})"
+            )
+
+    for constraint in table.foreign_key_constraints:
+        columns = [element.parent.name for element in constraint.elements]
+        referred_columns = [element.column.name for element in constraint.elements]
+        if constraint.referred_table.name in partitioned:
+            columns, referred_columns = ['tenant_id'] + columns, ['tenant_id'] + referred_columns
+        connection.exec_driver_sql(
+            f"ALTER TABLE {table.name} ADD FOREIGN KEY ({', '.join(columns)}) "
+            f"REFERENCES {quote(constraint.referred_table.name)} ({', '.join(referred_columns)})"
+        )
+
+    for index in table.indexes:
+        connection.exec_driver_sql(str(CreateIndex(index).compile(dialect=connection.dialect)))
+
+    connection.exec_driver_sql(f"ALTER TABLE {table.name} ENABLE ROW LEVEL SECURITY")
+    connection.exec_driver_sql(f"ALTER TABLE {table.name} FORCE ROW LEVEL SECURITY")
+    connection.exec_driver_sql(f"CREATE POLICY tenant_isolation ON {table.name} USING ({TENANT_POLICY})")
+
+
+def convert(min_rows: int = 0):
+    """
+    Rebuild table_record and table_data as tables partitioned by tenant_id
+
+    Tenants with at least min_rows cells get their own partition, the others
+    share the default partition (see add_tenant to move them out later).
+    Runs in one transaction holding exclusive locks on both tables, so the
+    API must be stopped while the rows are copied.
+    """
+    with app.app_context():
+        connection = get_connection()
+        if is_partitioned(connection, TableData.__tablename__):
+            print("Tables are already partitioned")
+            return
+
+        connection.exec_driver_sql("LOCK TABLE table_record, table_data IN ACCESS EXCLUSIVE MODE")
+        cell_counts = dict(connection.execute(text("SELECT tenant_id, COUNT(*) FROM table_data GROUP BY tenant_id")).all())
+        tenant_ids = [
+            tenant_id for (tenant_id,) in db.session.query(Tenant.id).order_by(Tenant.id)
+            if cell_counts.get(tenant_id, 0) >= min_rows
+        ]
+
+        for table in PARTITIONED_TABLES:
+            print(f"- {table.name}: {len(tenant_ids)} tenant partitions and a default partition")
+            new_name = f"{table.name}_partitioned"
+            connection.exec_driver_sql(
+                f"CREATE TABLE {new_name} (LIKE {table.name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+                f"PARTITION BY LIST (tenant_id)"
+            )
+            for tenant_id in tenant_ids:
+                connection.exec_driver_sql(
+                    f"CREATE TABLE {partition_name(table, tenant_id)} PARTITION OF {new_name} FOR VALUES IN ({tenant_id})"
+                )
+            connection.exec_driver_sql(f"CREATE TABLE {default_partition_name(table)} PARTITION OF {new_name} DEFAULT")
+            connection.exec_driver_sql(f"INSERT INTO {new_name} SELECT * FROM {table.name}")
+
+            # Keep the id sequence when the old table is dropped
+            sequence = connection.execute(
+                text("SELECT pg_get_serial_sequence(:name, 'id')"), {'name': table.name}
+            ).scalar()
+            if sequence:
+                connection.exec_driver_sql(f"ALTER SEQUENCE {sequence} OWNED BY {new_name}.id")
+
+        for table in reversed(PARTITIONED_TABLES):
+            connection.exec_driver_sql(f"DROP TABLE {table.name}")
+        for table in PARTITIONED_TABLES:
+            connection.exec_driver_sql(f"ALTER TABLE {table.name}_partitioned RENAME TO {table.name}")
+            add_constraints(connection, table)
+
+        db.session.commit()
+        for table in PARTITIONED_TABLES:
+            db.session.execute(text(f"ANALYZE {table.name}"))
+        db.session.commit()
+
+
+def add_tenant(tenant_id: int):
+    """
+    Give a tenant its own partitions, moving its rows out of the default partitions
+
+    New tenants should be added before they have data, which makes this instant.
+    """
+    with app.app_context():
+        connection = get_connection()
+        if not is_partitioned(connection, TableData.__tablename__):
+            raise SystemExit("Tables are not partitioned, run: python partition_db.py convert")
+        if table_exists(connection, partition_name(TableData.__table__, tenant_id)):
+            print(f"Tenant {tenant_id} already has its own partitions")
+            return
+
+        # Block writes to the default partitions while the tenant's rows move
+        for table in PARTITIONED_TABLES:
+            connection.exec_driver_sql(f"LOCK TABLE {default_partition_name(table)} IN EXCLUSIVE MODE")
+
+        for table in PARTITIONED_TABLES:
+            connection.exec_driver_sql(
+                f"CREATE TABLE {partition_name(table, tenant_id)} "
+                f"(LIKE {table.name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            )
+            moved = connection.execute(text(
+                f"INSERT INTO {partition_name(table, tenant_id)} "
+                f"SELECT * FROM {default_partition_name(table)} WHERE tenant_id = :tenant_id"
+            ), {'tenant_id': tenant_id}).rowcount
+            print(f"- {partition_name(table, tenant_id)}: {moved} rows")
+
+        for table in reversed(PARTITIONED_TABLES):
+            connection.execute(
+                text(f"DELETE FROM {default_partition_name(table)} WHERE tenant_id = :tenant_id"),
+                {'tenant_id': tenant_id}
+            )
+        for table in PARTITIONED_TABLES:
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table.name} ATTACH PARTITION {partition_name(table, tenant_id)} "
+                f"FOR VALUES IN ({int(tenant_id)})"
+            )
+        db.session.commit()
+
+
+def drop_tenant(tenant_id: int, confirmed: bool = False):
+    """
+    Drop a tenant's partitions, deleting all its records and cells at once
+
+    The tenant's other rows (tables, tabs, columns, users, ...) are small
+    and are deleted as usual.
+    """
+    with app.app_context():
+        connection = get_connection()
+        names = [partition_name(table, tenant_id) for table in reversed(PARTITIONED_TABLES)]
+        if not all(table_exists(connection, name) for name in names):
+            raise SystemExit(f"Tenant {tenant_id} has no partitions of its own (its rows are in the default partitions)")
+
+        for name in names:
+            print(f"- DROP TABLE {name}")
+            if confirmed:
+                connection.exec_driver_sql(f"DROP TABLE {name}")
+        if not confirmed:
+            print("Nothing dropped, run again with --yes to drop")
+        db.session.commit()
+
+
+def show_status():
+    """ List the partitions of each partitioned table with their estimated row counts """
+    with app.app_context():
+        connection = get_connection()
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(connection, table.name):
+                print(f"{table.name}: not partitioned")
+                continue
+            print(f"{table.name}:")
+            for name, bound, rows in connection.execute(text("""
+                SELECT child.relname, pg_get_expr(child.relpartbound, child.oid), child.reltuples
+                FROM pg_inherits
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE pg_inherits.inhparent = to_regclass(:name)
+                ORDER BY child.relname
+            """), {'name': table.name}):
+                print(f"  {name}  {bound}  ~{max(int(rows), 0)} rows")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Partition table_record and table_data by tenant (PostgreSQL)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert_parser = commands.add_parser('convert', help="Rebuild the tables as partitioned tables (needs downtime)")
+    convert_parser.add_argument('--min-rows', type=int, default=0,
+                                help="Cells a tenant needs for its own partition (default: every tenant gets one)")
+    add_parser = commands.add_parser('add-tenant', help="Give a tenant its own partitions")
+    add_parser.add_argument('tenant_id', type=int)
+    drop_parser = commands.add_parser('drop-tenant', help="Drop a tenant's partitions and all its rows in them")
+    drop_parser.add_argument('tenant_id', type=int)
+    drop_parser.add_argument('--yes', action='store_true', help="Really drop (otherwise only list what would be dropped)")
+    commands.add_parser('status', help="List partitions")
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        convert(args.min_rows)
+    elif args.command == 'add-tenant':
+        add_tenant(args.tenant_id)
+    elif args.command == 'drop-tenant':
+        drop_tenant(args.tenant_id, args.yes)
+    else:
+        show_status()
@@ -0,0 +1,64 @@
+"""
+Copyright (c) BakedInsights, Inc. and affiliates.
+All rights reserved.
+"""
+
+import signal
+import threading
+import time
+
+from app import create_app, db
+from app.hooks import bypass_tenant_isolation
+from app.services.job_service import JobService
+from app.services.table_service import TableService
+
+app = create_app()
+
+STALE_CHECK_SECONDS = 60
+CHANGE_PRUNE_SECONDS = 3600
+
+stop = threading.Event()
+
+
+def run_worker():
+    """
+    Claim and run background jobs until stopped
+
+    Any number of workers can run against the same database. On SIGTERM or
+    SIGINT the worker finishes its current job before exiting.
+    """
+    poll_seconds = app.config['JOB_POLL_SECONDS']
+    last_stale_check = 0
+    last_change_prune = 0
+
+    while not stop.is_set():
+        # Each job runs in a fresh app context, so nothing leaks between tenants through g
+        with app.app_context():
+            # Queue housekeeping spans tenants; run_job scopes each job to its tenant
+            bypass_tenant_isolation()
+            try:
+                if time.monotonic() - last_stale_check > STALE_CHECK_SECONDS:
+                    JobService.fail_stale_jobs()
+                    last_stale_check = time.monotonic()
+                if time.monotonic() - last_change_prune > CHANGE_PRUNE_SECONDS:
+                    TableService.prune_table_changes()
+                    last_change_prune = time.monotonic()
+
+                job = JobService.claim_next_job()
+                if job is not None:
+                    app.logger.info("Running job %s (%s)", job.id, job.kind)
+                    JobService.run_job(job)
+            except Exception:
+                app.logger.exception("Error in job worker")
+                job = None
+            finally:
+                db.session.remove()
+
+        if job is None:
+            stop.wait(poll_seconds)
+
+
+if __name__ == '__main__':
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    run_worker()
@@ -2,8 +2,12 @@ import pytest
 import pickle
 from sqlalchemy.orm import sessionmaker
 from app import create_app, db as _db
+from app.models.tenant import Tenant
 from app.models.user import User
 from app.models.checklist import ChecklistTemplate, Checklist
+from app.services.table_service import TableService
+from config import Config
+from flask import g
 from flask_jwt_extended import create_access_token
 
 @pytest.fixture(scope='session')
@@ -103,4 +107,74 @@ def test_users(app, db):
         return {
             role: User.query.filter_by(role=role).first()
             for role in ['operator', 'manager', 'admin', 'super_admin']
-        }
\ No newline at end of file
+        }
+
+
+@pytest.fixture
+def sqlite_app(tmp_path, monkeypatch):
+    """App on a fresh SQLite database, with its staging and archive directories under tmp_path"""
+    for key, value in {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'JOB_STAGING_DIR': str(tmp_path / 'jobs'),
+        'UPLOAD_STAGING_DIR': str(tmp_path / 'uploads'),
+        'ARCHIVE_DIR': str(tmp_path / 'archive'),
+        'MAIL_TRANSPORT': 'memory',
+    }.items():
+        monkeypatch.setattr(Config, key, value)
+
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        _db.create_all()
+
+    yield app
+
+    with app.app_context():
+        _db.session.remove()
+        _db.engine.dispose()
+
+@pytest.fixture
+def tenant_user(sqlite_app):
+    """A tenant and its super_admin on sqlite_app: {tenant_id, user_id, headers}"""
+    with sqlite_app.app_context():
+        tenant = Tenant(name='Test Tenant')
+        _db.session.add(tenant)
+        _db.session.commit()
+        user = User(tenant_id=tenant.id, name='Test Admin', username='test_admin', email='admin@test.com',
+                    phone='5550100', employee_id='EMP001', role='super_admin')
+        _db.session.add(user)
+        _db.session.commit()
+        token = create_access_token(
+            identity=str(user.id),
+            additional_claims={'tenant_id': str(tenant.id), 'role': user.role}
+        )
+        return {
+            'tenant_id': tenant.id,
+            'user_id': user.id,
+            'headers': {'Authorization': f'Bearer {token}'},
+        }
+
+@pytest.fixture
+def tenant_context(sqlite_app, tenant_user):
+    """Request context on sqlite_app with g.tenant_id set, for calling services directly"""
+    with sqlite_app.test_request_context():
+        g.tenant_id = tenant_user['tenant_id']
+        yield tenant_user
+        _db.session.remove()
+
+@pytest.fixture
+def make_tab(tenant_context):
+    """Create a table with one tab in tenant_context: make_tab([(name, data_type)], storage_mode) -> (tab_id, column_ids)"""
+    def make(columns, storage_mode='cells'):
+        table = TableService.create_table({
+            'name': 'Test Table',
+            'tabs': [{
+                'name': 'Tab',
+                'storage_mode': storage_mode,
+                'columns': [{'name': name, 'data_type': data_type} for name, data_type in columns],
+            }],
+        }, creator_id=tenant_context['user_id'])
+        tab = table.tabs[0]
+        return tab.id, sorted(column.id for column in tab.columns)
+    return make
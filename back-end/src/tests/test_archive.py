@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+import pyarrow.parquet as pq
+import pytest
+from app import db
+from app.archive import archive_store
+from app.models.table import TableData, TableRecord
+from app.services.archive_service import ArchiveService
+from app.services.table_service import TableService
+
+
+def new_record(tab_id, updates):
+    TableService.update_table_data(tab_id, -1, updates)
+    return db.session.query(db.func.max(TableRecord.id)).scalar()
+
+
+def record_values(tab_id, record_id, include_archived=True):
+    record = TableService.get_record_data(tab_id, record_id, include_archived=include_archived)
+    return record and (record['archived'], {cell['column_id']: cell['value'] for cell in record['data']})
+
+
+@pytest.mark.parametrize('storage_mode', ['cells', 'document'])
+def test_archived_records_read_back(sqlite_app, make_tab, tenant_context, storage_mode):
+    sqlite_app.config['ARCHIVE_ROW_GROUP_SIZE'] = 2
+    tab_id, (name_id, count_id) = make_tab([('Name', 'text'), ('Count', 'number')], storage_mode)
+    records = [
+        new_record(tab_id, [{'column_id': name_id, 'value': f'r{i}'}, {'column_id': count_id, 'value': str(i)}])
+        for i in range(3)
+    ]
+    empty = new_record(tab_id, [])
+    before = {column['header']['column_id']: column['data'] for column in TableService.get_tab_data(tab_id)}
+
+    archive = ArchiveService.archive_tab(tab_id, datetime.utcnow() + timedelta(minutes=1),
+                                         tenant_context['user_id'])
+
+    assert (archive.record_count, archive.cell_count) == (4, 6)
+    assert pq.ParquetFile(archive_store.local_path(archive.path)).num_row_groups == 4
+    assert TableRecord.query.filter_by(tab_id=tab_id).count() == 0
+    assert TableData.query.filter_by(tab_id=tab_id).count() == 0
+
+    assert all(not column['data'] for column in TableService.get_tab_data(tab_id))
+    after = {column['header']['column_id']: column['data']
+             for column in TableService.get_tab_data(tab_id, include_archived=True)}
+    assert after == {
+        column_id: [{**cell, 'data_id': None} for cell in cells] for column_id, cells in before.items()
+    }
+
+    assert record_values(tab_id, records[1]) == (True, {name_id: 'r1', count_id: 1})
+    assert record_values(tab_id, records[2], include_archived=False) is None
+    assert record_values(tab_id, empty) == (True, {})
+    assert record_values(tab_id, empty + 1) is None
+
+
+def test_archive_keeps_recent_records(make_tab, tenant_context):
+    tab_id, (name_id,) = make_tab([('Name', 'text')])
+    old = new_record(tab_id, [{'column_id': name_id, 'value': 'old'}])
+    recent = new_record(tab_id, [{'column_id': name_id, 'value': 'recent'}])
+    db.session.get(TableRecord, old).created_at = datetime.utcnow() - timedelta(days=30)
+    db.session.commit()
+
+    archive = ArchiveService.archive_tab(tab_id, ArchiveService.parse_cutoff(older_than_days=7),
+                                         tenant_context['user_id'])
+
+    assert (archive.min_record_id, archive.max_record_id) == (old, old)
+    assert record_values(tab_id, old) == (True, {name_id: 'old'})
+    assert record_values(tab_id, recent, include_archived=False) == (False, {name_id: 'recent'})
+    assert ArchiveService.archive_tab(tab_id, ArchiveService.parse_cutoff(older_than_days=7),
+                                      tenant_context['user_id']) is None
@@ -0,0 +1,157 @@
+import pytest
+from app import db
+from app.models.job import Job
+from app.models.table import ColumnMigration, TableColumn, TableData, TableRecord
+from app.services.column_migration_service import ColumnMigrationService
+from app.services.job_service import JobService
+from app.services.table_service import TableService
+
+VALUES = ['1', ' 2.5 ', 'abc', '', '3', '4']
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def text_column(sqlite_app, make_tab):
+    """A text column holding VALUES, one record each, converted two cells per batch"""
+    sqlite_app.config['COLUMN_MIGRATION_BATCH_SIZE'] = 2
+    tab_id, (column_id,) = make_tab([('Value', 'text')])
+    TableService.bulk_insert_table_data(tab_id, [{'id': column_id, 'data_type': 'text'}], [[v] for v in VALUES])
+    return tab_id, column_id
+
+
+def column_values(column_id, value_column):
+    return [value for (value,) in db.session.query(getattr(TableData, value_column))
+            .filter_by(column_id=column_id).order_by(TableData.id)]
+
+
+def interrupt_after(batches):
+    """ Progress callback failing once some batches are checkpointed """
+    calls = []
+
+    def progress(fraction, message):
+        calls.append(fraction)
+        if len(calls) == batches:
+            raise Interrupted("worker stopped")
+    return progress
+
+
+def test_report_lists_failures_without_writing(text_column, tenant_context):
+    _, column_id = text_column
+
+    report = ColumnMigrationService.get_migration_report(column_id, 'number')
+
+    assert (report['cells'], report['failed_count'], report['truncated']) == (6, 1, False)
+    assert [failure['value'] for failure in report['failures']] == ['abc']
+    assert ColumnMigrationService.get_migration_report(column_id, 'number', limit=0)['truncated']
+    assert column_values(column_id, 'value_text') == VALUES
+    assert column_values(column_id, 'value_num') == [None] * 6
+
+
+def test_migration_converts_in_batches(text_column, tenant_context):
+    _, column_id = text_column
+    fractions = []
+
+    migration = ColumnMigrationService.start_migration(column_id, 'number', tenant_context['user_id'])
+    migration = ColumnMigrationService.run_migration(migration.id, progress=lambda f, _: fractions.append(f))
+
+    assert (migration.status, migration.phase, migration.cells_failed) == ('succeeded', 'cleanup', 1)
+    assert db.session.get(TableColumn, column_id).data_type == 'number'
+    assert column_values(column_id, 'value_num') == [1, 2.5, None, None, 3, 4]
+    assert column_values(column_id, 'value_text') == [None] * 6
+    # Three batches of two cells per phase
+    assert len(fractions) == 6 and fractions[2] == 0.5 and fractions[-1] == 1
+
+
+def test_strict_migration_is_refused(text_column, tenant_context):
+    _, column_id = text_column
+
+    with pytest.raises(ValueError, match="1 cells cannot be converted"):
+        ColumnMigrationService.start_migration(column_id, 'number', tenant_context['user_id'], strict=True)
+
+    assert ColumnMigration.query.count() == 0
+    assert db.session.get(TableColumn, column_id).data_type == 'text'
+    migration = ColumnMigrationService.start_migration(column_id, 'long-text', tenant_context['user_id'], strict=True)
+    assert ColumnMigrationService.run_migration(migration.id).status == 'succeeded'
+
+
+def test_failed_migration_resumes_from_checkpoint(text_column, tenant_context):
+    tab_id, column_id = text_column
+    cell_ids = [cell_id for (cell_id,) in db.session.query(TableData.id).filter_by(column_id=column_id)
+                .order_by(TableData.id)]
+
+    migration = ColumnMigrationService.start_migration(column_id, 'number', tenant_context['user_id'])
+    with pytest.raises(Interrupted):
+        ColumnMigrationService.run_migration(migration.id, progress=interrupt_after(2))
+
+    migration = db.session.get(ColumnMigration, migration.id)
+    assert (migration.status, migration.phase) == ('failed', 'copy')
+    assert (migration.last_id, migration.max_id) == (cell_ids[3], cell_ids[-1])
+    assert column_values(column_id, 'value_num')[:4] == [1, 2.5, None, None]
+    assert column_values(column_id, 'value_num')[4:] == [None, None]
+    assert db.session.get(TableColumn, column_id).data_type == 'text'
+
+    # Written under the old type while the migration is stopped: an already
+    # copied cell is rewritten, and a new record comes after max_id
+    first_record = db.session.query(TableData.record_id).filter_by(id=cell_ids[0]).scalar()
+    TableService.update_table_data(tab_id, first_record, [{'column_id': column_id, 'value': '7'}])
+    TableService.update_table_data(tab_id, -1, [{'column_id': column_id, 'value': '8'}])
+
+    ColumnMigrationService.resume_migration(migration.id)
+    migration = ColumnMigrationService.run_migration(migration.id)
+
+    assert migration.status == 'succeeded'
+    assert column_values(column_id, 'value_num') == [7, 2.5, None, None, 3, 4, 8]
+    assert column_values(column_id, 'value_text') == [None] * 7
+    with pytest.raises(ValueError, match="already succeeded"):
+        ColumnMigrationService.resume_migration(migration.id)
+
+
+def test_failure_during_cleanup_resumes(text_column, tenant_context):
+    _, column_id = text_column
+
+    migration = ColumnMigrationService.start_migration(column_id, 'number', tenant_context['user_id'])
+    with pytest.raises(Interrupted):
+        ColumnMigrationService.run_migration(migration.id, progress=interrupt_after(4))
+
+    migration = db.session.get(ColumnMigration, migration.id)
+    assert (migration.status, migration.phase) == ('failed', 'cleanup')
+    assert db.session.get(TableColumn, column_id).data_type == 'number'
+    assert column_values(column_id, 'value_text')[2:] == ['abc', '', '3', '4']
+
+    ColumnMigrationService.resume_migration(migration.id)
+    assert ColumnMigrationService.run_migration(migration.id).status == 'succeeded'
+    assert column_values(column_id, 'value_text') == [None] * 6
+    assert column_values(column_id, 'value_num') == [1, 2.5, None, None, 3, 4]
+
+
+def test_async_type_change_runs_as_job(sqlite_app, text_column, tenant_context):
+    _, column_id = text_column
+
+    response = sqlite_app.test_client().put('/api/tables/columns', json={
+        'column_id': column_id,
+        'updates': {'data_type': 'number', 'name': 'Amount'},
+        'async': True,
+    }, headers=tenant_context['headers'])
+    assert response.status_code == 202
+    assert db.session.get(TableColumn, column_id).name == 'Amount'
+
+    with sqlite_app.app_context():
+        job = JobService.claim_next_job()
+        assert job.kind == 'migrate_column'
+        JobService.run_job(job)
+        job = db.session.get(Job, job.id)
+        assert job.status == 'succeeded'
+        assert job.result == {
+            'migration_id': response.get_json()['migration_id'],
+            'column_id': column_id,
+            'data_type': 'number',
+            'cells_failed': 1,
+        }
+
+    db.session.expire_all()
+    assert db.session.get(TableColumn, column_id).data_type == 'number'
+    assert column_values(column_id, 'value_num') == [1, 2.5, None, None, 3, 4]
+    assert TableRecord.query.count() == 6
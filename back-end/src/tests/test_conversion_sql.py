@@ -0,0 +1,62 @@
+import pytest
+from app import db
+from app.services.column_migration_service import ColumnMigrationService
+from sqlalchemy import text
+
+
+def convert(prev_data_type, new_data_type, value):
+    """ (converted value, valid) of one source value, run through conversion_sql on the app's database """
+    source_col, _, converted, valid = ColumnMigrationService.conversion_sql(prev_data_type, new_data_type)
+    return tuple(db.session.execute(
+        text(f"SELECT {converted}, {valid} FROM (SELECT :value AS {source_col}) AS cell"),
+        ColumnMigrationService.sql_params(value=value)
+    ).one())
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('1', (1, True)),
+    (' 2.5 ', (2.5, True)),
+    ('-.5', (-0.5, True)),
+    ('1e3', (1000, True)),
+    ('', (None, True)),
+    ('abc', (None, False)),
+    ('1.2.3', (None, False)),
+])
+def test_text_to_number(tenant_context, value, expected):
+    assert convert('text', 'number', value) == expected
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2024-02-29', ('2024-02-29', True)),
+    (' 2024-01-31 ', ('2024-01-31', True)),
+    ('', (None, True)),
+    ('2024-02-30', (None, False)),
+    ('2023-02-29', (None, False)),
+    ('2024-04-31', (None, False)),
+    ('2024-13-01', (None, False)),
+    ('02/01/2024', (None, False)),
+])
+def test_text_to_date(tenant_context, value, expected):
+    assert convert('text', 'date', value) == expected
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('true', (True, True)),
+    (' Yes ', (True, True)),
+    ('0', (False, True)),
+    ('', (False, True)),
+    ('maybe', (False, False)),
+])
+def test_text_to_boolean(tenant_context, value, expected):
+    assert convert('text', 'boolean', value) == expected
+
+
+@pytest.mark.parametrize('prev_data_type, value, expected', [
+    ('number', 2.5, ('2.5', True)),
+    ('number', -4.0, ('-4.0', True)),
+    ('boolean', True, ('true', True)),
+    ('boolean', False, ('false', True)),
+    ('date', '2024-01-05', ('2024-01-05', True)),
+])
+def test_values_to_text(tenant_context, prev_data_type, value, expected):
+    assert convert(prev_data_type, 'text', value) == expected
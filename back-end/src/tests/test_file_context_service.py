@@ -0,0 +1,54 @@
+from app.services.file_context_service import FileContextService
+
+
+def csv_context(rows):
+    return {
+        "source": "table",
+        "column_name": "Certificate",
+        "file_path": "big.csv",
+        "content_type": "text/csv",
+        "content": {"headers": ["a"], "data": [{"a": i} for i in range(rows)]},
+    }
+
+
+def text_context(content):
+    return {"source": "checklist", "file_path": "note.txt", "content_type": "text/plain", "content": content}
+
+
+def test_empty_context():
+    assert FileContextService.format_file_context_for_ai([], max_chars=1000) == ""
+
+
+def test_small_context_is_not_truncated():
+    result = FileContextService.format_file_context_for_ai([text_context("hello")], max_chars=1000)
+    assert "hello" in result
+    assert "truncated" not in result
+
+
+def test_budget_is_respected():
+    contexts = [text_context("hello"), csv_context(100000), csv_context(100000)]
+    for max_chars in (100, 1000, 5000):
+        result = FileContextService.format_file_context_for_ai(contexts, max_chars=max_chars)
+        assert len(result) <= max_chars
+
+
+def test_budget_is_shared_between_files():
+    result = FileContextService.format_file_context_for_ai(
+        [csv_context(100000), csv_context(100000)], max_chars=4000)
+    assert "### File 1" in result
+    assert "### File 2" in result
+    assert result.count("[Content truncated to fit the context budget]") == 2
+
+
+def test_unused_budget_goes_to_later_files():
+    result = FileContextService.format_file_context_for_ai(
+        [text_context("hello"), csv_context(100000)], max_chars=4000)
+    second_file = result[result.index("### File 2"):]
+    assert len(second_file) > 3000
+
+
+def test_stream_matches_formatted_string():
+    contexts = [text_context("hello"), csv_context(1000)]
+    chunks = list(FileContextService.iter_file_context_for_ai(contexts, max_chars=2000))
+    assert len(chunks) > 1
+    assert "".join(chunks) == FileContextService.format_file_context_for_ai(contexts, max_chars=2000)
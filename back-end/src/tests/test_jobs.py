@@ -0,0 +1,110 @@
+import io
+import os
+
+import pytest
+from app import db
+from app.jobs import INTERNAL_JOB_KINDS
+from app.models.job import Job
+from app.services.job_service import JobService
+
+
+@pytest.fixture
+def outside_file(tmp_path):
+    path = tmp_path / 'outside.csv'
+    path.write_text("a,b\n1,2\n")
+    return path
+
+
+def run_next_job(app):
+    with app.app_context():
+        job = JobService.claim_next_job()
+        JobService.run_job(job)
+        job = db.session.get(Job, job.id)
+        return job.status, job.result, job.error
+
+
+def queue_job(app, tenant_user, kind, payload):
+    with app.app_context():
+        job = Job(kind=kind, payload=payload, created_by=tenant_user['user_id'], tenant_id=tenant_user['tenant_id'])
+        db.session.add(job)
+        db.session.commit()
+        return job.id
+
+
+def test_client_file_path_is_ignored(sqlite_app, tenant_user, outside_file):
+    client = sqlite_app.test_client()
+
+    response = client.post('/api/jobs/import_csv', json={'file_path': str(outside_file)},
+                           headers=tenant_user['headers'])
+    assert response.status_code == 400
+    assert response.get_json()['message'] == "No file provided"
+
+    # Failed submissions only clean up files staged by the request
+    response = client.post('/api/jobs/no_such_kind', json={'file_path': str(outside_file)},
+                           headers=tenant_user['headers'])
+    assert response.status_code == 400
+    assert outside_file.exists()
+
+
+@pytest.mark.parametrize('kind', sorted(INTERNAL_JOB_KINDS))
+def test_internal_kinds_are_refused(sqlite_app, tenant_user, kind):
+    response = sqlite_app.test_client().post(f'/api/jobs/{kind}', json={'migration_id': 1, 'tab_id': 1},
+                                             headers=tenant_user['headers'])
+    assert response.status_code == 400
+    with sqlite_app.app_context():
+        assert Job.query.count() == 0
+
+
+def test_uploaded_file_is_staged_and_removed(sqlite_app, tenant_user, outside_file):
+    client = sqlite_app.test_client()
+    response = client.post('/api/jobs/import_csv', data={
+        'file': (io.BytesIO(b"sku,count\nA-1,3\nA-2,5\n"), 'rows.csv'),
+        'name': 'Rows',
+        'file_path': str(outside_file),
+    }, headers=tenant_user['headers'])
+    assert response.status_code == 202
+
+    with sqlite_app.app_context():
+        staged_path = db.session.get(Job, response.get_json()['job']['id']).payload['file_path']
+    assert os.path.dirname(staged_path) == sqlite_app.config['JOB_STAGING_DIR']
+    assert os.path.exists(staged_path)
+
+    status, result, _ = run_next_job(sqlite_app)
+    assert status == 'succeeded'
+    assert result['rows_imported'] == 2
+    assert not os.path.exists(staged_path)
+    assert outside_file.exists()
+
+
+def test_worker_refuses_files_outside_staging(sqlite_app, tenant_user, outside_file):
+    queue_job(sqlite_app, tenant_user, 'import_csv', {'file_path': str(outside_file), 'name': 'Stolen'})
+
+    status, _, error = run_next_job(sqlite_app)
+    assert status == 'failed'
+    assert "outside the staging directories" in error
+    assert outside_file.exists()
+
+
+def test_worker_refuses_links_out_of_staging(sqlite_app, tenant_user, outside_file):
+    staging_dir = sqlite_app.config['JOB_STAGING_DIR']
+    os.makedirs(staging_dir)
+    link = os.path.join(staging_dir, 'link.csv')
+    os.symlink(outside_file, link)
+    queue_job(sqlite_app, tenant_user, 'process_pdf', {'file_path': link})
+
+    status, _, error = run_next_job(sqlite_app)
+    assert status == 'failed'
+    assert "outside the staging directories" in error
+    assert outside_file.exists()
+
+
+@pytest.mark.parametrize('config_key', ['JOB_STAGING_DIR', 'UPLOAD_STAGING_DIR'])
+def test_staged_path_accepts_staging_dirs(sqlite_app, config_key):
+    with sqlite_app.app_context():
+        path = os.path.join(sqlite_app.config[config_key], 'upload.csv')
+        assert JobService.get_staged_path(Job(payload={'file_path': path})) == os.path.realpath(path)
+        assert JobService.get_staged_path(Job(payload={})) is None
+        with pytest.raises(ValueError):
+            JobService.get_staged_path(Job(payload={'file_path': sqlite_app.config[config_key]}))
+        with pytest.raises(ValueError):
+            JobService.get_staged_path(Job(payload={'file_path': os.path.join(path, '..', '..', 'test.db')}))
@@ -0,0 +1,111 @@
+from datetime import date, datetime
+
+import pytest
+from app import db
+from app.models.table import TableTab
+from app.services.table_service import TableService
+from app.services.user_service import UserService
+from app.utils import JSONStream
+from flask import jsonify
+from sqlalchemy import event
+
+COLUMNS = [('Name', 'text'), ('Count', 'number'), ('Done', 'boolean'), ('Due', 'date')]
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(JSONStream, 'CHUNK_SIZE', 16)
+    monkeypatch.setattr(JSONStream, 'ITEMS_PER_DUMP', 3)
+
+
+def streamed(value):
+    return "".join(JSONStream.iter_encode(value)).encode()
+
+
+def test_nested_values_match_jsonify(sqlite_app, small_chunks):
+    def value():
+        return {
+            'z': 'é "quoted" \n',
+            'a': [1, 2.5, None, True, (x for x in range(10))],
+            'rows': ({'b': i, 'a': iter([date(2024, 1, i + 1)])} for i in range(5)),
+            'empty': iter(()),
+            'empty_dict': {},
+            'at': datetime(2024, 1, 2, 3, 4, 5),
+            'nested': {'inner': iter([[], {}, 'x'])},
+        }
+
+    with sqlite_app.test_request_context():
+        expected = jsonify({
+            'z': 'é "quoted" \n',
+            'a': [1, 2.5, None, True, list(range(10))],
+            'rows': [{'b': i, 'a': [date(2024, 1, i + 1)]} for i in range(5)],
+            'empty': [],
+            'empty_dict': {},
+            'at': datetime(2024, 1, 2, 3, 4, 5),
+            'nested': {'inner': [[], {}, 'x']},
+        }).get_data()
+        assert streamed(value()) == expected
+        assert streamed(iter(range(7))) == jsonify(list(range(7))).get_data()
+
+
+def test_get_table_matches_jsonify(sqlite_app, make_tab, tenant_context, small_chunks):
+    cells_tab, cell_columns = make_tab(COLUMNS)
+    document_tab, document_columns = make_tab(COLUMNS, storage_mode='document')
+    rows = [[f'row {i}', str(i), 'true' if i % 2 else 'false', '2024-01-05' if i % 3 else None] for i in range(8)]
+    for tab_id, column_ids in ((cells_tab, cell_columns), (document_tab, document_columns)):
+        TableService.bulk_insert_table_data(tab_id, [
+            {'id': column_id, 'data_type': data_type} for column_id, (_, data_type) in zip(column_ids, COLUMNS)
+        ], rows)
+
+    for tab_id in (cells_tab, document_tab):
+        table_id = db.session.get(TableTab, tab_id).table_id
+        table = TableService.get_table(table_id)
+        expected = jsonify({
+            "message": "Got table",
+            "table": {
+                "id": table.id,
+                "name": table.name,
+                "created_by": table.created_by,
+                "created_by_username": UserService.get_user_by_id(table.created_by).username,
+                "created_at": table.created_at,
+                "version": TableService.get_table_version(table_id),
+                "tabs": [{
+                    "id": tab.id,
+                    "name": tab.name,
+                    "tab_index": tab.tab_index,
+                    "storage_mode": tab.storage_mode,
+                    "data": TableService.get_tab_data(tab.id),
+                } for tab in TableService.get_table_tabs(table_id)],
+                "shares": [{
+                    "id": share.id,
+                    "user_id": share.user_id,
+                    "shared_at": share.shared_at,
+                } for share in TableService.get_table_shares(table_id)],
+            },
+        }).get_data()
+
+        response = sqlite_app.test_client().get(f'/api/tables/{table_id}', headers=tenant_context['headers'])
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.get_data() == expected
+
+
+def test_document_tabs_are_read_in_one_pass(sqlite_app, make_tab):
+    tab_id, column_ids = make_tab(COLUMNS, storage_mode='document')
+    TableService.bulk_insert_table_data(tab_id, [
+        {'id': column_id, 'data_type': data_type} for column_id, (_, data_type) in zip(column_ids, COLUMNS)
+    ], [['a', '1', 'true', '2024-01-05'], ['b', '2', 'false', None]])
+
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        streamed_data = [{**column, 'data': list(column['data'])} for column in TableService.iter_tab_data(tab_id)]
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert streamed_data == TableService.get_tab_data(tab_id)
+    assert sum('FROM table_record' in statement for statement in statements) == 1
@@ -0,0 +1,20 @@
+from app import mailer
+from app.mailer import MailQueue
+
+
+def test_exit_flush_is_registered_once(sqlite_app, monkeypatch):
+    registered = []
+    monkeypatch.setattr(mailer.atexit, 'register', lambda *args: registered.append(args))
+    stopped = []
+    monkeypatch.setattr(mailer.threading.Thread, 'start', lambda thread: stopped.append(thread))
+
+    mail_queue = MailQueue()
+    mail_queue.init_app(sqlite_app)
+    # The sender thread is gone after a fork, so every worker starts it again
+    for _ in range(3):
+        mail_queue._start()
+
+    assert len(stopped) == 3
+    assert registered == [(mail_queue._flush_on_exit,)]
+    # Nothing to wait for when no sender thread is running
+    mail_queue._flush_on_exit()
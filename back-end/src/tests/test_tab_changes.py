@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+
+import pytest
+from app import db
+from app.models.table import TableChange
+from app.services.table_service import TableService
+
+
+@pytest.fixture
+def tab(make_tab):
+    """A tab with two records, (tab_id, column_ids, record_ids)"""
+    tab_id, column_ids = make_tab([('Name', 'text'), ('Count', 'number')])
+    TableService.bulk_insert_table_data(tab_id, [
+        {'id': column_ids[0], 'data_type': 'text'},
+        {'id': column_ids[1], 'data_type': 'number'},
+    ], [['a', '1'], ['b', '2']])
+    record_ids = sorted({change.record_id for change in TableChange.query.filter_by(tab_id=tab_id, op='insert')})
+    return tab_id, column_ids, record_ids
+
+
+def changed_cells(changes):
+    return sorted((cell['record_id'], cell['column_id'], cell['value']) for cell in changes['data'])
+
+
+def test_changes_since_a_version(tab):
+    tab_id, (name_id, count_id), (first, second) = tab
+    since = TableService.get_tab_change_version(tab_id)
+
+    TableService.update_table_data(tab_id, first, [{'column_id': count_id, 'value': '5'}])
+    TableService.bulk_insert_table_data(tab_id, [{'id': name_id, 'data_type': 'text'}], [['c']])
+    third = db.session.query(db.func.max(TableChange.record_id)).scalar()
+    TableService.delete_table_record(second)
+
+    changes = TableService.get_tab_changes(tab_id, since)
+    assert changes['version'] == TableService.get_tab_change_version(tab_id) == since + 3
+    assert changes['full_resync'] is False
+    assert changes['deleted_records'] == [second]
+    # Updated cells only for existing records, every cell for new ones
+    assert changed_cells(changes) == [(first, count_id, 5), (third, name_id, 'c')]
+
+    # Replaying from a later version only returns what came after it
+    changes = TableService.get_tab_changes(tab_id, since + 2)
+    assert (changes['deleted_records'], changes['data']) == ([second], [])
+
+
+def test_deleted_new_records_are_not_sent(tab):
+    tab_id, (name_id, _), _ = tab
+    since = TableService.get_tab_change_version(tab_id)
+    TableService.update_table_data(tab_id, -1, [{'column_id': name_id, 'value': 'short-lived'}])
+    record_id = db.session.query(db.func.max(TableChange.record_id)).scalar()
+    TableService.delete_table_record(record_id)
+
+    changes = TableService.get_tab_changes(tab_id, since)
+    assert (changes['deleted_records'], changes['data']) == ([record_id], [])
+
+
+@pytest.mark.parametrize('ahead', [0, 5])
+def test_up_to_date_clients_get_nothing(tab, ahead):
+    tab_id, _, _ = tab
+    since = TableService.get_tab_change_version(tab_id) + ahead
+
+    changes = TableService.get_tab_changes(tab_id, since)
+    assert changes == {'version': since, 'full_resync': False, 'deleted_records': [], 'data': []}
+
+
+def test_pruned_changes_need_a_full_reload(tab):
+    tab_id, (name_id, _), (first, _) = tab
+    old_version = TableService.get_tab_change_version(tab_id)
+    TableService.update_table_data(tab_id, first, [{'column_id': name_id, 'value': 'renamed'}])
+    TableChange.query.filter(TableChange.version <= old_version).update(
+        {'changed_at': datetime.utcnow() - timedelta(days=40)}, synchronize_session=False
+    )
+    db.session.commit()
+
+    assert TableService.prune_table_changes(retention_days=30) > 0
+    assert TableChange.query.filter(TableChange.version <= old_version).count() == 0
+    assert TableService.get_tab_change_version(tab_id) == old_version + 1
+
+    changes = TableService.get_tab_changes(tab_id, old_version - 1)
+    assert changes['full_resync'] is True
+    assert changes['version'] == old_version + 1
+    # Clients that synced at the pruned version still get the later changes
+    changes = TableService.get_tab_changes(tab_id, old_version)
+    assert changes['full_resync'] is False
+    assert changed_cells(changes) == [(first, name_id, 'renamed')]
+    assert TableService.prune_table_changes(retention_days=30) == 0
+
+
+def test_changes_endpoint(sqlite_app, tab, tenant_context):
+    tab_id, (name_id, _), (first, second) = tab
+    since = TableService.get_tab_change_version(tab_id)
+    TableService.update_table_data(tab_id, first, [{'column_id': name_id, 'value': 'renamed'}])
+    client = sqlite_app.test_client()
+
+    response = client.get(f'/api/tables/tabs/{tab_id}/changes?since={since}', headers=tenant_context['headers'])
+    assert response.status_code == 200
+    assert response.get_json()['version'] == since + 1
+    assert [cell['value'] for cell in response.get_json()['data']] == ['renamed']
+
+    response = client.delete(f'/api/tables/records/{second}', headers=tenant_context['headers'])
+    assert (response.status_code, response.get_json()['updates']) == (201, second)
+    response = client.get(f'/api/tables/tabs/{tab_id}/changes?since={since + 1}', headers=tenant_context['headers'])
+    assert response.get_json()['deleted_records'] == [second]
+
+    for query in ('', '?since=', '?since=latest'):
+        response = client.get(f'/api/tables/tabs/{tab_id}/changes{query}', headers=tenant_context['headers'])
+        assert response.status_code == 400
+        assert response.get_json()['message'] == "Missing or invalid 'since' version"
@@ -0,0 +1,87 @@
+import pytest
+from app import db
+from app.models.table import TableData, TableRecord, TableTab
+from app.services.tab_storage_service import TabStorageService
+from app.services.table_service import TableService
+
+COLUMNS = [('Name', 'text'), ('Count', 'number'), ('Done', 'boolean'), ('Due', 'date')]
+
+
+def tab_values(tab_id):
+    """ {record_id: {column_id: value}} as returned by get_tab_data, without empty cells """
+    values = {}
+    for column in TableService.get_tab_data(tab_id):
+        for cell in column['data']:
+            if cell['value'] is not None:
+                values.setdefault(cell['record_id'], {})[column['header']['column_id']] = cell['value']
+    return values
+
+
+def add_records(tab_id, column_ids):
+    TableService.bulk_insert_table_data(tab_id, [
+        {'id': column_id, 'data_type': data_type} for column_id, (_, data_type) in zip(column_ids, COLUMNS)
+    ], [
+        ['first', '1', 'true', '2024-01-02'],
+        ['second', '2.5', 'false', None],
+    ])
+    return [record_id for (record_id,) in db.session.query(TableRecord.id).filter_by(tab_id=tab_id)
+            .order_by(TableRecord.id)]
+
+
+def test_document_tab_reads_and_writes(make_tab):
+    tab_id, column_ids = make_tab(COLUMNS, storage_mode='document')
+    name_id, count_id, done_id, _ = column_ids
+    first, second = add_records(tab_id, column_ids)
+
+    TableService.update_table_data(tab_id, first, [{'column_id': str(name_id), 'value': 'renamed'}])
+    TableService.batch_update_table_data(tab_id, [
+        {'record_id': second, 'column_id': count_id, 'value': '3'},
+        {'record_id': second, 'column_id': done_id, 'value': 'true'},
+    ])
+
+    assert TableData.query.filter_by(tab_id=tab_id).count() == 0
+    assert db.session.get(TableRecord, first).data[str(name_id)] == 'renamed'
+    values = tab_values(tab_id)
+    assert values[first][name_id] == 'renamed'
+    assert values[first][count_id] == 1
+    assert values[second][name_id] == 'second'
+    assert values[second][count_id] == 3
+    assert values[second][done_id] is True
+    assert [cell['data_id'] for column in TableService.get_tab_data(tab_id) for cell in column['data']] \
+        == [None] * 7
+
+    record = TableService.get_record_data(tab_id, first)
+    assert {cell['column_id']: cell['value'] for cell in record['data']} == values[first]
+
+
+@pytest.mark.parametrize('start, switch_to', [('cells', 'document'), ('document', 'cells')])
+def test_switching_storage_mode_keeps_values(make_tab, start, switch_to):
+    tab_id, column_ids = make_tab(COLUMNS, storage_mode=start)
+    add_records(tab_id, column_ids)
+    before = tab_values(tab_id)
+
+    TabStorageService.set_storage_mode(tab_id, switch_to)
+    assert db.session.get(TableTab, tab_id).storage_mode == switch_to
+    assert tab_values(tab_id) == before
+
+    TabStorageService.set_storage_mode(tab_id, start)
+    assert tab_values(tab_id) == before
+    if start == 'cells':
+        # Empty cells aren't kept in documents, so they don't come back as rows
+        assert TableData.query.filter_by(tab_id=tab_id).count() == 7
+        assert TableRecord.query.filter(TableRecord.tab_id == tab_id, TableRecord.data.isnot(None)).count() == 0
+    else:
+        assert TableData.query.filter_by(tab_id=tab_id).count() == 0
+
+
+def test_writes_after_a_switch_use_the_new_layout(make_tab):
+    tab_id, column_ids = make_tab(COLUMNS)
+    first, _ = add_records(tab_id, column_ids)
+
+    TabStorageService.set_storage_mode(tab_id, 'document')
+    TableService.update_table_data(tab_id, first, [{'column_id': column_ids[0], 'value': 'moved'}])
+
+    assert TableData.query.filter_by(tab_id=tab_id).count() == 0
+    assert tab_values(tab_id)[first][column_ids[0]] == 'moved'
+    assert TabStorageService.get_storage_mode(tab_id, for_write=True) == 'document'
+    assert TabStorageService.get_storage_mode(-1, for_write=True) == 'cells'
@@ -0,0 +1,67 @@
+import pytest
+from app import db
+from app.models.table import TableData, TableRecord
+from app.services.table_service import TableService
+from sqlalchemy.exc import IntegrityError
+
+
+def cell_rows(record_id, column_id):
+    return TableData.query.filter_by(record_id=record_id, column_id=column_id).all()
+
+
+def new_record(tab_id, updates):
+    TableService.update_table_data(tab_id, -1, updates)
+    return db.session.query(db.func.max(TableRecord.id)).scalar()
+
+
+def test_rewriting_a_cell_updates_it_in_place(make_tab):
+    tab_id, (text_id, number_id) = make_tab([('Name', 'text'), ('Count', 'number')])
+    record_id = new_record(tab_id, [{'column_id': text_id, 'value': 'first'}, {'column_id': number_id, 'value': '1'}])
+    data_id = cell_rows(record_id, text_id)[0].id
+
+    assert TableService.update_table_data(tab_id, record_id, [{'column_id': str(text_id), 'value': 'second'}]) == 1
+
+    rows = cell_rows(record_id, text_id)
+    assert [(row.id, row.value_text) for row in rows] == [(data_id, 'second')]
+    assert cell_rows(record_id, number_id)[0].value_num == 1
+
+
+def test_same_cell_twice_in_one_update(make_tab):
+    tab_id, (text_id,) = make_tab([('Name', 'text')])
+    record_id = new_record(tab_id, [{'column_id': text_id, 'value': 'first'}])
+
+    written = TableService.update_table_data(tab_id, record_id, [
+        {'column_id': text_id, 'value': 'second'},
+        {'column_id': text_id, 'value': 'third'},
+    ])
+
+    assert written == 1
+    assert [row.value_text for row in cell_rows(record_id, text_id)] == ['third']
+
+
+def test_batch_update_dedupes_and_upserts(make_tab):
+    tab_id, (text_id, number_id) = make_tab([('Name', 'text'), ('Count', 'number')])
+    first = new_record(tab_id, [{'column_id': text_id, 'value': 'a'}])
+    second = new_record(tab_id, [{'column_id': text_id, 'value': 'b'}])
+
+    written = TableService.batch_update_table_data(tab_id, [
+        {'record_id': first, 'column_id': number_id, 'value': '1'},
+        {'record_id': first, 'column_id': number_id, 'value': '2'},
+        {'record_id': second, 'column_id': text_id, 'value': 'c'},
+    ])
+
+    assert written == 2
+    assert [row.value_num for row in cell_rows(first, number_id)] == [2]
+    assert [row.value_text for row in cell_rows(second, text_id)] == ['c']
+    assert TableData.query.filter_by(tab_id=tab_id).count() == 3
+
+
+def test_duplicate_cells_are_rejected(make_tab, tenant_context):
+    tab_id, (text_id,) = make_tab([('Name', 'text')])
+    record_id = new_record(tab_id, [{'column_id': text_id, 'value': 'a'}])
+
+    db.session.add(TableData(tab_id=tab_id, column_id=text_id, record_id=record_id,
+                             tenant_id=tenant_context['tenant_id'], value_text='duplicate'))
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
@@ -0,0 +1,115 @@
+import io
+import os
+import time
+
+import pytest
+from app import db
+from app.models.job import Job
+from app.services.job_service import JobService
+from app.services.upload_service import UploadService
+from flask import g
+from werkzeug.wsgi import LimitedStream
+
+CSV = b"sku,count\nA-1,3\nA-2,5\nA-3,8\n"
+
+
+@pytest.fixture
+def uploads(sqlite_app, tenant_user):
+    """Call the upload endpoints as tenant_user: uploads(method, path='', **kwargs) -> response"""
+    client = sqlite_app.test_client()
+
+    def call(method, path='', **kwargs):
+        return client.open(f'/api/tables/import/uploads{path}', method=method,
+                           headers=tenant_user['headers'], **kwargs)
+    return call
+
+
+def put_chunk(uploads, upload_id, offset, chunk):
+    return uploads('PUT', f'/{upload_id}?offset={offset}', data=chunk,
+                   content_type='application/octet-stream')
+
+
+def test_chunked_upload_is_imported(sqlite_app, uploads):
+    response = uploads('POST', json={'filename': 'rows.csv', 'total_size': len(CSV), 'name': 'Rows'})
+    assert response.status_code == 201
+    upload_id = response.get_json()['upload_id']
+    assert response.get_json()['offset'] == 0
+
+    assert put_chunk(uploads, upload_id, 0, CSV[:10]).get_json()['offset'] == 10
+
+    # A repeated chunk, or one past the end of the data, is told where to resume
+    for offset in (0, 20):
+        response = put_chunk(uploads, upload_id, offset, CSV[offset:offset + 10])
+        assert response.status_code == 409
+        assert response.get_json()['offset'] == 10
+    assert uploads('GET', f'/{upload_id}').get_json()['offset'] == 10
+
+    response = uploads('POST', f'/{upload_id}/finalize')
+    assert response.status_code == 400
+    assert response.get_json()['message'] == f"Upload incomplete: received 10 of {len(CSV)} bytes"
+
+    assert put_chunk(uploads, upload_id, 10, CSV[10:]).get_json()['offset'] == len(CSV)
+    response = uploads('POST', f'/{upload_id}/finalize')
+    assert response.status_code == 202
+    assert uploads('GET', f'/{upload_id}').status_code == 404
+
+    with sqlite_app.app_context():
+        job = JobService.claim_next_job()
+        assert (job.kind, job.payload['name'], job.payload['file_name']) == ('import_csv', 'Rows', 'rows.csv')
+        JobService.run_job(job)
+        job = db.session.get(Job, job.id)
+        assert (job.status, job.result['rows_imported']) == ('succeeded', 3)
+    assert not os.listdir(sqlite_app.config['UPLOAD_STAGING_DIR'])
+
+
+def test_chunks_past_the_declared_size_are_refused(uploads):
+    upload_id = uploads('POST', json={'filename': 'rows.csv', 'total_size': 4}).get_json()['upload_id']
+
+    response = put_chunk(uploads, upload_id, 0, CSV[:5])
+    assert response.status_code == 400
+    assert uploads('GET', f'/{upload_id}').get_json()['offset'] == 0
+
+
+def test_dropped_connection_keeps_the_resume_offset(tenant_context):
+    upload = UploadService.create_upload('rows.csv', len(CSV), tenant_context['user_id'])
+    UploadService.append_chunk(upload['upload_id'], tenant_context['user_id'], 0, io.BytesIO(CSV[:10]), 10)
+
+    # The client promised 15 bytes but the connection dropped after 5
+    stream = LimitedStream(io.BytesIO(CSV[10:15]), 15)
+    with pytest.raises(ValueError, match="Incomplete chunk"):
+        UploadService.append_chunk(upload['upload_id'], tenant_context['user_id'], 10, stream, 15)
+
+    assert UploadService.get_upload(upload['upload_id'], tenant_context['user_id'])['offset'] == 10
+
+
+def test_uploads_are_private_to_their_user_and_tenant(tenant_context):
+    user_id = tenant_context['user_id']
+    upload_id = UploadService.create_upload('rows.csv', len(CSV), user_id)['upload_id']
+
+    assert UploadService.get_upload(upload_id, user_id + 1) is None
+    assert UploadService.append_chunk(upload_id, user_id + 1, 0, io.BytesIO(CSV), len(CSV)) is None
+    assert UploadService.complete_upload(upload_id, user_id + 1) is None
+    assert not UploadService.delete_upload(upload_id, user_id + 1)
+
+    g.tenant_id = tenant_context['tenant_id'] + 1
+    assert UploadService.get_upload(upload_id, user_id) is None
+    g.tenant_id = tenant_context['tenant_id']
+    assert UploadService.get_upload(upload_id, user_id)['offset'] == 0
+    with pytest.raises(ValueError, match="Invalid upload ID"):
+        UploadService.get_upload('../test', user_id)
+
+
+def test_idle_uploads_expire(sqlite_app, tenant_context):
+    user_id = tenant_context['user_id']
+    idle = UploadService.create_upload('idle.csv', len(CSV), user_id)['upload_id']
+    active = UploadService.create_upload('active.csv', len(CSV), user_id)['upload_id']
+    expired_at = time.time() - sqlite_app.config['UPLOAD_EXPIRY_SECONDS'] - 60
+    for upload_id in (idle, active):
+        os.utime(UploadService._paths(upload_id)[1], (expired_at, expired_at))
+
+    # A chunk keeps an upload alive
+    UploadService.append_chunk(active, user_id, 0, io.BytesIO(CSV[:10]), 10)
+    UploadService.remove_expired_uploads()
+
+    assert not any(os.path.exists(path) for path in UploadService._paths(idle))
+    assert UploadService.get_upload(active, user_id)['offset'] == 10